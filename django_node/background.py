@@ -0,0 +1,229 @@
+import sys
+import time
+import uuid
+import logging
+import threading
+import collections
+from concurrent.futures import ThreadPoolExecutor
+from django.utils import six
+from .settings import (
+    BACKGROUND_MAX_WORKERS, BACKGROUND_MAX_QUEUED, BACKGROUND_RESULT_STORE, BACKGROUND_CALLBACK
+)
+from .exceptions import BackgroundQueueFull
+from .utils import dynamic_import_attribute
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BACKEND = 'django_node.background.MemoryResultStore'
+
+QUEUED = 'queued'
+RUNNING = 'running'
+SUCCEEDED = 'succeeded'
+FAILED = 'failed'
+
+
+class BaseResultStore(object):
+    """
+    A store for the outcomes of background calls, keyed by the id of each call.
+    Outcomes are dictionaries containing the call's `id`, `service`, `status`,
+    `status_code`, `output` and `error`, and the times at which it was `queued`
+    and `finished`.
+    """
+
+    def get(self, call_id):
+        """
+        Returns the outcome of the call, or None
+        """
+        raise NotImplementedError()
+
+    def set(self, call_id, outcome):
+        raise NotImplementedError()
+
+
+class MemoryResultStore(BaseResultStore):
+    """
+    Holds the outcomes of the most recent `max_entries` calls in the process's memory
+    """
+
+    def __init__(self, max_entries=None):
+        self.max_entries = max_entries if max_entries is not None else 1000
+        self.lock = threading.Lock()
+        self.outcomes = collections.OrderedDict()
+
+    def get(self, call_id):
+        with self.lock:
+            return self.outcomes.get(call_id)
+
+    def set(self, call_id, outcome):
+        with self.lock:
+            self.outcomes.pop(call_id, None)
+            self.outcomes[call_id] = outcome
+            while len(self.outcomes) > self.max_entries:
+                self.outcomes.popitem(last=False)
+
+
+class BackgroundCall(object):
+    """
+    A handle to a service call running in the background. `result` blocks
+    until the call has finished, then returns its response or raises its error.
+    """
+
+    def __init__(self, service, kwargs):
+        self.id = uuid.uuid4().hex
+        self.service = service
+        self.kwargs = kwargs
+        self.status = QUEUED
+        self.queued_at = time.time()
+        self.finished_at = None
+        self.future = None
+
+    def done(self):
+        return self.future.done()
+
+    def result(self, timeout=None):
+        return self.future.result(timeout)
+
+    def exception(self, timeout=None):
+        return self.future.exception(timeout)
+
+    def get_outcome(self, response=None, error=None):
+        return {
+            'id': self.id,
+            'service': self.service.get_name(),
+            'status': self.status,
+            'status_code': response.status_code if response is not None else None,
+            'output': response.text if response is not None else None,
+            'error': '{type}: {error}'.format(type=type(error).__name__, error=error) if error else None,
+            'queued': self.queued_at,
+            'finished': self.finished_at,
+        }
+
+
+class BackgroundDispatcher(object):
+    """
+    Sends service calls from a pool of `max_workers` threads. Up to `max_queued`
+    calls wait for a thread, beyond which `submit` raises `BackgroundQueueFull`
+    rather than accumulating work without bound.
+
+    The outcome of each call is written to `result_store`, then passed to the
+    service's `handle_background_result` and to `callback`.
+    """
+
+    max_workers = BACKGROUND_MAX_WORKERS
+    max_queued = BACKGROUND_MAX_QUEUED
+
+    def __init__(self, max_workers=None, max_queued=None, result_store=None, callback=None):
+        if max_workers is not None:
+            self.max_workers = max_workers
+        if max_queued is not None:
+            self.max_queued = max_queued
+        self.result_store = result_store if result_store is not None else get_result_store()
+        self.callback = callback if callback is not None else get_callback()
+        self.executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        self.slots = threading.BoundedSemaphore(self.max_workers + self.max_queued)
+
+    def submit(self, service, kwargs):
+        if not self.slots.acquire(False):
+            raise BackgroundQueueFull(
+                'Unable to queue a call to {name}, as {count} calls are already queued or running'.format(
+                    name=service.get_name(),
+                    count=self.max_workers + self.max_queued,
+                )
+            )
+
+        call = BackgroundCall(service, kwargs)
+        self.result_store.set(call.id, call.get_outcome())
+        try:
+            call.future = self.executor.submit(self.run, call)
+        except Exception:
+            self.slots.release()
+            raise
+        return call
+
+    def run(self, call):
+        try:
+            call.status = RUNNING
+            response = None
+            error = None
+            exc_info = None
+            try:
+                response = call.service.send(**call.kwargs)
+                call.status = SUCCEEDED
+            except Exception as e:
+                error = e
+                exc_info = sys.exc_info()
+                call.status = FAILED
+            call.finished_at = time.time()
+
+            outcome = call.get_outcome(response, error)
+            for handler in (self.store_outcome, call.service.handle_background_result, self.callback):
+                try:
+                    handler(outcome)
+                except Exception as e:
+                    logger.warning('Failed to handle the outcome of {name}: {error}'.format(
+                        name=outcome['service'],
+                        error=e,
+                    ))
+
+            if exc_info is not None:
+                six.reraise(*exc_info)
+            return response
+        finally:
+            self.slots.release()
+
+    def store_outcome(self, outcome):
+        self.result_store.set(outcome['id'], outcome)
+
+    def shutdown(self, wait=None):
+        if wait is None:
+            wait = True
+        self.executor.shutdown(wait=wait)
+
+
+def log_outcome(outcome):
+    if outcome['status'] == FAILED:
+        logger.warning('Background call to {service} failed: {error}'.format(**outcome))
+
+
+def get_callback():
+    if BACKGROUND_CALLBACK is None:
+        return log_outcome
+    if callable(BACKGROUND_CALLBACK):
+        return BACKGROUND_CALLBACK
+    return dynamic_import_attribute(BACKGROUND_CALLBACK)
+
+
+def get_result_store():
+    """
+    Returns a store configured by the BACKGROUND_RESULT_STORE setting, or a
+    MemoryResultStore
+    """
+    config = BACKGROUND_RESULT_STORE or {}
+    backend = dynamic_import_attribute(config.get('BACKEND', DEFAULT_BACKEND))
+    return backend(**config.get('OPTIONS', {}))
+
+
+_dispatcher = None
+_dispatcher_lock = threading.Lock()
+
+
+def get_dispatcher():
+    """
+    Returns the process's dispatcher, creating it on first use
+    """
+    global _dispatcher
+
+    if _dispatcher is None:
+        with _dispatcher_lock:
+            if _dispatcher is None:
+                _dispatcher = BackgroundDispatcher()
+
+    return _dispatcher
+
+
+def get_outcome(call_id):
+    """
+    Returns the outcome of a background call sent by this process's dispatcher
+    from the result store, or None
+    """
+    return get_dispatcher().result_store.get(call_id)
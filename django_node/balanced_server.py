@@ -0,0 +1,165 @@
+import time
+import hashlib
+import threading
+import requests
+from requests.exceptions import ConnectionError
+from django.utils import six
+if six.PY2:
+    from urlparse import urljoin
+elif six.PY3:
+    from urllib.parse import urljoin
+from .node_server import NodeServer
+from .settings import SERVER_BACKENDS, SERVER_BACKEND_RETRY_INTERVAL
+from .exceptions import NodeServerStartError
+from .file_transport import read_response
+from .hash_ring import HashRing
+
+
+class Backend(object):
+    def __init__(self, url):
+        self.url = url
+        self.is_healthy = True
+        self.failed_at = None
+        self.request_count = 0
+        self.failure_count = 0
+        # The digests of the values sent by reference that the backend has received
+        self.uploaded_references = set()
+
+    def __repr__(self):
+        return '<Backend {url}>'.format(url=self.url)
+
+
+class BalancedNodeServer(NodeServer):
+    """
+    Distributes requests across multiple servers, each of which is started
+    separately, for example with `./manage.py start_node_server`.
+
+    Requests are routed by consistent hashing, so that identical requests are
+    sent to the same server and benefit from its caches. If a server fails to
+    respond, it is marked as unhealthy and its requests fail over to the next
+    server on the ring, until it is retried after `backend_retry_interval`
+    seconds.
+    """
+
+    backends = SERVER_BACKENDS
+    backend_retry_interval = SERVER_BACKEND_RETRY_INTERVAL
+
+    def __init__(self, backends=None):
+        if backends is not None:
+            self.backends = backends
+        super(BalancedNodeServer, self).__init__()
+        self.backend_lock = threading.Lock()
+        self.backends = [Backend(url) for url in self.backends]
+        self.ring = HashRing([backend.url for backend in self.backends])
+
+    def get_server_url(self):
+        if self.backends:
+            return ', '.join(backend.url for backend in self.backends)
+
+    def start(self, debug=None, use_existing_process=None, blocking=None):
+        self.clear_health()
+        if not self.ping():
+            raise NodeServerStartError(
+                'None of the backends are responding: {urls}'.format(urls=self.get_server_url())
+            )
+        self.is_running = True
+
+    def is_healthy(self, full=None):
+        # The backends' health is tracked as requests are sent to them
+        if full:
+            return self.test()
+        return any(backend.is_healthy for backend in self.backends)
+
+    def supports_file_transport(self):
+        # The backends may be on other hosts
+        return False
+
+    def add_backend(self, url):
+        with self.backend_lock:
+            self.backends = self.backends + [Backend(url)]
+            self.ring.add(url)
+
+    def remove_backend(self, url):
+        with self.backend_lock:
+            self.backends = [backend for backend in self.backends if backend.url != url]
+            self.ring.remove(url)
+
+    def get_backend(self, url):
+        for backend in self.backends:
+            if backend.url == url:
+                return backend
+
+    def get_backends_for(self, routing_key):
+        """
+        Returns the backends to try for a request, in order. Healthy backends are
+        ordered by the ring, followed by any unhealthy backends which are due to
+        be retried. If none are available, every backend is returned.
+        """
+        with self.backend_lock:
+            backends_by_url = dict((backend.url, backend) for backend in self.backends)
+            backends = [backends_by_url[url] for url in self.ring.get_nodes(routing_key or '')]
+        now = time.time()
+        healthy = [backend for backend in backends if backend.is_healthy]
+        retryable = [
+            backend for backend in backends
+            if not backend.is_healthy and now - backend.failed_at >= self.backend_retry_interval
+        ]
+        return healthy + retryable or backends
+
+    def get_uploaded_references(self, routing_key=None):
+        # The first backend for a request is the one which last served it, as
+        # backends which fail to respond are moved to the end
+        backends = self.get_backends_for(routing_key)
+        return backends[0].uploaded_references if backends else set()
+
+    def add_uploaded_references(self, digests, routing_key=None):
+        backends = self.get_backends_for(routing_key)
+        if not backends:
+            return
+        backend = backends[0]
+        with self.backend_lock:
+            if len(backend.uploaded_references) >= self.max_uploaded_references:
+                backend.uploaded_references = set()
+            backend.uploaded_references.update(digests)
+
+    def get_routing_key(self, endpoint, data):
+        key = endpoint
+        if data:
+            if data.get('cache_key'):
+                key += data['cache_key']
+            elif data.get('data'):
+                serialized_data = data['data']
+                if isinstance(serialized_data, six.text_type):
+                    serialized_data = serialized_data.encode('utf-8')
+                key += hashlib.sha1(serialized_data).hexdigest()
+        return key
+
+    def post(self, absolute_url, endpoint, timeout=None, data=None, routing_key=None):
+        error = None
+        for backend in self.get_backends_for(routing_key):
+            try:
+                response = requests.post(urljoin(backend.url, endpoint), timeout=timeout, data=data)
+            except ConnectionError as e:
+                # Timeouts are not retried, as the backend may still be handling the request
+                self.mark_unhealthy(backend, e)
+                error = e
+                continue
+            self.mark_healthy(backend)
+            return read_response(response)
+        raise error or ConnectionError('No backends are configured')
+
+    def mark_healthy(self, backend):
+        with self.backend_lock:
+            backend.request_count += 1
+            if not backend.is_healthy:
+                self.log('Backend {url} is responding'.format(url=backend.url))
+            backend.is_healthy = True
+            backend.failed_at = None
+
+    def mark_unhealthy(self, backend, error):
+        with self.backend_lock:
+            backend.failure_count += 1
+            if backend.is_healthy:
+                self.log('Backend {url} failed to respond: {error}'.format(url=backend.url, error=error))
+            backend.is_healthy = False
+            backend.failed_at = time.time()
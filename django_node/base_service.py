@@ -1,4 +1,5 @@
 import os
+import time
 import warnings
 import json
 from django.utils import six
@@ -9,9 +10,14 @@ elif six.PY3:
     from urllib.parse import urlparse
     from urllib.parse import urljoin
 from .exceptions import ServiceSourceDoesNotExist, MalformedServiceName, ServerConfigMissingService, NodeServiceError
-from .settings import SERVICES, SERVICE_TIMEOUT
+from .settings import SERVICES, SERVICE_TIMEOUT, SERVICE_BATCH_WINDOW, SERVICE_BATCH_MAX_SIZE
 from .utils import convert_html_to_plain_text
 from .package_dependent import PackageDependent
+from .result_cache import get_result_cache, get_files_fingerprint, get_package_paths, get_cache_key
+from .references import get_digest, build_reference, get_missing_references
+from . import memoization
+from .batching import get_dispatcher
+from . import background
 
 
 class BaseService(PackageDependent):
@@ -19,6 +25,23 @@ class BaseService(PackageDependent):
     name = None
     server = None
     timeout = SERVICE_TIMEOUT
+    # A sequence of dictionaries, each containing the keyword arguments for a call
+    # which is replayed after the server has started, before it is marked as ready
+    warmup_payloads = ()
+    # Opt in to storing responses in the persistent cache defined by the RESULT_CACHE
+    # setting. Only suitable for services which always respond identically to identical data
+    cache_results = False
+    result_cache = None
+    # The names of keyword arguments which are sent by reference. Each distinct value
+    # is uploaded to the server once, after which only its digest is sent
+    reference_arguments = ()
+    # Set to False for services which may respond differently to identical data, so that
+    # the memoization middleware never reuses their responses within a request
+    memoize = True
+    # If defined, concurrent calls made within this number of seconds of one another are
+    # sent to the server as a single request, containing up to `batch_max_size` calls
+    batch_window = SERVICE_BATCH_WINDOW
+    batch_max_size = SERVICE_BATCH_MAX_SIZE
 
     def __init__(self):
         self.warn_if_not_configured()
@@ -61,6 +84,43 @@ class BaseService(PackageDependent):
     def get_path_to_source(cls):
         return cls.path_to_source
 
+    @classmethod
+    def get_warmup_payloads(cls):
+        return cls.warmup_payloads
+
+    @classmethod
+    def get_fingerprinted_paths(cls):
+        """
+        Returns the paths of the files which determine the service's behaviour.
+        Cached results are invalidated when any of these files change, or when
+        a different version of a dependency is installed.
+        """
+        paths = (cls.get_path_to_source(),)
+        if cls.package_dependencies is not None:
+            for path in ('package.json', 'npm-shrinkwrap.json', 'package-lock.json'):
+                paths += (os.path.join(cls.package_dependencies, path),)
+            paths += get_package_paths(cls.package_dependencies)
+        return paths
+
+    @classmethod
+    def get_source_fingerprint(cls):
+        # Paths are fingerprinted relative to the service's source, so that the
+        # fingerprint is the same wherever the project is installed
+        return get_files_fingerprint(
+            cls.get_fingerprinted_paths(),
+            root=os.path.dirname(os.path.abspath(cls.get_path_to_source())),
+        )
+
+    def get_result_cache(self):
+        if not self.cache_results:
+            return None
+        if self.result_cache is not None:
+            return self.result_cache
+        return get_result_cache()
+
+    def get_result_cache_key(self, serialized_data):
+        return get_cache_key(self.get_name(), self.get_source_fingerprint(), serialized_data)
+
     def get_server(self):
         if self.server is not None:
             return self.server
@@ -90,19 +150,147 @@ class BaseService(PackageDependent):
         if self.__class__ not in self.get_server().services:
             raise ServerConfigMissingService(self.__class__)
 
+    def get_request_data(self, data):
+        serialized_data = json.dumps(data, cls=self.get_json_decoder())
+        return {
+            'cache_key': self.generate_cache_key(serialized_data, data),
+            'data': serialized_data
+        }
+
+    def get_references(self, data):
+        """
+        Returns a dictionary mapping the names of the arguments in `data` which
+        are sent by reference to a tuple of the digest and size of their value
+        """
+        references = {}
+        for name in self.reference_arguments:
+            if name in data:
+                serialized_value = json.dumps(data[name], cls=self.get_json_decoder(), sort_keys=True)
+                references[name] = (get_digest(serialized_value), len(serialized_value))
+        return references
+
+    def replace_references(self, data, references, upload=()):
+        """
+        Returns a copy of `data` with each argument sent by reference replaced
+        by its digest. The values of the arguments named in `upload` are included
+        alongside their digest.
+        """
+        data = dict(data)
+        for name, (digest, size) in references.items():
+            data[name] = build_reference(digest, data[name], size, upload=name in upload)
+        return data
+
+    def send_to_server(self, data, references, request_data):
+        """
+        Sends `request_data` to the server, uploading the values of any references
+        that the server has not received yet. If the server has since discarded
+        any of the values, the request is resent with every value included.
+        """
+        server = self.get_server()
+        # Requests are routed by their digests, so that a request which uploads a
+        # value is sent to the same process as the requests which follow it
+        routing_key = server.get_routing_key(self.get_name(), request_data)
+
+        uploaded_references = server.get_uploaded_references(routing_key)
+        upload = [name for name, (digest, size) in references.items() if digest not in uploaded_references]
+        if upload:
+            request_data = dict(
+                self.get_request_data(self.replace_references(data, references, upload)),
+                cache_key=request_data['cache_key'],
+            )
+
+        if self.batch_window:
+            # Calls which reference values must reach the process holding them
+            response = get_dispatcher(self).send(self, request_data, routing_key if references else None)
+        else:
+            response = server.send_request_to_service(
+                self.get_name(),
+                timeout=self.timeout,
+                data=request_data,
+                routing_key=routing_key,
+            )
+
+        if references and get_missing_references(response):
+            request_data = dict(
+                self.get_request_data(self.replace_references(data, references, references)),
+                cache_key=request_data['cache_key'],
+            )
+            response = server.send_request_to_service(
+                self.get_name(),
+                timeout=self.timeout,
+                data=request_data,
+                routing_key=routing_key,
+            )
+
+        if references and response.status_code == 200:
+            server.add_uploaded_references((digest for digest, size in references.values()), routing_key)
+
+        return response
+
     def send(self, **kwargs):
         self.ensure_loaded()
 
-        data = kwargs
-        serialized_data = json.dumps(data, cls=self.get_json_decoder())
+        references = self.get_references(kwargs)
+        data = self.get_request_data(self.replace_references(kwargs, references))
 
-        response = self.server.send_request_to_service(
-            self.get_name(),
-            timeout=self.timeout,
-            data={
-                'cache_key': self.generate_cache_key(serialized_data, data),
-                'data': serialized_data
-            }
-        )
+        memo_table = memoization.get_active_table() if self.memoize else None
+        if memo_table is not None:
+            memo_key = (self.get_name(), data['data'])
+            response = memo_table.get(memo_key)
+            if response is not None:
+                return response
+
+        response = None
+        result_cache = self.get_result_cache()
+        if result_cache is not None:
+            cache_key = self.get_result_cache_key(data['data'])
+            response = result_cache.get(cache_key)
+
+        if response is not None:
+            response = self.handle_response(response)
+        else:
+            response = self.handle_response(self.send_to_server(kwargs, references, data))
+            if result_cache is not None:
+                result_cache.set(cache_key, self.get_name(), response)
+
+        if memo_table is not None:
+            memo_table.set(memo_key, response)
+
+        return response
+
+    def send_background(self, **kwargs):
+        """
+        Queues a call to `send` in a background thread, and returns a
+        `django_node.background.BackgroundCall` immediately. The call's outcome is
+        written to the background result store, and passed to
+        `handle_background_result` and the BACKGROUND_CALLBACK setting.
+
+        Raises `BackgroundQueueFull` if too many calls are already waiting.
+        """
+        self.ensure_loaded()
+        return background.get_dispatcher().submit(self, kwargs)
+
+    def handle_background_result(self, outcome):
+        """
+        Called from a background thread with the outcome of each call made via
+        `send_background`. Override to act on the result of a call.
+        """
+        pass
+
+    def warmup(self):
+        """
+        Sends each of the warmup payloads to the service, without waiting for the
+        server to be marked as running. Returns the number of seconds taken.
+        """
+        started_at = time.time()
+
+        for payload in self.get_warmup_payloads():
+            response = self.get_server().send_request_to_service(
+                self.get_name(),
+                timeout=self.timeout,
+                data=self.get_request_data(payload),
+                ensure_started=False,
+            )
+            self.handle_response(response)
 
-        return self.handle_response(response)
\ No newline at end of file
+        return time.time() - started_at
\ No newline at end of file
@@ -0,0 +1,151 @@
+import sys
+import threading
+import requests
+from concurrent.futures import Future, TimeoutError
+from django.utils import six
+from .exceptions import NodeServerTimeoutError, BatchDispatchError
+
+# Keep in sync with runtime.js
+BATCH_KEY = '__django_node_batch__'
+
+
+def serialize_batch(serialized_items):
+    """
+    Returns the data for a batch request, embedding the already serialized data
+    of each item
+    """
+    return '{{"{key}": [{items}]}}'.format(key=BATCH_KEY, items=', '.join(serialized_items))
+
+
+def unpack_batch_response(response, count):
+    """
+    Returns a list of `requests.Response` objects, one for each of the `count`
+    items in a batch. If the batch failed as a whole, its response is returned
+    for every item.
+    """
+    if response.status_code != 200:
+        return [response] * count
+
+    responses = []
+    for result in response.json():
+        item_response = requests.Response()
+        item_response.status_code = result['status']
+        item_response.headers.update(result['headers'])
+        item_response._content = result['body'].encode('utf-8')
+        item_response.encoding = 'utf-8'
+        item_response.url = response.url
+        responses.append(item_response)
+    return responses
+
+
+class Batch(object):
+    def __init__(self):
+        self.items = []
+        self.is_full = threading.Event()
+
+
+class BatchDispatcher(object):
+    """
+    Collects the calls to a service made by concurrent threads within the
+    service's `batch_window` seconds of one another, or until `batch_max_size`
+    calls have been collected, and sends them to the server as a single request.
+
+    The first thread to make a call waits for the window to close, then sends
+    the batch and passes each of the waiting threads its response.
+
+    Calls with a cache key are sent on their own, so that the server can answer
+    them from its cache, as are calls with a routing key, so that they reach the
+    process which holds the values they reference.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.batch = None
+
+    def get_timeout(self, service):
+        if service.timeout is None:
+            return None
+        # The batch is only sent once the window has closed
+        return service.batch_window + service.timeout
+
+    def send(self, service, request_data, routing_key=None):
+        if request_data.get('cache_key') or routing_key is not None:
+            return self.send_request(service, request_data, routing_key)
+
+        future = Future()
+
+        with self.lock:
+            batch = self.batch
+            is_leader = batch is None
+            if is_leader:
+                batch = self.batch = Batch()
+            batch.items.append((request_data, future))
+            if len(batch.items) >= service.batch_max_size:
+                self.batch = None
+                batch.is_full.set()
+
+        if is_leader:
+            batch.is_full.wait(service.batch_window)
+            with self.lock:
+                if self.batch is batch:
+                    self.batch = None
+            self.dispatch(service, batch.items)
+
+        timeout = self.get_timeout(service)
+        try:
+            return future.result(timeout)
+        except TimeoutError:
+            six.reraise(
+                NodeServerTimeoutError,
+                NodeServerTimeoutError('A batched call to {name} did not complete within {timeout} seconds'.format(
+                    name=service.get_name(),
+                    timeout=timeout,
+                )),
+                sys.exc_info()[2]
+            )
+
+    def send_request(self, service, request_data, routing_key=None):
+        return service.get_server().send_request_to_service(
+            service.get_name(),
+            timeout=service.timeout,
+            data=request_data,
+            routing_key=routing_key,
+        )
+
+    def dispatch(self, service, items):
+        responses = None
+        error = None
+        try:
+            if len(items) == 1:
+                responses = [self.send_request(service, items[0][0])]
+            else:
+                response = self.send_request(service, {
+                    'data': serialize_batch([request_data['data'] for request_data, future in items])
+                })
+                responses = unpack_batch_response(response, len(items))
+        except Exception as e:
+            error = e
+        finally:
+            # Every waiting thread is released, even if the batch failed unexpectedly
+            for i, (request_data, future) in enumerate(items):
+                if responses is not None:
+                    future.set_result(responses[i])
+                else:
+                    future.set_exception(error or BatchDispatchError('The batch was not sent'))
+
+
+_dispatchers = {}
+_dispatchers_lock = threading.Lock()
+
+
+def get_dispatcher(service):
+    """
+    Returns the dispatcher shared by the instances of a service which use the
+    same server
+    """
+    key = (service.__class__, service.get_server())
+    with _dispatchers_lock:
+        dispatcher = _dispatchers.get(key)
+        if dispatcher is None:
+            dispatcher = _dispatchers[key] = BatchDispatcher()
+        return dispatcher
@@ -0,0 +1,32 @@
+import json
+import tempfile
+from django.utils import six
+from . import node
+from .exceptions import CodeCacheBuildError
+
+
+def build_code_cache(server, path, timeout=None):
+    """
+    Loads each of the server's services in a separate node process, and writes a
+    V8 code cache for every module they load to the directory at `path`.
+
+    Returns a dictionary containing the number of `files` cached and the total
+    `size` of the cache, in bytes.
+    """
+    with tempfile.NamedTemporaryFile() as config_file:
+        config_file.write(six.b(server.get_serialised_config()))
+        config_file.flush()
+
+        stderr, stdout = node.run(
+            server.path_to_runtime,
+            '--build-code-cache', path,
+            '--config', config_file.name,
+            timeout=timeout,
+        )
+
+    try:
+        return json.loads(stdout.strip().splitlines()[-1])
+    except (ValueError, IndexError):
+        raise CodeCacheBuildError(
+            'Failed to build a code cache at {path}. {output}'.format(path=path, output=stderr or stdout)
+        )
@@ -0,0 +1,89 @@
+import re
+import uuid
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from .settings import DEFERRED_RENDER_MAX_WORKERS
+from . import memoization
+
+_local = threading.local()
+
+
+def get_active_renderer():
+    return getattr(_local, 'renderer', None)
+
+
+class DeferredRenderer(object):
+    """
+    Collects service calls and returns placeholders in their place. Once the
+    calls have been collected, `render` dispatches them concurrently and
+    substitutes the responses into content containing the placeholders.
+
+    Use as a context manager to make the renderer active for the current thread,
+    so that the `render_service` template tag defers its calls to it.
+    """
+
+    max_workers = DEFERRED_RENDER_MAX_WORKERS
+
+    def __init__(self, max_workers=None):
+        if max_workers is not None:
+            self.max_workers = max_workers
+        # Placeholders include a random token, so that content rendered by a
+        # service or provided by a user cannot be mistaken for them
+        self.token = uuid.uuid4().hex
+        self.placeholder_regex = re.compile(
+            r'<!--django-node-deferred:{token}:(\d+)-->'.format(token=self.token)
+        )
+        self.calls = []
+        self.previous_renderer = None
+
+    def __enter__(self):
+        self.previous_renderer = get_active_renderer()
+        _local.renderer = self
+        return self
+
+    def __exit__(self, *args):
+        _local.renderer = self.previous_renderer
+        self.previous_renderer = None
+
+    def defer(self, service, **kwargs):
+        """
+        Collects a call to `service.send` and returns a placeholder for its response
+        """
+        self.calls.append((service, kwargs))
+        return '<!--django-node-deferred:{token}:{index}-->'.format(token=self.token, index=len(self.calls) - 1)
+
+    def dispatch(self):
+        """
+        Sends the collected calls and returns a list of their responses' text. If any
+        of the calls fail, the first exception is raised.
+        """
+        calls, self.calls = self.calls, []
+
+        if len(calls) <= 1 or self.max_workers <= 1:
+            return [service.send(**kwargs).text for service, kwargs in calls]
+
+        # Share the request's memo table with the threads sending the calls
+        memo_table = memoization.get_active_table()
+
+        def send(call):
+            service, kwargs = call
+            previous_table = memoization.activate(memo_table)
+            try:
+                return service.send(**kwargs).text
+            finally:
+                memoization.deactivate(previous_table)
+
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(calls))) as executor:
+            return list(executor.map(send, calls))
+
+    def render(self, content):
+        """
+        Returns `content` with the placeholders replaced by the responses to the
+        collected calls
+        """
+        if not self.calls:
+            return content
+
+        output = self.dispatch()
+
+        return self.placeholder_regex.sub(lambda match: output[int(match.group(1))], content)
@@ -14,6 +14,14 @@ class MalformedVersionInput(Exception):
     pass
 
 
+class CommandTimeoutError(Exception):
+    pass
+
+
+class CommandCancelledError(Exception):
+    pass
+
+
 class NpmInstallArgumentsError(Exception):
     pass
 
@@ -59,4 +67,28 @@ class MalformedServiceConfig(Exception):
 
 
 class ModuleDoesNotContainAnyServices(Exception):
-    pass
\ No newline at end of file
+    pass
+
+
+class InvalidServiceManifest(Exception):
+    pass
+
+
+class PrerenderError(Exception):
+    pass
+
+
+class CodeCacheBuildError(Exception):
+    pass
+
+
+class BatchDispatchError(Exception):
+    pass
+
+
+class BackgroundQueueFull(Exception):
+    pass
+
+
+class PackageStoreError(Exception):
+    pass
@@ -0,0 +1,236 @@
+import os
+import json
+import time
+import inspect
+import threading
+from requests.exceptions import ReadTimeout
+from django.utils import six
+from .node_server import NodeServer, TIMEOUT_KEY
+from .services import EchoService, PingService, StatsService, ReloadService
+from .settings import FAKE_SERVER_RECORDINGS, FAKE_SERVER_RECORD
+from .result_cache import build_response
+from .references import REFERENCE_KEY, MISSING_REFERENCES_HEADER
+from .batching import BATCH_KEY
+
+
+def echo(data):
+    if not data.get('echo'):
+        return 500, 'Missing `echo` in data'
+    return data['echo']
+
+
+def ping(data):
+    return PingService.expected_output
+
+
+def stats(data):
+    return {
+        'pid': os.getpid(),
+        'uptime': 0,
+        'memory': {},
+        'heap': None,
+        'event_loop_lag': {'last': 0, 'max': 0},
+        'gc': {'available': False, 'count': 0, 'total_duration': 0, 'max_duration': 0},
+        'active_handles': None,
+        'active_requests': None,
+        'requests': {'dropped': 0, 'cancelled': 0},
+        'code_cache': {'enabled': False, 'hits': 0, 'misses': 0, 'rejected': 0},
+    }
+
+
+def reload(data):
+    # Stubs are already called afresh on each request
+    return {}
+
+
+def build_stub_response(output):
+    """
+    Converts the output of a stub into a response. Stubs can return a string,
+    a JSON serializable object, a `(status_code, output)` tuple, or a response.
+    """
+    if isinstance(output, tuple):
+        status_code, output = output
+    else:
+        status_code = 200
+
+    if hasattr(output, 'status_code'):
+        return output
+
+    content_type = 'text/html; charset=utf-8'
+    if not isinstance(output, (bytes, six.text_type)):
+        output = json.dumps(output)
+        content_type = 'application/json'
+    if not isinstance(output, bytes):
+        output = output.encode('utf-8')
+
+    return build_response(status_code, output, content_type=content_type, encoding='utf-8')
+
+
+class FakeNodeServer(NodeServer):
+    """
+    A server for test suites, which answers requests in the python process via
+    stub handlers or recorded responses, and never requires node.
+
+    Stubs are registered with `register(service, handler)`. Handlers are called
+    with the data sent to the service, and can return a string, a JSON
+    serializable object, a `(status_code, output)` tuple or a response. Handlers
+    which take longer than the service's timeout cause a timeout error. As stubs
+    run in the calling thread, the error is only raised once the stub returns.
+
+    If `recordings` is a path to a JSON file, requests without a stub are
+    answered with the responses recorded in it. If `record` is True, those
+    requests are instead sent to a real server, and its responses are added
+    to the file.
+    """
+
+    recordings = FAKE_SERVER_RECORDINGS
+    record = FAKE_SERVER_RECORD
+    real_server = None
+    requires_node = False
+    install_package_dependencies = False
+
+    def __init__(self, recordings=None, record=None):
+        if recordings is not None:
+            self.recordings = recordings
+        if record is not None:
+            self.record = record
+        super(FakeNodeServer, self).__init__()
+        self.recording_lock = threading.Lock()
+        self.recorded_responses = self.load_recordings()
+        self.reference_values = {}
+        self.stubs = {
+            EchoService.get_name(): echo,
+            PingService.get_name(): ping,
+            StatsService.get_name(): stats,
+            ReloadService.get_name(): reload,
+        }
+
+    def install_dependencies(self):
+        pass
+
+    def register(self, service, handler):
+        """
+        Registers `handler` as the stub for `service`, which can be a service
+        class, its name or its import path
+        """
+        if inspect.isclass(service):
+            name = service.get_name()
+        else:
+            name = self.get_service(service).get_name()
+        self.stubs[name] = handler
+
+    def unregister(self, service):
+        name = service.get_name() if inspect.isclass(service) else self.get_service(service).get_name()
+        self.stubs.pop(name, None)
+
+    def get_server_url(self):
+        return 'fake://{name}'.format(name=self.__class__.__name__)
+
+    def start(self, debug=None, use_existing_process=None, blocking=None):
+        self.clear_health()
+        self.request_count = 0
+        self.started_at = time.time()
+        self.is_running = True
+
+    def stop(self):
+        if self.real_server is not None:
+            self.real_server.stop()
+        self.is_running = False
+        self.clear_health()
+
+    def supports_file_transport(self):
+        return False
+
+    def load_recordings(self):
+        if not self.recordings or not os.path.exists(self.recordings):
+            return {}
+        with open(self.recordings, 'r') as recordings_file:
+            return json.load(recordings_file)
+
+    def save_recording(self, key, response):
+        with self.recording_lock:
+            self.recorded_responses[key] = {
+                'status_code': response.status_code,
+                'content_type': response.headers.get('Content-Type'),
+                'text': response.text,
+            }
+            with open(self.recordings, 'w') as recordings_file:
+                json.dump(self.recorded_responses, recordings_file, indent=2, sort_keys=True)
+
+    def get_real_server(self):
+        with self.recording_lock:
+            if self.real_server is None:
+                self.real_server = NodeServer()
+                self.real_server.services = self.services
+        return self.real_server
+
+    def resolve_references(self, data):
+        """
+        Replaces the references in `data` with their values, as the server would.
+        Returns the digests of any references whose values have not been sent.
+        """
+        missing = []
+        for key, value in data.items():
+            if isinstance(value, dict) and REFERENCE_KEY in value:
+                if 'value' in value:
+                    self.reference_values[value[REFERENCE_KEY]] = value['value']
+                if value[REFERENCE_KEY] in self.reference_values:
+                    data[key] = self.reference_values[value[REFERENCE_KEY]]
+                else:
+                    missing.append(value[REFERENCE_KEY])
+        return missing
+
+    def post(self, absolute_url, endpoint, timeout=None, data=None, routing_key=None):
+        serialized_data = data.get('data') if data else None
+        data = json.loads(serialized_data) if serialized_data else {}
+        data.pop(TIMEOUT_KEY, None)
+
+        if BATCH_KEY in data:
+            responses = [
+                self.post(absolute_url, endpoint, timeout=timeout, data={'data': json.dumps(item)})
+                for item in data[BATCH_KEY]
+            ]
+            return build_stub_response([{
+                'status': response.status_code,
+                'headers': dict(response.headers),
+                'body': response.text,
+            } for response in responses])
+
+        missing = self.resolve_references(data)
+        if missing:
+            response = build_stub_response((409, {'missing_references': missing}))
+            response.headers[MISSING_REFERENCES_HEADER] = ','.join(missing)
+            return response
+
+        handler = self.stubs.get(endpoint)
+        if handler is not None:
+            started_at = time.time()
+            output = handler(data)
+            if timeout is not None and time.time() - started_at > timeout:
+                raise ReadTimeout('The stub for {endpoint} took longer than {timeout} seconds'.format(
+                    endpoint=endpoint,
+                    timeout=timeout,
+                ))
+            return build_stub_response(output)
+
+        key = '{endpoint} {data}'.format(endpoint=endpoint, data=json.dumps(data, sort_keys=True))
+
+        if self.record and self.recordings:
+            response = self.get_real_server().send_request_to_service(
+                endpoint,
+                timeout=timeout,
+                data={'data': json.dumps(data)},
+            )
+            self.save_recording(key, response)
+            return response
+
+        recorded = self.recorded_responses.get(key)
+        if recorded is not None:
+            return build_response(
+                recorded['status_code'],
+                recorded['text'].encode('utf-8'),
+                content_type=recorded['content_type'],
+                encoding='utf-8',
+            )
+
+        return build_stub_response((404, 'No stub or recorded response for {key}'.format(key=key)))
@@ -0,0 +1,72 @@
+import os
+import json
+import shutil
+import tempfile
+from .utils import extend_serialized_dict
+
+# Keep in sync with runtime.js
+TRANSPORT_KEY = '__django_node_transport__'
+FILE_HEADER = 'X-Django-Node-File'
+
+# Shared memory is preferred, as files written to it never touch the disk
+SHARED_MEMORY_DIRECTORY = '/dev/shm'
+
+
+def create_directory(parent=None):
+    """
+    Returns the path to a new directory in which payloads are exchanged with the
+    server. Defaults to a directory in shared memory, if available.
+    """
+    if parent is None and os.path.isdir(SHARED_MEMORY_DIRECTORY):
+        parent = SHARED_MEMORY_DIRECTORY
+    return tempfile.mkdtemp(prefix='django-node-', dir=parent)
+
+
+def remove_directory(directory):
+    shutil.rmtree(directory, ignore_errors=True)
+
+
+def remove_file(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def prepare_request_data(serialized_data, directory, threshold):
+    """
+    Returns a tuple of the data to send in place of `serialized_data`, and the
+    path to the file the data was written to, if any.
+
+    Data larger than `threshold` bytes is written to a file in `directory`, and
+    only the file's path is sent. Either way, the server is told to write any
+    response larger than `threshold` bytes to a file. The server only reads and
+    writes files in the directory defined in its config, which must be `directory`.
+    """
+    transport = {'threshold': threshold}
+
+    encoded_data = serialized_data.encode('utf-8')
+    if len(encoded_data) > threshold:
+        fd, path = tempfile.mkstemp(prefix='request-', suffix='.json', dir=directory)
+        with os.fdopen(fd, 'wb') as request_file:
+            request_file.write(encoded_data)
+        transport['path'] = path
+        return json.dumps({TRANSPORT_KEY: transport}), path
+
+    return extend_serialized_dict(serialized_data, {TRANSPORT_KEY: transport}), None
+
+
+def read_response(response):
+    """
+    Replaces the content of a response which the server wrote to a file with
+    the file's contents, and removes the file
+    """
+    path = response.headers.get(FILE_HEADER)
+    if path:
+        try:
+            with open(path, 'rb') as response_file:
+                response._content = response_file.read()
+        finally:
+            remove_file(path)
+        response.headers['Content-Length'] = str(len(response._content))
+    return response
@@ -0,0 +1,61 @@
+import bisect
+import hashlib
+
+
+def hash_key(key):
+    return int(hashlib.md5(key.encode('utf-8')).hexdigest()[:16], 16)
+
+
+class HashRing(object):
+    """
+    A consistent hash ring, which maps keys to nodes such that adding or
+    removing a node only moves the keys assigned to that node.
+
+    Each node is placed on the ring `replicas` times, which evens out the
+    share of keys assigned to each node.
+    """
+
+    replicas = 100
+
+    def __init__(self, nodes=(), replicas=None):
+        if replicas is not None:
+            self.replicas = replicas
+        self.hashes = []
+        self.nodes = []
+        for node in nodes:
+            self.add(node)
+
+    def add(self, node):
+        for i in range(self.replicas):
+            point = hash_key('{node}#{i}'.format(node=node, i=i))
+            index = bisect.bisect(self.hashes, point)
+            self.hashes.insert(index, point)
+            self.nodes.insert(index, node)
+
+    def remove(self, node):
+        points = [(point, other) for point, other in zip(self.hashes, self.nodes) if other != node]
+        self.hashes = [point for point, other in points]
+        self.nodes = [other for point, other in points]
+
+    def get_nodes(self, key):
+        """
+        Returns the distinct nodes in the order they follow `key` around the ring.
+        The first node is the key's owner, and the rest are its fallbacks.
+        """
+        if not self.hashes:
+            return []
+
+        count = len(set(self.nodes))
+        start = bisect.bisect(self.hashes, hash_key(key))
+        nodes = []
+        for i in range(len(self.nodes)):
+            node = self.nodes[(start + i) % len(self.nodes)]
+            if node not in nodes:
+                nodes.append(node)
+                if len(nodes) == count:
+                    break
+        return nodes
+
+    def get_node(self, key):
+        nodes = self.get_nodes(key)
+        return nodes[0] if nodes else None
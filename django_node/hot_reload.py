@@ -0,0 +1,97 @@
+import os
+import logging
+import threading
+from .settings import SERVER_HOT_RELOAD_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+
+def get_mtime(path):
+    try:
+        return os.stat(path).st_mtime
+    except OSError:
+        return None
+
+
+class SourceWatcher(object):
+    """
+    Polls the sources of a server's services, and the local modules that they
+    require, every `interval` seconds in a background thread. Services whose
+    files have changed are reloaded within the server's process.
+    """
+
+    def __init__(self, server, interval=None):
+        self.server = server
+        self.interval = interval if interval is not None else SERVER_HOT_RELOAD_INTERVAL
+        self.stopped = threading.Event()
+        self.thread = None
+        # The filenames used by each service, keyed by the service's name
+        self.dependencies = None
+        # The modification times of each service's files when it was last loaded
+        self.mtimes = {}
+        # The last error raised by each service which failed to reload
+        self.errors = {}
+
+    def start(self):
+        self.stopped.clear()
+        self.thread = threading.Thread(target=self.run)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        if self.thread is not None and self.thread is not threading.current_thread():
+            self.thread.join()
+        self.thread = None
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            try:
+                self.check()
+            except Exception as e:
+                logger.warning('Failed to check for changes to the services: {error}'.format(error=e))
+
+    def update(self, output):
+        if self.dependencies is None:
+            self.dependencies = {}
+        for name, result in output.items():
+            if result['error']:
+                # The previous times are kept, so that the service is retried
+                continue
+            self.dependencies[name] = result['dependencies']
+            self.mtimes[name] = dict((path, get_mtime(path)) for path in result['dependencies'])
+
+    def get_changed_services(self):
+        return [
+            name for name, paths in self.dependencies.items()
+            if any(get_mtime(path) != self.mtimes[name].get(path) for path in paths)
+        ]
+
+    def check(self):
+        """
+        Reloads any services whose files have changed since the last check.
+        Returns the output of the reload, or None if nothing changed.
+        """
+        if self.dependencies is None:
+            # The server may still be starting
+            if self.server.ping():
+                self.update(self.server.reload_services(reload=False))
+            return
+
+        changed = self.get_changed_services()
+        if not changed:
+            return
+
+        output = self.server.reload_services(changed)
+        self.update(output)
+
+        for name, result in output.items():
+            if result['reloaded']:
+                self.errors.pop(name, None)
+                self.server.log('Reloaded {name}'.format(name=name))
+            elif self.errors.get(name) != result['error']:
+                # Failed services are retried at each check, but each error is only logged once
+                self.errors[name] = result['error']
+                logger.warning('Failed to reload {name}: {error}'.format(name=name, error=result['error']))
+
+        return output
@@ -0,0 +1,134 @@
+import math
+import time
+import threading
+import itertools
+from concurrent.futures import ThreadPoolExecutor
+from .exceptions import NodeServerTimeoutError
+
+
+def percentile(sorted_values, percent):
+    """
+    Returns the value at `percent` of `sorted_values`, using the nearest-rank method
+    """
+    if not sorted_values:
+        return None
+    rank = int(math.ceil(percent / 100.0 * len(sorted_values))) - 1
+    return sorted_values[max(0, min(rank, len(sorted_values) - 1))]
+
+
+def get_rss(server):
+    try:
+        return server.stats()['memory']['rss']
+    except Exception:
+        return None
+
+
+class LoadTestResults(object):
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = []
+        self.errors = 0
+        self.timeouts = 0
+        self.error_messages = {}
+
+    def record(self, latency, error=None):
+        with self.lock:
+            if error is None:
+                self.latencies.append(latency)
+            elif isinstance(error, NodeServerTimeoutError):
+                self.timeouts += 1
+            else:
+                self.errors += 1
+                message = '{type}: {error}'.format(type=error.__class__.__name__, error=error)[:200]
+                self.error_messages[message] = self.error_messages.get(message, 0) + 1
+
+
+def run_load_test(service, payloads, concurrency=None, duration=None, rate=None):
+    """
+    Sends requests to `service` for `duration` seconds via `service.send`, and
+    returns a dictionary describing the throughput, latencies and failures.
+
+    `payloads` is a list of keyword argument dictionaries, which are cycled
+    through. By default, `concurrency` threads send requests back to back. If
+    `rate` is defined, requests are instead started at a fixed number per second,
+    with at most `concurrency` in progress. Latencies of requests started at a
+    fixed rate include any time spent waiting for a thread.
+    """
+    if concurrency is None:
+        concurrency = 1
+    if duration is None:
+        duration = 10
+    if not payloads:
+        payloads = [{}]
+
+    server = service.get_server()
+    server.start()
+
+    rss_before = get_rss(server)
+    results = LoadTestResults()
+    payload_cycle = itertools.cycle(payloads)
+    payload_lock = threading.Lock()
+
+    def next_payload():
+        with payload_lock:
+            return next(payload_cycle)
+
+    def send(scheduled_at):
+        try:
+            service.send(**next_payload())
+        except Exception as e:
+            results.record(time.time() - scheduled_at, e)
+        else:
+            results.record(time.time() - scheduled_at)
+
+    started_at = time.time()
+    deadline = started_at + duration
+
+    if rate:
+        interval = 1.0 / rate
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            for i in itertools.count():
+                scheduled_at = started_at + i * interval
+                if scheduled_at >= deadline:
+                    break
+                delay = scheduled_at - time.time()
+                if delay > 0:
+                    time.sleep(delay)
+                executor.submit(send, scheduled_at)
+    else:
+        def worker():
+            while time.time() < deadline:
+                send(time.time())
+
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            for i in range(concurrency):
+                executor.submit(worker)
+
+    elapsed = time.time() - started_at
+    rss_after = get_rss(server)
+
+    latencies = sorted(results.latencies)
+    completed = len(latencies) + results.errors + results.timeouts
+
+    return {
+        'service': service.get_name(),
+        'concurrency': concurrency,
+        'rate': rate,
+        'duration': elapsed,
+        'service_timeout': service.timeout,
+        'requests': completed,
+        'successful_requests': len(latencies),
+        'throughput': len(latencies) / elapsed if elapsed else None,
+        'latency': {
+            'p50': percentile(latencies, 50),
+            'p90': percentile(latencies, 90),
+            'p99': percentile(latencies, 99),
+            'max': latencies[-1] if latencies else None,
+            'mean': sum(latencies) / len(latencies) if latencies else None,
+        },
+        'errors': results.errors,
+        'error_messages': results.error_messages,
+        'timeouts': results.timeouts,
+        'rss_before': rss_before,
+        'rss_after': rss_after,
+    }
@@ -0,0 +1,30 @@
+from optparse import make_option
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    option_list = (
+        make_option(
+            '-o', '--output',
+            dest='output',
+            help='The directory to write the code cache to. Defaults to the SERVER_CODE_CACHE setting',
+        ),
+    ) + BaseCommand.option_list
+
+    def handle(self, *args, **options):
+        from django_node.settings import SERVER_CODE_CACHE
+        from django_node.code_cache import build_code_cache
+        from django_node.server import server
+
+        path = options.get('output') or SERVER_CODE_CACHE
+        if not path:
+            print('No output path provided and the SERVER_CODE_CACHE setting is not defined')
+            return
+
+        output = build_code_cache(server, path)
+
+        print('Wrote a code cache of {files} modules ({size} bytes) to {path}'.format(
+            files=output['files'],
+            size=output['size'],
+            path=path,
+        ))
@@ -0,0 +1,30 @@
+from optparse import make_option
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    option_list = (
+        make_option(
+            '-o', '--output',
+            dest='output',
+            help='The path to write the manifest to. Defaults to the SERVICE_MANIFEST setting',
+        ),
+    ) + BaseCommand.option_list
+
+    def handle(self, *args, **options):
+        from django_node.settings import SERVICE_MANIFEST
+        from django_node.manifest import write_manifest
+        from django_node.utils import discover_services
+        from django_node.server import server
+
+        path = options.get('output') or SERVICE_MANIFEST
+        if not path:
+            print('No output path provided and the SERVICE_MANIFEST setting is not defined')
+            return
+
+        # Always inspect the modules, rather than relying on an existing manifest
+        services = discover_services(server.service_config)
+
+        write_manifest(server, services, path)
+
+        print('Wrote a manifest of {count} services to {path}'.format(count=len(services), path=path))
@@ -0,0 +1,98 @@
+import json
+from optparse import make_option
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    args = '<service name or import path>'
+
+    option_list = (
+        make_option(
+            '-c', '--concurrency',
+            dest='concurrency',
+            type='int',
+            default=1,
+            help='The number of requests in progress at once',
+        ),
+        make_option(
+            '-d', '--duration',
+            dest='duration',
+            type='float',
+            default=10,
+            help='The number of seconds to send requests for',
+        ),
+        make_option(
+            '-r', '--rate',
+            dest='rate',
+            type='float',
+            help='Start requests at a fixed number per second, rather than back to back',
+        ),
+        make_option(
+            '-p', '--payload',
+            dest='payload',
+            help='A JSON file containing the keyword arguments to send, or a list of them to cycle through',
+        ),
+        make_option(
+            '-o', '--output',
+            dest='output',
+            help='The path to write the results to, as JSON',
+        ),
+    ) + BaseCommand.option_list
+
+    def handle(self, *args, **options):
+        from django_node.server import server
+        from django_node.load_test import run_load_test
+        from django_node.exceptions import ServerConfigMissingService
+
+        if len(args) != 1:
+            raise CommandError('Provide the name or import path of a single service')
+
+        try:
+            service = server.get_service(args[0])()
+        except ServerConfigMissingService:
+            raise CommandError('Cannot find a service matching "{service}"'.format(service=args[0]))
+
+        payloads = [{}]
+        if options.get('payload'):
+            with open(options['payload'], 'r') as payload_file:
+                payloads = json.load(payload_file)
+            if isinstance(payloads, dict):
+                payloads = [payloads]
+
+        print('Sending requests to {service} for {duration} seconds...'.format(
+            service=service.get_name(),
+            duration=options['duration'],
+        ))
+
+        results = run_load_test(
+            service,
+            payloads,
+            concurrency=options['concurrency'],
+            duration=options['duration'],
+            rate=options.get('rate'),
+        )
+
+        def format_latency(seconds):
+            return '{0:.1f}ms'.format(seconds * 1000) if seconds is not None else '-'
+
+        print('Requests: {requests} ({throughput:.1f}/s)'.format(
+            requests=results['requests'],
+            throughput=results['throughput'] or 0,
+        ))
+        print('Latency: p50 {p50}, p90 {p90}, p99 {p99}, max {max}'.format(
+            **dict((key, format_latency(value)) for key, value in results['latency'].items())
+        ))
+        print('Errors: {errors}, timeouts: {timeouts} (timeout is {timeout}s)'.format(
+            errors=results['errors'],
+            timeouts=results['timeouts'],
+            timeout=results['service_timeout'],
+        ))
+        print('Node RSS: {before} bytes before, {after} bytes after'.format(
+            before=results['rss_before'],
+            after=results['rss_after'],
+        ))
+
+        if options.get('output'):
+            with open(options['output'], 'w') as output_file:
+                json.dump(results, output_file, indent=2)
+            print('Wrote {path}'.format(path=options['output']))
@@ -0,0 +1,33 @@
+from optparse import make_option
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    option_list = (
+        make_option(
+            '--collect-garbage',
+            dest='collect_garbage',
+            action='store_true',
+            default=False,
+            help='Remove the stored files which are no longer linked into any directory',
+        ),
+    ) + BaseCommand.option_list
+
+    def handle(self, *args, **options):
+        from django_node.package_store import get_package_store
+
+        store = get_package_store()
+        if store is None:
+            print('The PACKAGE_STORE setting is not defined')
+            return
+
+        if options.get('collect_garbage'):
+            removed, freed = store.collect_garbage()
+            print('Removed {removed} unused files ({freed} bytes)'.format(removed=removed, freed=freed))
+
+        report = store.report()
+
+        print('{path} stores {files} files ({size} bytes) with {links} links, saving {saved} bytes'.format(
+            path=store.path,
+            **report
+        ))
@@ -0,0 +1,45 @@
+import json
+from optparse import make_option
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    args = '<path to manifest>'
+
+    option_list = (
+        make_option(
+            '-c', '--concurrency',
+            dest='concurrency',
+            type='int',
+            default=4,
+            help='The number of calls to render at once',
+        ),
+    ) + BaseCommand.option_list
+
+    def handle(self, *args, **options):
+        from django_node.server import server
+        from django_node.prerender import prerender
+        from django_node.exceptions import PrerenderError, ServerConfigMissingService
+
+        if len(args) != 1:
+            raise CommandError(
+                'Provide the path to a JSON file containing a list of {"service": ..., "kwargs": {...}} objects'
+            )
+
+        with open(args[0], 'r') as manifest_file:
+            entries = json.load(manifest_file)
+
+        print('Prerendering {count} service calls...'.format(count=len(entries)))
+
+        try:
+            rendered, failures = prerender(server, entries, concurrency=options['concurrency'])
+        except (PrerenderError, ServerConfigMissingService) as e:
+            raise CommandError(*e.args)
+
+        for entry, error in failures:
+            print('Failed to prerender {entry}: {error}'.format(entry=json.dumps(entry), error=error))
+
+        print('Prerendered {rendered} service calls'.format(rendered=rendered))
+
+        if failures:
+            raise CommandError('{count} service calls failed to prerender'.format(count=len(failures)))
@@ -0,0 +1,69 @@
+import os
+import time
+from optparse import make_option
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    option_list = (
+        make_option(
+            '-s', '--seconds',
+            dest='seconds',
+            type='float',
+            default=10,
+            help='The number of seconds to capture a CPU profile over',
+        ),
+        make_option(
+            '--heap',
+            dest='heap',
+            action='store_true',
+            default=False,
+            help='Capture a heap snapshot, rather than a CPU profile',
+        ),
+        make_option(
+            '--service',
+            dest='services',
+            action='append',
+            help='Reduce the CPU profile to the calls made from within a service. Accepts a service name or import path',
+        ),
+        make_option(
+            '-o', '--output',
+            dest='output',
+            help='The path to write the profile to',
+        ),
+    ) + BaseCommand.option_list
+
+    def handle(self, *args, **options):
+        from django_node.server import server
+        from django_node.profiling import CPU_PROFILE, HEAP_SNAPSHOT, FILE_EXTENSIONS
+        from django_node.services import ProfileService
+
+        if ProfileService not in server.services:
+            print('Profiling is disabled, set the SERVER_PROFILE_ENABLED setting to True to enable it')
+            return
+
+        if not server.ping():
+            print('No server is running at {server_url}'.format(server_url=server.get_server_url()))
+            return
+
+        heap = options.get('heap')
+        path = options.get('output')
+        if not path:
+            path = os.path.abspath('node-{timestamp}{extension}'.format(
+                timestamp=time.strftime('%Y%m%d-%H%M%S'),
+                extension=FILE_EXTENSIONS[HEAP_SNAPSHOT if heap else CPU_PROFILE],
+            ))
+
+        if heap:
+            print('Capturing heap snapshot...')
+        else:
+            print('Capturing CPU profile for {seconds} seconds...'.format(seconds=options['seconds']))
+
+        server.profile(
+            seconds=options['seconds'],
+            heap=heap,
+            services=options.get('services'),
+            path=path,
+        )
+
+        print('Wrote {path}'.format(path=path))
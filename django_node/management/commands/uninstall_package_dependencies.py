@@ -17,4 +17,13 @@ class Command(BaseCommand):
         from django_node.server import server
         for dependent in (server,) + server.services:
             print('Uninstalling package dependencies for {dependent}'.format(dependent=dependent))
-            dependent.uninstall_dependencies()
\ No newline at end of file
+            dependent.uninstall_dependencies()
+
+        from django_node.package_store import get_package_store
+        store = get_package_store()
+        if store is not None:
+            removed, freed = store.collect_garbage()
+            print('Removed {removed} unused files ({freed} bytes) from the package store'.format(
+                removed=removed,
+                freed=freed,
+            ))
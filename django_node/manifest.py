@@ -0,0 +1,112 @@
+import os
+import json
+import hashlib
+from .exceptions import InvalidServiceManifest, DynamicImportError
+from .utils import dynamic_import_attribute
+
+MANIFEST_VERSION = 1
+
+
+def checksum_file(path):
+    hasher = hashlib.sha1()
+    with open(path, 'rb') as source_file:
+        for chunk in iter(lambda: source_file.read(65536), b''):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def get_import_path(service):
+    return '{module_path}.{class_name}'.format(
+        module_path=service.__module__,
+        class_name=service.__name__,
+    )
+
+
+def compile_manifest(server, services):
+    """
+    Returns a dictionary describing the services discovered by `server`, which
+    can be serialised and loaded by `load_manifest`.
+    """
+    compiled = ()
+    for service in services:
+        path_to_source = service.get_path_to_source()
+        compiled += ({
+            'import_path': get_import_path(service),
+            'name': service.get_name(),
+            'path_to_source': path_to_source,
+            'checksum': checksum_file(path_to_source),
+        },)
+
+    return {
+        'version': MANIFEST_VERSION,
+        'service_config': server.service_config,
+        'services': compiled,
+    }
+
+
+def write_manifest(server, services, path):
+    manifest = compile_manifest(server, services)
+    with open(path, 'w') as manifest_file:
+        json.dump(manifest, manifest_file, indent=2)
+    return manifest
+
+
+def load_manifest(path, service_config):
+    """
+    Imports the services listed in the manifest at `path`, without inspecting
+    the modules in `service_config` or validating the services.
+
+    Raises InvalidServiceManifest if the manifest is missing, was compiled from a
+    different `service_config`, or if a service's source has changed since it
+    was compiled.
+    """
+    if not os.path.exists(path):
+        raise InvalidServiceManifest('Manifest does not exist at {path}'.format(path=path))
+
+    try:
+        with open(path, 'r') as manifest_file:
+            manifest = json.load(manifest_file)
+    except ValueError as e:
+        raise InvalidServiceManifest('Failed to parse manifest at {path}'.format(path=path), *e.args)
+
+    if manifest.get('version') != MANIFEST_VERSION:
+        raise InvalidServiceManifest('Manifest at {path} was compiled by another version'.format(path=path))
+
+    if tuple(manifest['service_config']) != tuple(service_config):
+        raise InvalidServiceManifest(
+            'Manifest at {path} was compiled with the services {manifest_config}, but the current services '
+            'are {service_config}'.format(
+                path=path,
+                manifest_config=tuple(manifest['service_config']),
+                service_config=tuple(service_config),
+            )
+        )
+
+    services = ()
+    for entry in manifest['services']:
+        path_to_source = entry['path_to_source']
+        if not os.path.exists(path_to_source) or checksum_file(path_to_source) != entry['checksum']:
+            raise InvalidServiceManifest(
+                'The source of {import_path} has changed since the manifest was compiled'.format(
+                    import_path=entry['import_path'],
+                )
+            )
+
+        try:
+            service = dynamic_import_attribute(entry['import_path'])
+        except DynamicImportError as e:
+            raise InvalidServiceManifest(*e.args)
+
+        if service.get_path_to_source() != path_to_source:
+            raise InvalidServiceManifest(
+                'The path to the source of {import_path} has changed since the manifest was compiled'.format(
+                    import_path=entry['import_path'],
+                )
+            )
+
+        if service.name is None:
+            service.name = entry['name']
+
+        services += (service,)
+
+    return services
@@ -0,0 +1,65 @@
+import threading
+try:
+    import contextvars
+except ImportError:
+    contextvars = None
+
+# The active table is scoped to the current context where contextvars are
+# available, so that coroutines sharing a thread do not share a table
+if contextvars is not None:
+    _active_table = contextvars.ContextVar('django_node_memo_table', default=None)
+else:
+    _local = threading.local()
+
+
+class MemoTable(object):
+    """
+    Stores the responses to the service calls made while handling a single
+    request, keyed by the service's name and the data sent.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.responses = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self.lock:
+            response = self.responses.get(key)
+            if response is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return response
+
+    def set(self, key, response):
+        with self.lock:
+            self.responses[key] = response
+
+
+def get_active_table():
+    if contextvars is not None:
+        return _active_table.get()
+    return getattr(_local, 'table', None)
+
+
+def _set_active_table(table):
+    if contextvars is not None:
+        _active_table.set(table)
+    else:
+        _local.table = table
+
+
+def activate(table):
+    """
+    Makes `table` the memo table for the current context, or thread, and
+    returns the table that was previously active
+    """
+    previous_table = get_active_table()
+    _set_active_table(table)
+    return previous_table
+
+
+def deactivate(previous_table=None):
+    _set_active_table(previous_table)
@@ -0,0 +1,63 @@
+import logging
+from django.conf import settings
+from . import memoization
+try:
+    from django.utils.deprecation import MiddlewareMixin
+except ImportError:
+    MiddlewareMixin = object
+
+logger = logging.getLogger(__name__)
+
+MEMO_HEADER = 'X-Django-Node-Memo'
+
+
+class ServiceMemoizationMiddleware(MiddlewareMixin):
+    """
+    Memoizes the service calls made while handling a request, so that identical
+    calls are only sent to the server once per request.
+
+    Services which respond differently to identical data should set `memoize`
+    to False. If DEBUG is True, the number of hits and misses is added to the
+    response's headers.
+    """
+
+    def __call__(self, request):
+        table = memoization.MemoTable()
+        previous_table = memoization.activate(table)
+        try:
+            response = self.get_response(request)
+        finally:
+            # The table is never left active on the thread, even if the view raises
+            memoization.deactivate(previous_table)
+        return self.report(request, response, table)
+
+    # Used by MIDDLEWARE_CLASSES, which does not call the middleware
+    def process_request(self, request):
+        request._django_node_memo_table = memoization.MemoTable()
+        request._django_node_previous_memo_table = memoization.activate(request._django_node_memo_table)
+
+    def process_exception(self, request, exception):
+        self.process_response(request, None)
+
+    def process_response(self, request, response):
+        table = getattr(request, '_django_node_memo_table', None)
+        if table is None:
+            return response
+
+        memoization.deactivate(request._django_node_previous_memo_table)
+        del request._django_node_memo_table
+        del request._django_node_previous_memo_table
+
+        return self.report(request, response, table)
+
+    def report(self, request, response, table):
+        if response is not None and (table.hits or table.misses):
+            logger.debug('Memoized service calls for {path}: {hits} hits, {misses} misses'.format(
+                path=request.path,
+                hits=table.hits,
+                misses=table.misses,
+            ))
+            if settings.DEBUG:
+                response[MEMO_HEADER] = 'hits={hits}; misses={misses}'.format(hits=table.hits, misses=table.misses)
+
+        return response
@@ -2,7 +2,7 @@ import os
 from .settings import PATH_TO_NODE
 from .utils import (
     node_installed, node_version_raw, raise_if_dependency_missing, NODE_NAME, node_version,
-    raise_if_dependency_version_less_than, run_command,
+    raise_if_dependency_version_less_than, run_command, stream_command,
 )
 
 is_installed = node_installed
@@ -19,22 +19,66 @@ def ensure_version_gte(required_version):
     raise_if_dependency_version_less_than(NODE_NAME, required_version)
 
 
+def get_environment(production=None, env=None):
+    """
+    Returns the environment that a node process should be run with, or None
+    if the process can simply inherit the python process's environment.
+
+    The environment is built per call, so that concurrent calls to `run` never
+    need to mutate `os.environ`.
+    """
+    if not production and env is None:
+        return None
+
+    environment = dict(os.environ)
+    if env is not None:
+        environment.update(env)
+    if production:
+        environment['NODE_ENV'] = 'production'
+
+    return environment
+
+
 def run(*args, **kwargs):
     ensure_installed()
 
     production = kwargs.pop('production', None)
-    if production:
-        node_env = os.environ.get('NODE_ENV', None)
-        os.environ['NODE_ENV'] = 'production'
+    env = kwargs.pop('env', None)
 
-    results = run_command(
-        (PATH_TO_NODE,) + tuple(args)
+    return run_command(
+        (PATH_TO_NODE,) + tuple(args),
+        env=get_environment(production, env),
+        **kwargs
     )
 
-    if production:
-        if node_env is not None:
-            os.environ['NODE_ENV'] = node_env
-        else:
-            del os.environ['NODE_ENV']
 
-    return results
\ No newline at end of file
+def stream(*args, **kwargs):
+    """
+    Invokes node with the arguments provided and yields `(stream_name, line)`
+    tuples as the process writes to its stdout and stderr.
+    """
+    ensure_installed()
+
+    production = kwargs.pop('production', None)
+    env = kwargs.pop('env', None)
+
+    return stream_command(
+        (PATH_TO_NODE,) + tuple(args),
+        env=get_environment(production, env),
+        **kwargs
+    )
+
+
+def eval_in_server(path_or_code, args=None, timeout=None):
+    """
+    An alternative to `run` which evaluates a JS file, or a snippet of JS, within
+    the persistent node server rather than spawning a new process.
+
+    Returns a tuple, containing the stderr and stdout as strings. Requires the
+    SERVER_EVAL_ENABLED setting.
+    """
+    from .services import EvalService  # Avoid a circular import
+
+    output = EvalService().evaluate(path_or_code, args=args, timeout=timeout)
+
+    return output['stderr'], output['stdout']
\ No newline at end of file
@@ -0,0 +1,52 @@
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor
+from . import node
+from .settings import NODE_POOL_MAX_WORKERS
+
+
+class NodePool(object):
+    """
+    Runs `django_node.node.run` invocations concurrently, with no more than
+    `max_workers` node processes alive at once.
+
+    Each job is handed its environment explicitly, so jobs using different
+    `production` or `env` arguments can safely run alongside one another.
+    """
+
+    max_workers = NODE_POOL_MAX_WORKERS
+
+    def __init__(self, max_workers=None):
+        if max_workers is not None:
+            self.max_workers = max_workers
+        if self.max_workers is None:
+            self.max_workers = multiprocessing.cpu_count()
+        self.executor = ThreadPoolExecutor(max_workers=self.max_workers)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.shutdown()
+
+    def submit(self, *args, **kwargs):
+        """
+        Schedules a call to `node.run` with the provided arguments and returns
+        a future which resolves to the `(stderr, stdout)` tuple.
+
+        Accepts the same keyword arguments as `node.run`: `production`, `env`
+        and `timeout`.
+        """
+        return self.executor.submit(node.run, *args, **kwargs)
+
+    def map(self, arg_lists, **kwargs):
+        """
+        Schedules a job for each tuple of arguments in `arg_lists`, all of which
+        share the keyword arguments provided. Returns a list of futures, ordered
+        to match `arg_lists`.
+        """
+        return [self.submit(*args, **kwargs) for args in arg_lists]
+
+    def shutdown(self, wait=None):
+        if wait is None:
+            wait = True
+        self.executor.shutdown(wait=wait)
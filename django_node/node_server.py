@@ -1,29 +1,48 @@
 import os
 import sys
+import copy
+import time
 import atexit
 import json
+import threading
 import subprocess
 import logging
 import tempfile
 import requests
+from concurrent.futures import ThreadPoolExecutor
 from requests.exceptions import ConnectionError, ReadTimeout, Timeout
 from django.utils import six
 if six.PY2:
     from urlparse import urljoin
 elif six.PY3:
     from urllib.parse import urljoin
-from .services import EchoService
+from .services import EchoService, EvalService, PingService, StatsService, ProfileService, ReloadService
 from .settings import (
     PATH_TO_NODE, SERVER_PROTOCOL, SERVER_ADDRESS, SERVER_PORT, NODE_VERSION_REQUIRED, NPM_VERSION_REQUIRED,
-    SERVICES, INSTALL_PACKAGE_DEPENDENCIES_DURING_RUNTIME
+    SERVICES, SERVER_EVAL_ENABLED, INSTALL_PACKAGE_DEPENDENCIES_DURING_RUNTIME, SERVICE_MANIFEST, SERVER_HEALTH_CHECK_TTL,
+    SERVER_WARMUP_IN_PARALLEL, SERVER_RECYCLE_AFTER_REQUESTS, SERVER_RECYCLE_MAX_AGE, SERVER_RECYCLE_MAX_RSS,
+    SERVER_RECYCLE_CHECK_INTERVAL, SERVER_RECYCLE_DRAIN_TIMEOUT, SERVER_STATS_INTERVAL, SERVER_REFERENCE_STORE_SIZE,
+    SERVER_FILE_TRANSPORT_THRESHOLD, SERVER_FILE_TRANSPORT_DIR, SERVER_CODE_CACHE, SERVER_HOT_RELOAD,
+    SERVER_HOT_RELOAD_INTERVAL, SERVER_PROCESS_IS_SHARED, SERVER_PROFILE_ENABLED
 )
 from .exceptions import (
     NodeServerConnectionError, NodeServerStartError, NodeServerAddressInUseError, NodeServerTimeoutError,
-    MalformedServiceConfig
+    MalformedServiceConfig, InvalidServiceManifest, ServerConfigMissingService
 )
-from .utils import resolve_dependencies, discover_services
+from .utils import (
+    resolve_dependencies, discover_services, get_free_port, wait_for_process, get_process_rss, get_process_stats, extend_serialized_dict
+)
+from .manifest import load_manifest
+from .file_transport import create_directory, remove_directory, remove_file, prepare_request_data, read_response
+from .telemetry import StatsSampler
+from .hot_reload import SourceWatcher
+from .profiling import CPU_PROFILE, HEAP_SNAPSHOT, filter_serialised_cpu_profile
 from .package_dependent import PackageDependent
 
+# Keep in sync with runtime.js
+TIMEOUT_KEY = '__django_node_timeout__'
+DEADLINE_EXCEEDED_HEADER = 'X-Django-Node-Deadline-Exceeded'
+
 
 class NodeServer(PackageDependent):
     """
@@ -35,31 +54,118 @@ class NodeServer(PackageDependent):
     address = SERVER_ADDRESS
     port = SERVER_PORT
     path_to_source = os.path.join(os.path.dirname(__file__), 'node_modules', 'django-node-server', 'index.js')
+    # Bootstraps the server, wrapping each service's handler
+    path_to_runtime = os.path.join(os.path.dirname(__file__), 'runtime.js')
     package_dependencies = os.path.dirname(__file__)
     shutdown_on_exit = True
+    # Whether node and npm are checked when the server is created
+    requires_node = True
+    install_package_dependencies = INSTALL_PACKAGE_DEPENDENCIES_DURING_RUNTIME
     is_running = False
     logger = logging.getLogger(__name__)
     echo_service = EchoService()
-    services = (EchoService,)
+    ping_service = PingService()
+    stats_service = StatsService()
+    profile_service = ProfileService()
+    reload_service = ReloadService()
+    services = (EchoService, PingService, StatsService)
+    # The eval service runs any JS sent to it, so is only included if enabled
+    if SERVER_EVAL_ENABLED:
+        services += (EvalService,)
+    # The profile service exposes the process's memory, so is only included if enabled
+    if SERVER_PROFILE_ENABLED:
+        services += (ProfileService,)
+    # The reload service loads code into the process, so is only included during development
+    if SERVER_HOT_RELOAD:
+        services += (ReloadService,)
     service_config = SERVICES
+    service_manifest = SERVICE_MANIFEST
     process = None
+    health_check_ttl = SERVER_HEALTH_CHECK_TTL
+    warmup_in_parallel = SERVER_WARMUP_IN_PARALLEL
+    warmup_durations = None
+    recycle_after_requests = SERVER_RECYCLE_AFTER_REQUESTS
+    recycle_max_age = SERVER_RECYCLE_MAX_AGE
+    recycle_max_rss = SERVER_RECYCLE_MAX_RSS
+    recycle_check_interval = SERVER_RECYCLE_CHECK_INTERVAL
+    recycle_drain_timeout = SERVER_RECYCLE_DRAIN_TIMEOUT
+    process_is_shared = SERVER_PROCESS_IS_SHARED
+    # The number of seconds a terminated process has to exit before it is killed
+    stop_timeout = 5.0
+    # The number of free ports tried when starting a replacement process
+    replacement_start_attempts = 3
+    stats_interval = SERVER_STATS_INTERVAL
+    stats_sampler = None
+    reference_store_size = SERVER_REFERENCE_STORE_SIZE
+    # The maximum number of digests remembered as having been uploaded to the process
+    max_uploaded_references = 10000
+    file_transport_threshold = SERVER_FILE_TRANSPORT_THRESHOLD
+    file_transport_dir = SERVER_FILE_TRANSPORT_DIR
+    file_transport_directory = None
+    code_cache = SERVER_CODE_CACHE
+    hot_reload = SERVER_HOT_RELOAD
+    hot_reload_interval = SERVER_HOT_RELOAD_INTERVAL
+    source_watcher = None
+    _health = None
+    _health_checked_at = None
 
     def __init__(self):
-        resolve_dependencies(
-            node_version_required=NODE_VERSION_REQUIRED,
-            npm_version_required=NPM_VERSION_REQUIRED,
-        )
+        self.reset_process_state()
+        if self.requires_node:
+            resolve_dependencies(
+                node_version_required=NODE_VERSION_REQUIRED,
+                npm_version_required=NPM_VERSION_REQUIRED,
+            )
         if not isinstance(self.service_config, tuple):
             raise MalformedServiceConfig(
                 'DJANGO_NODE[\'SERVICES\'] setting must be a tuple. Found "{setting}"'.format(setting=SERVICES)
             )
-        services = discover_services(self.service_config)
+        services = self.load_services()
         if services:
             self.services += services
-        if INSTALL_PACKAGE_DEPENDENCIES_DURING_RUNTIME:
+        if self.install_package_dependencies:
             for dependent in (self,) + self.services:
                 dependent.install_dependencies()
 
+    def reset_process_state(self):
+        self.lock = threading.RLock()
+        # The number of requests in progress, keyed by the process they were sent to
+        self.requests_in_progress = {}
+        self.draining_processes = []
+        self.request_count = 0
+        self.started_at = None
+        self.is_recycling = False
+        self._rss_checked_at = None
+        # The digests of the values sent by reference that the process has received
+        self.uploaded_references = set()
+
+    def get_uploaded_references(self, routing_key=None):
+        """
+        Returns the digests of the values which the process that receives
+        requests routed by `routing_key` has received
+        """
+        return self.uploaded_references
+
+    def add_uploaded_references(self, digests, routing_key=None):
+        with self.lock:
+            if len(self.uploaded_references) >= self.max_uploaded_references:
+                # Any values which the process still holds are simply uploaded again
+                self.uploaded_references = set()
+            self.uploaded_references.update(digests)
+
+    def load_services(self):
+        """
+        Returns the services defined in the SERVICES setting. If a manifest is
+        configured and is up to date, the services are loaded from it, otherwise
+        the modules are inspected for services.
+        """
+        if self.service_manifest:
+            try:
+                return load_manifest(self.service_manifest, self.service_config)
+            except InvalidServiceManifest as e:
+                self.log('Ignoring service manifest. {error}'.format(error=' '.join(map(six.text_type, e.args))))
+        return discover_services(self.service_config)
+
     def get_config(self):
         services = ()
         for service in self.services:
@@ -72,6 +178,10 @@ class NodeServer(PackageDependent):
             'port': self.port,
             'services': services,
             'startup_output': self.get_startup_output(),
+            'reference_store_size': self.reference_store_size,
+            'code_cache': self.code_cache if self.code_cache and os.path.isdir(self.code_cache) else None,
+            # The directory is only created as the process starts
+            'file_transport_directory': self.file_transport_directory if self.supports_file_transport() else None,
         }
 
     def get_serialised_config(self):
@@ -89,11 +199,14 @@ class NodeServer(PackageDependent):
             use_existing_process = False
             blocking = True
 
-        if use_existing_process and self.test():
-            self.is_running = True
-            return
+        self.clear_health()
+        self.uploaded_references = set()
 
-        if not use_existing_process and self.test():
+        # The result is cached, so that `is_healthy` does not immediately ping the process again
+        if self.record_health(self.ping()):
+            if use_existing_process:
+                self.is_running = True
+                return
             raise NodeServerAddressInUseError(
                 'A process is already listening at {server_url}'.format(
                     server_url=self.get_server_url()
@@ -104,78 +217,462 @@ class NodeServer(PackageDependent):
         if self.shutdown_on_exit:
             atexit.register(self.stop)
 
+        if self.supports_file_transport():
+            self.get_file_transport_directory()
+
         with tempfile.NamedTemporaryFile() as config_file:
             config_file.write(six.b(self.get_serialised_config()))
             config_file.flush()
 
-            cmd = (PATH_TO_NODE,)
-            if debug:
-                cmd += ('debug',)
-            cmd += (
-                self.path_to_source,
-                '--config', config_file.name,
-            )
+            cmd = self.get_start_command(config_file.name, debug)
 
             self.log('Starting process with {cmd}'.format(cmd=cmd))
 
             if blocking:
-                # Start the server in a blocking process
-                subprocess.call(cmd)
+                self.run_in_foreground(cmd)
                 return
 
-            # While rendering templates Django will silently ignore some types of exceptions,
-            # so we need to intercept them and raise our own class of exception
-            try:
-                # TODO: set NODE_ENV. See `env` arg https://docs.python.org/2/library/subprocess.html#popen-constructor
-                self.process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
-            except (TypeError, AttributeError):
-                msg = 'Failed to start server with {arguments}'.format(arguments=cmd)
-                six.reraise(NodeServerStartError, NodeServerStartError(msg), sys.exc_info()[2])
-
-            # Block until the server is ready and pushes the expected output to stdout
-            output = self.process.stdout.readline()
-            output = output.decode('utf-8')
-
-            if output.strip() != self.get_startup_output():
-                # Read in the rest of the error message
-                output += self.process.stdout.read().decode('utf-8')
-                if 'EADDRINUSE' in output:
-                    raise NodeServerAddressInUseError(
-                        (
-                            'Port "{port}" already in use. '
-                            'Try changing the DJANGO_NODE[\'SERVER_PORT\'] setting. '
-                            '{output}'
-                        ).format(
-                            port=self.port,
-                            output=output,
-                        )
-                    )
-                else:
-                    raise NodeServerStartError(output)
+            self.start_process(cmd)
 
-        self.is_running = True
+        self.complete_start()
 
+    def get_start_command(self, path_to_config, debug=None):
+        cmd = (PATH_TO_NODE,)
+        if debug:
+            cmd += ('debug',)
+        return cmd + (
+            self.path_to_runtime,
+            self.path_to_source,
+            '--config', path_to_config,
+        )
+
+    def run_in_foreground(self, cmd):
+        """
+        Runs the server in a process which blocks until it exits
+        """
+        if self.hot_reload:
+            self.start_source_watcher()
+        try:
+            subprocess.call(cmd)
+        finally:
+            self.stop_source_watcher()
+
+    def start_process(self, cmd):
+        """
+        Starts the server's process and blocks until it is ready
+        """
+        # While rendering templates Django will silently ignore some types of exceptions,
+        # so we need to intercept them and raise our own class of exception
+        try:
+            # TODO: set NODE_ENV. See `env` arg https://docs.python.org/2/library/subprocess.html#popen-constructor
+            self.process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+        except (TypeError, AttributeError):
+            msg = 'Failed to start server with {arguments}'.format(arguments=cmd)
+            six.reraise(NodeServerStartError, NodeServerStartError(msg), sys.exc_info()[2])
+
+        # Block until the server is ready and pushes the expected output to stdout
+        output = self.process.stdout.readline()
+        output = output.decode('utf-8')
+
+        if output.strip() != self.get_startup_output():
+            # Read in the rest of the error message
+            output += self.process.stdout.read().decode('utf-8')
+            if 'EADDRINUSE' in output:
+                raise NodeServerAddressInUseError(
+                    (
+                        'Port "{port}" already in use. '
+                        'Try changing the DJANGO_NODE[\'SERVER_PORT\'] setting. '
+                        '{output}'
+                    ).format(
+                        port=self.port,
+                        output=output,
+                    )
+                )
+            else:
+                raise NodeServerStartError(output)
+
+    def complete_start(self):
+        """
+        Health checks and warms up a newly started process, then marks the
+        server as running
+        """
         # Ensure that the server is running
-        if not self.test():
+        self.clear_health()
+        if not self.is_healthy():
             self.stop()
             raise NodeServerStartError(
-                'Server does not appear to be running. Tried to test the server at "{echo_endpoint}"'.format(
-                    echo_endpoint=self.echo_service.get_name(),
+                'Server does not appear to be running. Tried to ping the server at "{ping_endpoint}"'.format(
+                    ping_endpoint=self.ping_service.get_name(),
                 )
             )
 
+        self.warmup()
+
+        self.request_count = 0
+        self.started_at = time.time()
+        self.is_running = True
+
         self.log('Started process')
 
+        if self.stats_interval:
+            self.start_stats_sampler()
+
+        if self.hot_reload:
+            self.start_source_watcher()
+
+    def warmup(self, parallel=None):
+        """
+        Replays the warmup payloads of each service, so that node has compiled
+        the services before they receive requests.
+
+        Returns a dictionary mapping the names of the services warmed up to
+        the number of seconds taken. Services which fail to warm up are logged
+        and omitted.
+        """
+        if parallel is None:
+            parallel = self.warmup_in_parallel
+
+        services = [service for service in self.services if service.get_warmup_payloads()]
+
+        def warmup_service(service):
+            instance = service()
+            instance.server = self
+            try:
+                return instance.warmup()
+            except Exception as e:
+                self.log('Failed to warm up {name}: {error}'.format(name=service.get_name(), error=e))
+
+        if parallel and len(services) > 1:
+            with ThreadPoolExecutor(max_workers=len(services)) as executor:
+                durations = list(executor.map(warmup_service, services))
+        else:
+            durations = [warmup_service(service) for service in services]
+
+        self.warmup_durations = {}
+        for service, duration in zip(services, durations):
+            if duration is not None:
+                self.warmup_durations[service.get_name()] = duration
+                self.log('Warmed up {name} in {duration:.3f} seconds'.format(
+                    name=service.get_name(),
+                    duration=duration,
+                ))
+
+        return self.warmup_durations
+
     def get_startup_output(self):
         return 'Node server listening at {server_url}'.format(
             server_url=self.get_server_url()
         )
 
     def stop(self):
-        if self.process is not None and self.test():
-            self.process.terminate()
+        with self.lock:
+            # A recycle in progress terminates its replacement, rather than adopting it
+            self.is_running = False
+        # The background threads are stopped first, so that they do not report the process's absence
+        self.stop_stats_sampler()
+        self.stop_source_watcher()
+        if self.is_process_alive():
+            self.terminate_process(self.process)
             self.log('Terminated process')
-        self.is_running = False
+        for process in list(self.draining_processes):
+            self.terminate_process(process)
+        if self.file_transport_directory is not None:
+            remove_directory(self.file_transport_directory)
+            self.file_transport_directory = None
+        self.clear_health()
+
+    def stats(self):
+        """
+        Returns a dictionary describing the resource usage of the server's
+        process, as reported by node. If the server started its own process,
+        `process` contains the RSS, CPU time and thread count read from `/proc`.
+        """
+        response = self.send_request_to_service(
+            self.stats_service.get_name(),
+            timeout=self.stats_service.timeout,
+            ensure_started=False,
+            data={
+                'data': json.dumps({})
+            }
+        )
+        stats = self.stats_service.handle_response(response).json()
+
+        process = self.process
+        stats['process'] = get_process_stats(process.pid) if process is not None else None
+
+        return stats
+
+    def get_service(self, name_or_import_path):
+        for service in self.services:
+            import_path = '{module}.{name}'.format(module=service.__module__, name=service.__name__)
+            if name_or_import_path in (service.get_name(), import_path):
+                return service
+        raise ServerConfigMissingService(name_or_import_path)
+
+    def profile(self, seconds=None, heap=None, services=None, path=None):
+        """
+        Captures a CPU profile of the server's process over `seconds`, or a heap
+        snapshot if `heap` is True, and returns it as a string. If `path` is
+        defined, the profile is also written to it.
+
+        `services` is an optional list of service names or import paths. CPU
+        profiles are reduced to the calls made from within those services.
+        """
+        if ProfileService not in self.services:
+            raise ServerConfigMissingService(ProfileService)
+
+        if seconds is None:
+            seconds = 10
+        profile_type = HEAP_SNAPSHOT if heap else CPU_PROFILE
+
+        if heap and services:
+            raise ValueError('Heap snapshots cannot be filtered by service')
+
+        paths_to_sources = [self.get_service(service).get_path_to_source() for service in services or ()]
+
+        self.log('Capturing {type} profile'.format(type=profile_type))
+
+        response = self.send_request_to_service(
+            self.profile_service.get_name(),
+            timeout=self.profile_service.timeout + (0 if heap else seconds),
+            ensure_started=False,
+            data={
+                'data': json.dumps({'type': profile_type, 'seconds': seconds})
+            }
+        )
+        output = self.profile_service.handle_response(response).text
+
+        if paths_to_sources:
+            output = filter_serialised_cpu_profile(output, paths_to_sources)
+
+        if path is not None:
+            with open(path, 'w') as profile_file:
+                profile_file.write(output)
+
+        return output
+
+    def start_stats_sampler(self, interval=None, callback=None):
+        """
+        Starts a background thread which samples `stats` every `interval` seconds
+        and passes each sample to `callback`. The interval and callback default
+        to the SERVER_STATS_INTERVAL and SERVER_STATS_HOOK settings.
+        """
+        self.stop_stats_sampler()
+        self.stats_sampler = StatsSampler(self, interval=interval or self.stats_interval, callback=callback)
+        self.stats_sampler.start()
+        return self.stats_sampler
+
+    def stop_stats_sampler(self):
+        if self.stats_sampler is not None:
+            self.stats_sampler.stop()
+            self.stats_sampler = None
+
+    def reload_services(self, services=None, reload=None):
+        """
+        Reloads services within the server's process, without restarting it.
+        `services` is an optional list of service names or import paths, and
+        defaults to every service. If `reload` is False, the services are only
+        inspected.
+
+        Returns a dictionary, keyed by the name of each service, containing
+        whether it was `reloaded`, any `error` raised while loading it, and the
+        filenames of the local modules it depends on as `dependencies`.
+        Services which fail to load continue with their previous handler.
+        """
+        if reload is None:
+            reload = True
+
+        if ReloadService not in self.services:
+            raise ServerConfigMissingService(ReloadService)
+
+        data = {'reload': reload}
+        if services is not None:
+            data['services'] = [self.get_service(service).get_name() for service in services]
+
+        response = self.send_request_to_service(
+            self.reload_service.get_name(),
+            timeout=self.reload_service.timeout,
+            ensure_started=False,
+            data={
+                'data': json.dumps(data)
+            }
+        )
+        return self.reload_service.handle_response(response).json()
+
+    def start_source_watcher(self, interval=None):
+        """
+        Starts a background thread which reloads services whenever their sources,
+        or the local modules they require, change. The interval between checks
+        defaults to the SERVER_HOT_RELOAD_INTERVAL setting.
+        """
+        self.stop_source_watcher()
+        self.source_watcher = SourceWatcher(self, interval=interval or self.hot_reload_interval)
+        self.source_watcher.start()
+        return self.source_watcher
+
+    def stop_source_watcher(self):
+        if self.source_watcher is not None:
+            self.source_watcher.stop()
+            self.source_watcher = None
+
+    def get_recycle_reason(self):
+        """
+        Returns a string describing why the process should be replaced, or
+        None if none of the recycling policies apply.
+        """
+        if self.recycle_after_requests and self.request_count >= self.recycle_after_requests:
+            return 'served {count} requests'.format(count=self.request_count)
+
+        now = time.time()
+        if self.recycle_max_age and self.started_at and now - self.started_at >= self.recycle_max_age:
+            return 'running for {age:.0f} seconds'.format(age=now - self.started_at)
+
+        if self.recycle_max_rss and (
+            self._rss_checked_at is None or now - self._rss_checked_at >= self.recycle_check_interval
+        ):
+            self._rss_checked_at = now
+            rss = get_process_rss(self.process.pid)
+            if rss is not None and rss > self.recycle_max_rss:
+                return 'using {rss} bytes of memory'.format(rss=rss)
+
+    def recycle_if_required(self):
+        """
+        Replaces the process in a background thread, if any of the recycling
+        policies apply. Only processes started by this server, and which are not
+        shared with other python processes, are recycled.
+        """
+        if self.process_is_shared:
+            return
+        if not self.is_running or self.is_recycling or not self.is_process_alive():
+            return
+
+        reason = self.get_recycle_reason()
+        if reason is None:
+            return
+
+        with self.lock:
+            if self.is_recycling:
+                return
+            self.is_recycling = True
+
+        thread = threading.Thread(target=self._recycle_in_background, args=(reason,))
+        thread.daemon = True
+        thread.start()
+
+    def _recycle_in_background(self, reason):
+        try:
+            self.recycle(reason)
+        except Exception as e:
+            self.log('Failed to recycle process: {error}'.format(error=e))
+            # Wait for the policies to apply again, rather than retrying on every request
+            self.request_count = 0
+            self.started_at = time.time()
+        finally:
+            self.is_recycling = False
+
+    def create_replacement(self):
+        """
+        Returns a copy of the server which will start a new process on a free port.
+        The port is only known to be free when it is chosen, so use
+        `start_replacement` to retry if another process binds it first.
+        """
+        replacement = copy.copy(self)
+        replacement.reset_process_state()
+        replacement.port = six.text_type(get_free_port(self.address))
+        replacement.process = None
+        replacement.is_running = False
+        # The replacement's process is adopted by this server, which will stop it
+        replacement.shutdown_on_exit = False
+        # This server's watcher continues to reload the services in the new process
+        replacement.hot_reload = False
+        # The copy must not share, and so stop, this server's background threads
+        replacement.stats_sampler = None
+        replacement.source_watcher = None
+        replacement.clear_health()
+        return replacement
+
+    def start_replacement(self):
+        """
+        Starts and returns a replacement server, choosing another free port
+        if the chosen port is taken before the new process binds it
+        """
+        for attempt in range(self.replacement_start_attempts):
+            replacement = self.create_replacement()
+            try:
+                replacement.start(use_existing_process=False)
+            except NodeServerAddressInUseError:
+                if attempt + 1 == self.replacement_start_attempts:
+                    raise
+                self.log('Port {port} was taken before the replacement process started, retrying'.format(
+                    port=replacement.port,
+                ))
+            else:
+                return replacement
+
+    def recycle(self, reason=None):
+        """
+        Starts, health checks and warms up a new process, directs all further
+        requests to it, then terminates the old process once its requests
+        have completed.
+        """
+        self.log('Recycling process{reason}'.format(reason=', as it has ' + reason if reason else ''))
+
+        process = self.process
+        replacement = self.start_replacement()
+        # This server's sampler, if any, samples the process once adopted
+        replacement.stop_stats_sampler()
+
+        with self.lock:
+            # The server may have been stopped, or restarted, while the replacement started
+            is_adopted = self.is_running and self.process is process
+            if is_adopted:
+                self.port = replacement.port
+                self.process = replacement.process
+                self.warmup_durations = replacement.warmup_durations
+                self.uploaded_references = replacement.uploaded_references
+                self.request_count = 0
+                self.started_at = time.time()
+                if process is not None:
+                    self.draining_processes.append(process)
+
+        if not is_adopted:
+            self.terminate_process(replacement.process)
+            self.log('Terminated replacement process, as the server was stopped while it started')
+            return
+
+        self.clear_health()
+
+        self.log('Replaced process {old_pid} with {new_pid}'.format(
+            old_pid=process.pid if process is not None else None,
+            new_pid=self.process.pid,
+        ))
+
+        if process is not None:
+            self.drain_process(process)
+
+    def drain_process(self, process):
+        """
+        Blocks until the requests sent to `process` have completed, or until
+        `recycle_drain_timeout` seconds have passed, then terminates it.
+        """
+        deadline = time.time() + self.recycle_drain_timeout
+        while self.requests_in_progress.get(process) and time.time() < deadline:
+            time.sleep(0.05)
+        self.terminate_process(process)
+
+    def terminate_process(self, process):
+        if process.poll() is None:
+            process.terminate()
+            if not wait_for_process(process, self.stop_timeout):
+                self.log('Process {pid} did not exit within {timeout} seconds, killing it'.format(
+                    pid=process.pid,
+                    timeout=self.stop_timeout,
+                ))
+                process.kill()
+                process.wait()
+        with self.lock:
+            if process in self.draining_processes:
+                self.draining_processes.remove(process)
 
     def get_server_url(self):
         if self.protocol and self.address and self.port:
@@ -196,14 +693,115 @@ class NodeServer(PackageDependent):
 
     def test(self):
         """
-        Returns a boolean indicating if the server is currently running
+        Returns a boolean indicating if the server is currently running.
+
+        Performs a full round trip to the echo service, use `is_healthy` for
+        a cheaper check.
         """
         return self.echo_service.test()
 
-    def send_request_to_service(self, endpoint, timeout=None, data=None, ensure_started=None):
+    def is_process_alive(self):
+        """
+        Returns a boolean indicating if the process started by this server is
+        still running. Always False if the server is relying on an external
+        process.
+        """
+        return self.process is not None and self.process.poll() is None
+
+    def ping(self):
+        """
+        Returns a boolean indicating if a server is responding at the server's
+        address. Servers which do not provide the ping service are tested via
+        the echo service.
+        """
+        try:
+            response = self.send_request_to_service(
+                self.ping_service.get_name(),
+                timeout=self.ping_service.timeout,
+                ensure_started=False,
+                data={
+                    'data': json.dumps({})
+                }
+            )
+        except (NodeServerConnectionError, NodeServerTimeoutError):
+            return False
+
+        if response.status_code == 404:
+            return self.test()
+
+        return response.status_code == 200 and response.text == self.ping_service.expected_output
+
+    def is_healthy(self, full=None):
+        """
+        Returns a boolean indicating if the server is running and responding.
+
+        If the server started its own process, a process which has exited is
+        detected without any network calls. Otherwise the result of a ping, or
+        of a full test if `full` is True, is cached for `health_check_ttl` seconds.
+        """
+        if self.process is not None and not self.is_process_alive():
+            return False
+
+        now = time.time()
+        if (
+            not full and
+            self._health_checked_at is not None and
+            now - self._health_checked_at < self.health_check_ttl
+        ):
+            return self._health
+
+        return self.record_health(self.test() if full else self.ping())
+
+    def record_health(self, healthy):
+        self._health = healthy
+        self._health_checked_at = time.time()
+        return healthy
+
+    def supports_file_transport(self):
+        """
+        Returns a boolean indicating if large payloads can be exchanged via files,
+        which requires the server to share the python process's filesystem
+        """
+        return bool(self.file_transport_threshold) and self.address in ('127.0.0.1', 'localhost', '::1')
+
+    def uses_file_transport(self):
+        """
+        Returns a boolean indicating if large payloads are exchanged via files.
+        The process only accepts files from the directory in its config, so files
+        are only used with processes started by this server.
+        """
+        return self.process is not None and self.supports_file_transport()
+
+    def get_file_transport_directory(self):
+        with self.lock:
+            if self.file_transport_directory is None:
+                self.file_transport_directory = create_directory(self.file_transport_dir)
+        return self.file_transport_directory
+
+    def clear_health(self):
+        self._health = None
+        self._health_checked_at = None
+
+    def get_routing_key(self, endpoint, data):
+        """
+        Returns a key identifying the request, which servers distributing requests
+        across multiple processes use to choose where the request is sent
+        """
+        return None
+
+    def post(self, absolute_url, endpoint, timeout=None, data=None, routing_key=None):
+        return read_response(requests.post(absolute_url, timeout=timeout, data=data))
+
+    def send_request_to_service(self, endpoint, timeout=None, data=None, ensure_started=None, routing_key=None):
         if ensure_started is None:
             ensure_started = True
 
+        # Processes started elsewhere are not pinged here, as their failure is
+        # detected by the requests sent to them
+        if ensure_started and self.is_running and self.process is not None and not self.is_process_alive():
+            self.log('Process has exited unexpectedly')
+            self.is_running = False
+
         if ensure_started and not self.is_running:
             self.start()
 
@@ -212,11 +810,58 @@ class NodeServer(PackageDependent):
             data=data,
         ))
 
-        absolute_url = urljoin(self.get_server_url(), endpoint)
+        # Track the requests sent to each process, so that recycled processes
+        # are only terminated once their requests have completed
+        with self.lock:
+            process = self.process
+            absolute_url = urljoin(self.get_server_url(), endpoint)
+            # Internal requests, such as pings and stats, are sent without
+            # ensuring that the server has started, and are not counted
+            if ensure_started:
+                self.request_count += 1
+            self.requests_in_progress[process] = self.requests_in_progress.get(process, 0) + 1
+
+        if routing_key is None:
+            routing_key = self.get_routing_key(endpoint, data)
+
+        request_path = None
+        if data and 'data' in data and isinstance(timeout, six.integer_types + (float,)):
+            # Tell the server how long remains until the request is abandoned, so that
+            # it can drop or cancel work which is no longer required. The server derives
+            # the deadline from its own clock, which may differ from this machine's
+            data = dict(data)
+            data['data'] = extend_serialized_dict(data['data'], {
+                TIMEOUT_KEY: int(timeout * 1000),
+            })
+        if data and 'data' in data and self.uses_file_transport():
+            data = dict(data)
+            data['data'], request_path = prepare_request_data(
+                data['data'], self.get_file_transport_directory(), self.file_transport_threshold
+            )
 
         try:
-            return requests.post(absolute_url, timeout=timeout, data=data)
+            response = self.post(absolute_url, endpoint, timeout=timeout, data=data, routing_key=routing_key)
         except ConnectionError as e:
+            if ensure_started and process is None:
+                # The process started elsewhere is no longer reachable, so the next
+                # request checks for it again, or starts a process
+                self.log('Process is no longer responding')
+                self.is_running = False
+                self.record_health(False)
             six.reraise(NodeServerConnectionError, NodeServerConnectionError(absolute_url, *e.args), sys.exc_info()[2])
         except (ReadTimeout, Timeout) as e:
-            six.reraise(NodeServerTimeoutError, NodeServerTimeoutError(absolute_url, *e.args), sys.exc_info()[2])
\ No newline at end of file
+            six.reraise(NodeServerTimeoutError, NodeServerTimeoutError(absolute_url, *e.args), sys.exc_info()[2])
+        finally:
+            if request_path is not None:
+                remove_file(request_path)
+            with self.lock:
+                self.requests_in_progress[process] -= 1
+                if not self.requests_in_progress[process]:
+                    del self.requests_in_progress[process]
+            if ensure_started:
+                self.recycle_if_required()
+
+        if response.status_code == 504 and response.headers.get(DEADLINE_EXCEEDED_HEADER):
+            raise NodeServerTimeoutError(absolute_url, response.text)
+
+        return response
\ No newline at end of file
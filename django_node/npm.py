@@ -4,7 +4,7 @@ from .exceptions import NpmInstallArgumentsError
 from .settings import PATH_TO_NPM, NPM_INSTALL_PATH_TO_PYTHON, NPM_INSTALL_COMMAND
 from .utils import (
     NPM_NAME, npm_installed, npm_version, npm_version_raw, raise_if_dependency_missing,
-    raise_if_dependency_version_less_than, run_command
+    raise_if_dependency_version_less_than, run_command, stream_command
 )
 
 is_installed = npm_installed
@@ -21,9 +21,14 @@ def ensure_version_gte(required_version):
     raise_if_dependency_version_less_than(NPM_NAME, required_version)
 
 
-def run(*args):
+def run(*args, **kwargs):
     ensure_installed()
-    return run_command((PATH_TO_NPM,) + tuple(args))
+    return run_command((PATH_TO_NPM,) + tuple(args), **kwargs)
+
+
+def stream(*args, **kwargs):
+    ensure_installed()
+    return stream_command((PATH_TO_NPM,) + tuple(args), **kwargs)
 
 
 def install(target_dir):
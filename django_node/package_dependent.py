@@ -2,13 +2,20 @@ import os
 import shutil
 from .settings import PACKAGE_DEPENDENCIES
 from .utils import resolve_dependencies
+from .package_store import get_package_store
 
 
 def install_dependencies(directory):
-    resolve_dependencies(path_to_run_npm_install_in=directory)
+    store = get_package_store()
+    if store is not None:
+        store.install(directory)
+    else:
+        resolve_dependencies(path_to_run_npm_install_in=directory)
 
 
 def uninstall_dependencies(directory):
+    # If the dependencies were linked from the package store, removing them only
+    # removes the links, and the store's copies remain for the other directories
     path_to_dependencies = os.path.join(directory, 'node_modules')
     if os.path.isdir(path_to_dependencies):
         shutil.rmtree(path_to_dependencies)
@@ -0,0 +1,267 @@
+import os
+import json
+import errno
+import shutil
+import hashlib
+from .settings import PACKAGE_STORE
+from .exceptions import PackageStoreError
+from .utils import resolve_dependencies, node_version_raw
+
+# Written to each node_modules directory linked from the store, recording the install it contains
+MARKER = '.django-node-store'
+PACKAGE_FILES = ('package.json', 'npm-shrinkwrap.json', 'package-lock.json')
+
+
+def checksum_file(path):
+    hasher = hashlib.sha1()
+    with open(path, 'rb') as source_file:
+        for chunk in iter(lambda: source_file.read(65536), b''):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def read_marker(path_to_node_modules):
+    try:
+        with open(os.path.join(path_to_node_modules, MARKER), 'r') as marker_file:
+            return marker_file.read().strip()
+    except (IOError, OSError):
+        return None
+
+
+def write_json_atomically(path, obj):
+    temporary_path = '{path}.{pid}.tmp'.format(path=path, pid=os.getpid())
+    with open(temporary_path, 'w') as json_file:
+        json.dump(obj, json_file)
+    os.rename(temporary_path, path)
+
+
+class PackageStore(object):
+    """
+    A content-addressed store of the files installed into `node_modules` directories.
+
+    Each distinct file is stored once, and the `node_modules` directories are made
+    of hardlinks to the stored files. Each install is recorded under a key derived
+    from its `package.json` and lock files and the version of node, so directories
+    with identical dependencies are linked from the store without running npm.
+
+    As hardlinks cannot cross devices, the store must be on the same file system
+    as the directories. Every directory linked to a file shares it, so a file
+    which is changed in place changes for every directory; npm is only run in
+    directories whose links have been removed.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.path_to_objects = os.path.join(path, 'objects')
+        self.path_to_installs = os.path.join(path, 'installs')
+
+    def get_install_key(self, directory):
+        hasher = hashlib.sha1()
+        hasher.update((node_version_raw or '').encode('utf-8'))
+        for name in PACKAGE_FILES:
+            path = os.path.join(directory, name)
+            if os.path.exists(path):
+                hasher.update(name.encode('utf-8'))
+                with open(path, 'rb') as package_file:
+                    hasher.update(package_file.read())
+        return hasher.hexdigest()
+
+    def get_path_to_object(self, digest):
+        return os.path.join(self.path_to_objects, digest[:2], digest[2:])
+
+    def get_path_to_install(self, key):
+        return os.path.join(self.path_to_installs, '{key}.json'.format(key=key))
+
+    def install(self, directory, install=None):
+        """
+        Ensures that `directory`'s dependencies are installed. Identical installs
+        are linked from the store, otherwise `install`, which defaults to running
+        npm, is called and its output is added to the store.
+
+        Returns True if npm was not required.
+        """
+        if install is None:
+            install = lambda directory: resolve_dependencies(path_to_run_npm_install_in=directory)
+
+        self.check_device(directory)
+
+        path_to_node_modules = os.path.join(directory, 'node_modules')
+        key = self.get_install_key(directory)
+        marker = read_marker(path_to_node_modules)
+        if marker == key:
+            return True
+        if self.link(directory, key):
+            return True
+
+        # npm and the packages' install scripts may change files in place, which
+        # would change the files of every other directory linked to the store
+        if marker is not None:
+            shutil.rmtree(path_to_node_modules)
+
+        install(directory)
+        self.add(directory, key)
+        return False
+
+    def check_device(self, directory):
+        if not os.path.isdir(self.path):
+            os.makedirs(self.path)
+        if os.stat(self.path).st_dev != os.stat(directory).st_dev:
+            raise PackageStoreError(
+                'The package store at {store} is on a different file system to {directory}, '
+                'so its files cannot be linked into the directory'.format(
+                    store=self.path,
+                    directory=directory,
+                )
+            )
+
+    def add_file(self, path):
+        """
+        Adds the file at `path` to the store, and replaces it with a link to the
+        stored file. Returns the digest of the file's content.
+        """
+        digest = checksum_file(path)
+        path_to_object = self.get_path_to_object(digest)
+
+        if not os.path.exists(path_to_object):
+            if not os.path.isdir(os.path.dirname(path_to_object)):
+                os.makedirs(os.path.dirname(path_to_object))
+            os.link(path, path_to_object)
+        elif not os.path.samefile(path, path_to_object):
+            temporary_path = path + MARKER
+            try:
+                os.link(path_to_object, temporary_path)
+            except OSError:
+                return digest
+            os.rename(temporary_path, path)
+
+        return digest
+
+    def add(self, directory, key):
+        """
+        Adds the files in `directory`'s `node_modules` to the store, and records
+        them as the install for `key`
+        """
+        path_to_node_modules = os.path.join(directory, 'node_modules')
+        entries = {'directories': [], 'files': {}, 'symlinks': {}}
+
+        for root, dirnames, filenames in os.walk(path_to_node_modules):
+            relative_root = os.path.relpath(root, path_to_node_modules)
+            for dirname in list(dirnames):
+                path = os.path.join(root, dirname)
+                relative_path = os.path.normpath(os.path.join(relative_root, dirname))
+                if os.path.islink(path):
+                    entries['symlinks'][relative_path] = os.readlink(path)
+                    dirnames.remove(dirname)
+                else:
+                    entries['directories'].append(relative_path)
+            for filename in filenames:
+                path = os.path.join(root, filename)
+                relative_path = os.path.normpath(os.path.join(relative_root, filename))
+                if relative_path == MARKER:
+                    continue
+                if os.path.islink(path):
+                    entries['symlinks'][relative_path] = os.readlink(path)
+                else:
+                    entries['files'][relative_path] = self.add_file(path)
+
+        if not os.path.isdir(self.path_to_installs):
+            os.makedirs(self.path_to_installs)
+        write_json_atomically(self.get_path_to_install(key), entries)
+
+        with open(os.path.join(path_to_node_modules, MARKER), 'w') as marker_file:
+            marker_file.write(key)
+
+    def link(self, directory, key):
+        """
+        Replaces `directory`'s `node_modules` with links to the install recorded
+        for `key`. Returns False if the install is missing from the store.
+        """
+        try:
+            with open(self.get_path_to_install(key), 'r') as install_file:
+                entries = json.load(install_file)
+        except (IOError, OSError, ValueError):
+            return False
+
+        for digest in entries['files'].values():
+            if not os.path.exists(self.get_path_to_object(digest)):
+                return False
+
+        path_to_node_modules = os.path.join(directory, 'node_modules')
+        temporary_path = '{path}.{pid}.tmp'.format(path=path_to_node_modules, pid=os.getpid())
+        if os.path.exists(temporary_path):
+            shutil.rmtree(temporary_path)
+
+        os.makedirs(temporary_path)
+        for relative_path in sorted(entries['directories']):
+            os.makedirs(os.path.join(temporary_path, relative_path))
+        for relative_path, digest in entries['files'].items():
+            os.link(self.get_path_to_object(digest), os.path.join(temporary_path, relative_path))
+        for relative_path, target in entries['symlinks'].items():
+            os.symlink(target, os.path.join(temporary_path, relative_path))
+        with open(os.path.join(temporary_path, MARKER), 'w') as marker_file:
+            marker_file.write(key)
+
+        if os.path.isdir(path_to_node_modules):
+            shutil.rmtree(path_to_node_modules)
+        os.rename(temporary_path, path_to_node_modules)
+
+        return True
+
+    def get_objects(self):
+        if not os.path.isdir(self.path_to_objects):
+            return
+        for root, dirnames, filenames in os.walk(self.path_to_objects):
+            for filename in filenames:
+                yield os.path.join(root, filename)
+
+    def collect_garbage(self):
+        """
+        Removes the stored files which are no longer linked into any directory,
+        and the installs which relied on them. Returns a tuple of the number of
+        files removed and the bytes freed.
+        """
+        removed = 0
+        freed = 0
+        for path in list(self.get_objects()):
+            stat = os.stat(path)
+            if stat.st_nlink <= 1:
+                try:
+                    os.remove(path)
+                except OSError as e:
+                    if e.errno != errno.ENOENT:
+                        raise
+                    continue
+                removed += 1
+                freed += stat.st_size
+
+        if removed and os.path.isdir(self.path_to_installs):
+            for filename in os.listdir(self.path_to_installs):
+                key = os.path.splitext(filename)[0]
+                with open(self.get_path_to_install(key), 'r') as install_file:
+                    entries = json.load(install_file)
+                if not all(os.path.exists(self.get_path_to_object(digest)) for digest in entries['files'].values()):
+                    os.remove(self.get_path_to_install(key))
+
+        return removed, freed
+
+    def report(self):
+        """
+        Returns a dictionary describing the store: the number of distinct `files`,
+        their total `size` in bytes, the number of `links` to them, and the bytes
+        `saved` compared to every directory holding its own copies.
+        """
+        report = {'files': 0, 'size': 0, 'links': 0, 'saved': 0}
+        for path in self.get_objects():
+            stat = os.stat(path)
+            links = stat.st_nlink - 1
+            report['files'] += 1
+            report['size'] += stat.st_size
+            report['links'] += links
+            report['saved'] += stat.st_size * max(0, links - 1)
+        return report
+
+
+def get_package_store():
+    if PACKAGE_STORE is None:
+        return None
+    return PackageStore(PACKAGE_STORE)
@@ -0,0 +1,82 @@
+// Hosts the services over the process's stdin and stdout, rather than HTTP.
+//
+// Usage: node runtime.js pipe_host.js --config path/to/config.json
+//
+// Messages in both directions are framed by a 4 byte, big-endian length,
+// followed by that many bytes of JSON. Requests contain an `id`, the service's
+// `endpoint` and its serialized `data`. Responses contain the request's `id`,
+// and the `status`, `headers` and `body` produced by the service. Many
+// requests can be in progress at once, and responses are written as soon as
+// each service finishes.
+//
+// As stdout carries the responses, anything else written to it is redirected
+// to stderr, where it is treated as the process's log output.
+
+var fs = require('fs');
+var runtime = require('./runtime');
+
+var argv = process.argv;
+var config = JSON.parse(fs.readFileSync(argv[argv.indexOf('--config') + 1], 'utf8'));
+
+var stdoutWrite = process.stdout.write.bind(process.stdout);
+process.stdout.write = function() {
+	return process.stderr.write.apply(process.stderr, arguments);
+};
+
+// Older versions of node lack `Buffer.from`
+var createBuffer = function(value, encoding) {
+	return typeof Buffer.from === 'function' ? Buffer.from(value, encoding) : new Buffer(value, encoding);
+};
+
+var writeMessage = function(message) {
+	var body = createBuffer(JSON.stringify(message), 'utf8');
+	var header = createBuffer([0, 0, 0, 0]);
+	header.writeUInt32BE(body.length, 0);
+	stdoutWrite(Buffer.concat([header, body]));
+};
+
+var handlers = {};
+config.services.forEach(function(service) {
+	handlers[service.name] = require(service.path_to_source);
+});
+
+var handleMessage = function(message) {
+	var respond = function(result) {
+		result.id = message.id;
+		writeMessage(result);
+	};
+
+	var handler = handlers[message.endpoint];
+	if (!handler) {
+		return respond({status: 404, headers: {}, body: 'Unknown service: ' + message.endpoint});
+	}
+
+	var response = new runtime.BufferedResponse(respond);
+	try {
+		handler(JSON.parse(message.data || '{}'), response);
+	} catch(err) {
+		if (!response.finished) {
+			response.statusCode = 500;
+			response.end(err && err.stack ? err.stack : String(err));
+		}
+	}
+};
+
+var buffered = createBuffer([]);
+process.stdin.on('data', function(chunk) {
+	buffered = buffered.length ? Buffer.concat([buffered, chunk]) : chunk;
+	while (buffered.length >= 4) {
+		var length = buffered.readUInt32BE(0);
+		if (buffered.length < 4 + length) break;
+		var message = JSON.parse(buffered.toString('utf8', 4, 4 + length));
+		buffered = buffered.slice(4 + length);
+		handleMessage(message);
+	}
+});
+
+// Exit once the python process closes the pipe
+process.stdin.on('end', function() {
+	process.exit(0);
+});
+
+writeMessage({startup_output: config.startup_output});
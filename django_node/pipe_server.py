@@ -0,0 +1,187 @@
+import os
+import sys
+import json
+import struct
+import itertools
+import threading
+import subprocess
+from concurrent.futures import Future, TimeoutError
+from requests.exceptions import ConnectionError, ReadTimeout
+from django.utils import six
+from .node_server import NodeServer
+from .settings import PATH_TO_NODE
+from .exceptions import NodeServerStartError
+from .file_transport import read_response
+from .result_cache import build_response
+
+HEADER = struct.Struct('>I')
+
+
+def read_frame(stream):
+    """
+    Returns the next message read from `stream`, or None if the stream has closed
+    """
+    header = stream.read(HEADER.size)
+    if len(header) < HEADER.size:
+        return None
+    body = stream.read(HEADER.unpack(header)[0])
+    return json.loads(body.decode('utf-8'))
+
+
+def write_frame(stream, message):
+    body = json.dumps(message).encode('utf-8')
+    stream.write(HEADER.pack(len(body)) + body)
+    stream.flush()
+
+
+class PipeConnection(object):
+    """
+    Exchanges framed messages with a process over its stdin and stdout, matching
+    each response to its request by id, so that many requests can be in progress
+    at once. The process's stderr is forwarded to `log`.
+    """
+
+    def __init__(self, process, log):
+        self.process = process
+        self.log = log
+        self.write_lock = threading.Lock()
+        # Guards `pending` and `is_closed`, so that no request is registered after
+        # the pending requests have been failed
+        self.lock = threading.Lock()
+        self.ids = itertools.count(1)
+        self.pending = {}
+        self.is_closed = False
+
+    def start(self):
+        """
+        Blocks until the process is ready, then starts the threads reading its
+        output. Returns the process's startup output.
+        """
+        message = read_frame(self.process.stdout)
+        for target in (self.read_responses, self.read_logs):
+            thread = threading.Thread(target=target)
+            thread.daemon = True
+            thread.start()
+        return message['startup_output'] if message else None
+
+    def read_responses(self):
+        while True:
+            try:
+                message = read_frame(self.process.stdout)
+            except (IOError, OSError, ValueError):
+                message = None
+            if message is None:
+                break
+            with self.lock:
+                future = self.pending.pop(message['id'], None)
+            if future is not None:
+                future.set_result(message)
+
+        with self.lock:
+            self.is_closed = True
+            futures = list(self.pending.values())
+            self.pending.clear()
+        for future in futures:
+            future.set_exception(ConnectionError('The process exited before responding'))
+
+    def read_logs(self):
+        for line in iter(self.process.stderr.readline, b''):
+            self.log(line.decode('utf-8').rstrip())
+
+    def send(self, endpoint, data, timeout=None):
+        with self.lock:
+            if self.is_closed:
+                raise ConnectionError('The process has exited')
+            request_id = next(self.ids)
+            future = self.pending[request_id] = Future()
+
+        message = {
+            'id': request_id,
+            'endpoint': endpoint,
+            'data': data.get('data') if data else None,
+            'cache_key': data.get('cache_key') if data else None,
+        }
+        try:
+            with self.write_lock:
+                write_frame(self.process.stdin, message)
+        except (IOError, OSError) as e:
+            with self.lock:
+                self.pending.pop(request_id, None)
+            six.reraise(ConnectionError, ConnectionError(*e.args), sys.exc_info()[2])
+
+        try:
+            return future.result(timeout)
+        except TimeoutError:
+            with self.lock:
+                self.pending.pop(request_id, None)
+            raise ReadTimeout('No response within {timeout} seconds'.format(timeout=timeout))
+
+
+class PipeNodeServer(NodeServer):
+    """
+    A server which exchanges messages with its process over the process's stdin
+    and stdout, avoiding the overhead of HTTP. The process is always started and
+    owned by the python process, so cannot be shared by multiple python processes.
+    """
+
+    path_to_source = os.path.join(os.path.dirname(__file__), 'pipe_host.js')
+    process_is_shared = False
+
+    def get_server_url(self):
+        if self.process is not None:
+            return 'pipe://{pid}'.format(pid=self.process.pid)
+
+    def supports_file_transport(self):
+        return bool(self.file_transport_threshold)
+
+    def get_start_command(self, path_to_config, debug=None):
+        cmd = (PATH_TO_NODE,)
+        if debug:
+            # The process's stdin carries requests, so is not available to node's debugger
+            cmd += ('--inspect',)
+        return cmd + (self.path_to_runtime, self.path_to_source, '--config', path_to_config)
+
+    def run_in_foreground(self, cmd):
+        # Only this python process can communicate with the process, so it is
+        # started as usual, then blocks until the process exits
+        self.start_process(cmd)
+        self.complete_start()
+        try:
+            self.process.wait()
+        finally:
+            self.stop()
+
+    def start_process(self, cmd):
+        try:
+            process = subprocess.Popen(
+                cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE
+            )
+        except (TypeError, AttributeError, OSError):
+            msg = 'Failed to start server with {arguments}'.format(arguments=cmd)
+            six.reraise(NodeServerStartError, NodeServerStartError(msg), sys.exc_info()[2])
+
+        # The connection is attached to its process, so that requests sent to a
+        # recycled process can complete after its replacement takes over
+        process.pipe_connection = PipeConnection(process, self.log_output)
+        output = process.pipe_connection.start()
+
+        if output is None:
+            process.wait()
+            raise NodeServerStartError('The process exited before it was ready')
+
+        self.process = process
+
+    def log_output(self, line):
+        self.log('Output: {line}'.format(line=line))
+
+    def post(self, absolute_url, endpoint, timeout=None, data=None, routing_key=None):
+        process = self.process
+        if process is None or process.poll() is not None:
+            raise ConnectionError('The process is not running')
+
+        message = process.pipe_connection.send(endpoint, data, timeout=timeout)
+
+        response = build_response(message['status'], message['body'].encode('utf-8'), encoding='utf-8')
+        response.headers.update(message['headers'])
+        response.url = absolute_url
+        return read_response(response)
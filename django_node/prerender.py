@@ -0,0 +1,61 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from .exceptions import PrerenderError
+from .result_cache import get_result_cache
+
+logger = logging.getLogger(__name__)
+
+
+def prerender(server, entries, concurrency=None, result_cache=None):
+    """
+    Sends each of the `entries` to a temporary server process, and stores the
+    responses in the result cache, so that identical calls made at runtime
+    are served without the server.
+
+    `entries` is a list of dictionaries, each containing a `service` name or
+    import path, and the `kwargs` to send it.
+
+    Returns a tuple containing the number of entries rendered and a list of
+    `(entry, error)` tuples for the entries which failed.
+    """
+    if concurrency is None:
+        concurrency = 1
+    if result_cache is None:
+        result_cache = get_result_cache()
+    if result_cache is None:
+        raise PrerenderError('The RESULT_CACHE setting must be defined to prerender services')
+
+    services = []
+    for entry in entries:
+        service = server.get_service(entry['service'])
+        if not service.cache_results:
+            raise PrerenderError(
+                '{service} does not set `cache_results`, so its prerendered results would never be used'.format(
+                    service=service.get_name(),
+                )
+            )
+        services.append(service)
+
+    # Render with a separate process, so that a server used by the site is unaffected
+    temporary_server = server.start_replacement()
+
+    def render(args):
+        service, entry = args
+        instance = service()
+        instance.server = temporary_server
+        instance.result_cache = result_cache
+        try:
+            instance.send(**entry.get('kwargs', {}))
+        except Exception as e:
+            logger.warning('Failed to prerender {entry}: {error}'.format(entry=entry, error=e))
+            return e
+
+    try:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            errors = list(executor.map(render, zip(services, entries)))
+    finally:
+        temporary_server.stop()
+
+    failures = [(entry, error) for entry, error in zip(entries, errors) if error is not None]
+
+    return len(entries) - len(failures), failures
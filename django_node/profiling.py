@@ -0,0 +1,83 @@
+import json
+from django.utils import six
+if six.PY2:
+    from urlparse import urlparse
+    from urllib import unquote
+elif six.PY3:
+    from urllib.parse import urlparse, unquote
+
+CPU_PROFILE = 'cpu'
+HEAP_SNAPSHOT = 'heap'
+
+FILE_EXTENSIONS = {
+    CPU_PROFILE: '.cpuprofile',
+    HEAP_SNAPSHOT: '.heapsnapshot',
+}
+
+
+def _get_path_from_url(url):
+    # Newer versions of node report the sources of modules as file urls
+    if url.startswith('file://'):
+        return unquote(urlparse(url).path)
+    return url
+
+
+def filter_cpu_profile(profile, paths):
+    """
+    Reduces a CPU profile to the call trees which pass through the files
+    in `paths`. Samples taken outside of those trees are attributed to the
+    profile's root node, so the profile's timings remain intact.
+    """
+    paths = set(paths)
+    nodes = profile['nodes']
+    nodes_by_id = dict((node['id'], node) for node in nodes)
+    root_id = nodes[0]['id']
+
+    parents = {}
+    for node in nodes:
+        for child_id in node.get('children', ()):
+            parents[child_id] = node['id']
+
+    def matches(node):
+        return _get_path_from_url(node['callFrame'].get('url', '')) in paths
+
+    # Retain nodes within the files, everything they call...
+    retained = set()
+    for node in nodes:
+        node_id = node['id']
+        while node_id is not None:
+            if matches(nodes_by_id[node_id]):
+                retained.add(node['id'])
+                break
+            node_id = parents.get(node_id)
+
+    # ...and the nodes which lead to them
+    for node_id in list(retained):
+        node_id = parents.get(node_id)
+        while node_id is not None and node_id not in retained:
+            retained.add(node_id)
+            node_id = parents.get(node_id)
+    retained.add(root_id)
+
+    root = nodes_by_id[root_id]
+    filtered_nodes = []
+    for node in nodes:
+        if node['id'] not in retained:
+            root['hitCount'] = root.get('hitCount', 0) + node.get('hitCount', 0)
+            continue
+        if 'children' in node:
+            node['children'] = [child_id for child_id in node['children'] if child_id in retained]
+        filtered_nodes.append(node)
+
+    profile['nodes'] = filtered_nodes
+    if 'samples' in profile:
+        profile['samples'] = [
+            sample if sample in retained else root_id
+            for sample in profile['samples']
+        ]
+
+    return profile
+
+
+def filter_serialised_cpu_profile(serialised_profile, paths):
+    return json.dumps(filter_cpu_profile(json.loads(serialised_profile), paths))
@@ -0,0 +1,37 @@
+import hashlib
+from django.utils import six
+
+# Keep in sync with runtime.js
+REFERENCE_KEY = '__django_node_reference__'
+MISSING_REFERENCES_HEADER = 'X-Django-Node-Missing-References'
+
+
+def get_digest(serialized_value):
+    if isinstance(serialized_value, six.text_type):
+        serialized_value = serialized_value.encode('utf-8')
+    return hashlib.sha1(serialized_value).hexdigest()
+
+
+def build_reference(digest, value=None, size=None, upload=None):
+    """
+    Returns the placeholder which is sent in place of a value. If `upload` is
+    True, the value is included so that the server can store it.
+    """
+    reference = {REFERENCE_KEY: digest}
+    if upload:
+        reference['value'] = value
+        reference['size'] = size
+    return reference
+
+
+def get_missing_references(response):
+    """
+    Returns the digests of the references which the server could not resolve,
+    or an empty list if the response was not rejected for missing references.
+    """
+    if response.status_code != 409:
+        return []
+    header = response.headers.get(MISSING_REFERENCES_HEADER)
+    if not header:
+        return []
+    return header.split(',')
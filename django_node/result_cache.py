@@ -0,0 +1,278 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+import collections
+import requests
+from .settings import RESULT_CACHE
+from .utils import dynamic_import_attribute
+
+DEFAULT_BACKEND = 'django_node.result_cache.SQLiteResultCache'
+
+
+def build_response(status_code, content, content_type=None, encoding=None):
+    """
+    Returns a `requests.Response` equivalent to one received from the server
+    """
+    response = requests.Response()
+    response.status_code = status_code
+    response._content = content
+    response.encoding = encoding
+    if content_type:
+        response.headers['Content-Type'] = content_type
+    return response
+
+
+# The most recent fingerprints, keyed by the paths, modification times and sizes of their files
+_fingerprints = collections.OrderedDict()
+_fingerprints_lock = threading.Lock()
+MAX_FINGERPRINTS = 1000
+
+
+def read_fingerprinted_content(path):
+    """
+    Returns the content of the file at `path` which determines the fingerprint.
+    Installed packages are identified by their version, as npm records details
+    of the machine which installed them in their `package.json`.
+    """
+    with open(path, 'rb') as source_file:
+        content = source_file.read()
+    if os.path.basename(path) == 'package.json' and 'node_modules' in path.split(os.sep):
+        try:
+            return json.loads(content.decode('utf-8')).get('version', '').encode('utf-8')
+        except ValueError:
+            pass
+    return content
+
+
+def get_files_fingerprint(paths, root=None):
+    """
+    Returns a digest of the contents of the files in `paths` which exist, and
+    of their paths relative to `root`, so that the same files produce the same
+    digest on any machine. Digests are cached until the modification time or
+    size of a file changes.
+    """
+    signature = (root,)
+    for path in paths:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        signature += ((path, stat.st_mtime, stat.st_size),)
+
+    with _fingerprints_lock:
+        fingerprint = _fingerprints.get(signature)
+    if fingerprint is None:
+        hasher = hashlib.sha1()
+        for path, mtime, size in signature[1:]:
+            relative_path = os.path.relpath(path, root) if root is not None else os.path.basename(path)
+            hasher.update(relative_path.replace(os.sep, '/').encode('utf-8'))
+            hasher.update(read_fingerprinted_content(path))
+        fingerprint = hasher.hexdigest()
+        with _fingerprints_lock:
+            _fingerprints[signature] = fingerprint
+            while len(_fingerprints) > MAX_FINGERPRINTS:
+                _fingerprints.popitem(last=False)
+
+    return fingerprint
+
+
+_package_paths = {}
+
+
+def get_package_paths(directory):
+    """
+    Returns the paths of the `package.json` files of the packages which the
+    `package.json` in `directory` depends on, as installed in `node_modules`.
+    The paths are cached until the `package.json` changes.
+    """
+    path_to_package = os.path.join(directory, 'package.json')
+    try:
+        stat = os.stat(path_to_package)
+    except OSError:
+        return ()
+
+    signature = (path_to_package, stat.st_mtime, stat.st_size)
+    paths = _package_paths.get(directory)
+    if paths is not None and paths[0] == signature:
+        return paths[1]
+
+    try:
+        with open(path_to_package, 'r') as package_file:
+            package = json.load(package_file)
+    except (IOError, OSError, ValueError):
+        return ()
+
+    names = set()
+    for field in ('dependencies', 'optionalDependencies', 'peerDependencies'):
+        names.update(package.get(field) or ())
+    paths = tuple(
+        os.path.join(directory, 'node_modules', name, 'package.json') for name in sorted(names)
+    )
+    _package_paths[directory] = (signature, paths)
+    return paths
+
+
+def get_cache_key(service_name, fingerprint, serialized_data):
+    hasher = hashlib.sha1()
+    for value in (service_name, fingerprint, serialized_data):
+        hasher.update(value.encode('utf-8'))
+        hasher.update(b'\0')
+    return hasher.hexdigest()
+
+
+class BaseResultCache(object):
+    """
+    A store for the responses of services, keyed by strings generated by
+    `get_cache_key`
+    """
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """
+        Returns a `requests.Response` or None
+        """
+        raise NotImplementedError()
+
+    def set(self, key, service_name, response):
+        raise NotImplementedError()
+
+    def clear(self):
+        raise NotImplementedError()
+
+
+class SQLiteResultCache(BaseResultCache):
+    """
+    Persists responses in an SQLite database, which can be shared by multiple
+    processes. Once the size of the stored responses exceeds `max_size` bytes,
+    the least recently used responses are evicted.
+    """
+
+    # Reads only update an entry's access time if it is older than this number
+    # of seconds, which avoids a write for every read
+    access_time_resolution = 60
+
+    def __init__(self, path, max_size=None, timeout=None):
+        super(SQLiteResultCache, self).__init__()
+        self.path = path
+        self.max_size = max_size
+        self.timeout = timeout if timeout is not None else 5.0
+        self.local = threading.local()
+        self.create_table()
+
+    def get_connection(self):
+        # Connections cannot be shared between threads or across a fork
+        pid = os.getpid()
+        if getattr(self.local, 'pid', None) != pid:
+            directory = os.path.dirname(self.path)
+            if directory and not os.path.isdir(directory):
+                os.makedirs(directory)
+            connection = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            # Write-ahead logging allows readers to continue while another process writes
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            self.local.connection = connection
+            self.local.pid = pid
+        return self.local.connection
+
+    def create_table(self):
+        connection = self.get_connection()
+        connection.execute(
+            'CREATE TABLE IF NOT EXISTS results ('
+            'key TEXT PRIMARY KEY, '
+            'service TEXT NOT NULL, '
+            'status_code INTEGER NOT NULL, '
+            'content BLOB NOT NULL, '
+            'content_type TEXT, '
+            'encoding TEXT, '
+            'size INTEGER NOT NULL, '
+            'accessed REAL NOT NULL'
+            ')'
+        )
+        connection.execute('CREATE INDEX IF NOT EXISTS results_accessed ON results (accessed)')
+
+    def get(self, key):
+        connection = self.get_connection()
+        row = connection.execute(
+            'SELECT status_code, content, content_type, encoding, accessed FROM results WHERE key = ?',
+            (key,)
+        ).fetchone()
+
+        if row is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        status_code, content, content_type, encoding, accessed = row
+
+        now = time.time()
+        if now - accessed > self.access_time_resolution:
+            connection.execute('UPDATE results SET accessed = ? WHERE key = ?', (now, key))
+
+        return build_response(status_code, bytes(content), content_type, encoding)
+
+    def set(self, key, service_name, response):
+        content = response.content
+        connection = self.get_connection()
+        connection.execute(
+            'INSERT OR REPLACE INTO results '
+            '(key, service, status_code, content, content_type, encoding, size, accessed) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+            (
+                key, service_name, response.status_code, sqlite3.Binary(content),
+                response.headers.get('Content-Type'), response.encoding, len(content), time.time()
+            )
+        )
+        if self.max_size is not None:
+            self.evict()
+
+    def get_size(self):
+        return self.get_connection().execute('SELECT COALESCE(SUM(size), 0) FROM results').fetchone()[0]
+
+    def evict(self):
+        """
+        Removes the least recently used responses until the cache is within `max_size`
+        """
+        connection = self.get_connection()
+        excess = self.get_size() - self.max_size
+        if excess <= 0:
+            return
+
+        keys = []
+        for key, size in connection.execute('SELECT key, size FROM results ORDER BY accessed ASC'):
+            keys.append(key)
+            excess -= size
+            if excess <= 0:
+                break
+
+        connection.executemany('DELETE FROM results WHERE key = ?', [(key,) for key in keys])
+
+    def clear(self):
+        self.get_connection().execute('DELETE FROM results')
+
+
+_result_cache = None
+_result_cache_lock = threading.Lock()
+
+
+def get_result_cache():
+    """
+    Returns the cache configured by the RESULT_CACHE setting, or None
+    """
+    global _result_cache
+
+    if RESULT_CACHE is None:
+        return None
+
+    if _result_cache is None:
+        with _result_cache_lock:
+            if _result_cache is None:
+                backend = dynamic_import_attribute(RESULT_CACHE.get('BACKEND', DEFAULT_BACKEND))
+                _result_cache = backend(**RESULT_CACHE.get('OPTIONS', {}))
+
+    return _result_cache
@@ -0,0 +1,635 @@
+// Bootstraps the server, wrapping the handler of each service defined in the
+// server's config, so that django-node can process requests before they reach
+// the services.
+//
+// Usage: node runtime.js path/to/server.js --config path/to/config.json
+//
+// To build a code cache for the services in a config:
+// node runtime.js --build-code-cache path/to/directory --config path/to/config.json
+//
+// When required by a service, exports the runtime's state.
+
+var fs = require('fs');
+var vm = require('vm');
+var http = require('http');
+var https = require('https');
+var path = require('path');
+var util = require('util');
+var crypto = require('crypto');
+var Module = require('module');
+var EventEmitter = require('events').EventEmitter;
+
+var REFERENCE_KEY = '__django_node_reference__';
+var MISSING_REFERENCES_HEADER = 'X-Django-Node-Missing-References';
+var TRANSPORT_KEY = '__django_node_transport__';
+var FILE_HEADER = 'X-Django-Node-File';
+var TIMEOUT_KEY = '__django_node_timeout__';
+var DEADLINE_EXCEEDED_HEADER = 'X-Django-Node-Deadline-Exceeded';
+var BATCH_KEY = '__django_node_batch__';
+var CODE_CACHE_MANIFEST = 'manifest.json';
+
+var responseFileCount = 0;
+
+var runtime = module.exports = {
+	config: null,
+	// The only directory in which payloads are exchanged via files
+	fileTransportDirectory: null,
+	// Wrapped services, keyed by the absolute path to their source
+	services: {},
+	references: null,
+	// Requests which were past their deadline before they reached a service, and
+	// requests which were abandoned by the client while a service was handling them
+	counters: {
+		dropped: 0,
+		cancelled: 0
+	},
+	// The modules loaded from the code cache, and those which were compiled
+	// as they were missing from the cache, or had changed since it was built
+	codeCache: {
+		enabled: false,
+		hits: 0,
+		misses: 0,
+		rejected: 0
+	}
+};
+
+// A store of the values sent by reference, which evicts the least recently used
+// values once the total size exceeds `maxSize` characters
+var ReferenceStore = function(maxSize) {
+	this.maxSize = maxSize;
+	this.size = 0;
+	this.entries = {};
+	this.counter = 0;
+};
+
+ReferenceStore.prototype.get = function(digest) {
+	var entry = this.entries[digest];
+	if (entry) {
+		entry.used = ++this.counter;
+		return entry;
+	}
+};
+
+ReferenceStore.prototype.set = function(digest, value, size) {
+	if (this.entries[digest]) {
+		this.size -= this.entries[digest].size;
+	}
+	this.entries[digest] = {value: value, size: size, used: ++this.counter};
+	this.size += size;
+	this.evict();
+};
+
+ReferenceStore.prototype.evict = function() {
+	if (this.size <= this.maxSize) return;
+
+	var entries = this.entries;
+	var digests = Object.keys(entries).sort(function(a, b) {
+		return entries[a].used - entries[b].used;
+	});
+	// Never evict the most recently used value, as it is about to be used
+	for (var i = 0; i < digests.length - 1 && this.size > this.maxSize; i++) {
+		this.size -= entries[digests[i]].size;
+		delete entries[digests[i]];
+	}
+};
+
+runtime.references = new ReferenceStore(64 * 1024 * 1024);
+
+// Replaces references in the top level of `data` with their values. Returns
+// the digests of any references which are not in the store.
+var resolveReferences = function(data) {
+	var missing = [];
+	if (!data || typeof data !== 'object') return missing;
+
+	Object.keys(data).forEach(function(key) {
+		var value = data[key];
+		if (!value || typeof value !== 'object' || !value.hasOwnProperty(REFERENCE_KEY)) return;
+
+		var digest = value[REFERENCE_KEY];
+		if (value.hasOwnProperty('value')) {
+			runtime.references.set(digest, value.value, value.size || 0);
+			data[key] = value.value;
+			return;
+		}
+
+		var entry = runtime.references.get(digest);
+		if (entry) {
+			data[key] = entry.value;
+		} else {
+			missing.push(digest);
+		}
+	});
+
+	return missing;
+};
+
+// Removes response files which the client abandoned, once they can no longer be read
+var ABANDONED_RESPONSE_GRACE = 5000;
+
+var removeFile = function(filename) {
+	fs.unlink(filename, function() {});
+};
+
+// Returns the resolved path of `filename`, if it is a file within the server's
+// file transport directory
+var resolveTransportFile = function(filename) {
+	var directory = runtime.fileTransportDirectory;
+	if (!directory || typeof filename !== 'string') return null;
+	try {
+		filename = fs.realpathSync(filename);
+	} catch(err) {
+		return null;
+	}
+	return path.dirname(filename) === directory ? filename : null;
+};
+
+// Reads data which was written to a file, rather than sent in the request, and
+// ensures that large responses are written to a file. Files are only read from,
+// and written to, the directory defined in the server's config. Returns the
+// data, or undefined if the request was rejected.
+var useFileTransport = function(data, response) {
+	var transport = data && data[TRANSPORT_KEY];
+	if (!transport) return data;
+
+	if (!runtime.fileTransportDirectory) {
+		response.statusCode = 400;
+		response.end('The server does not exchange payloads via files');
+		return;
+	}
+
+	if (transport.path) {
+		var filename = resolveTransportFile(transport.path);
+		if (!filename) {
+			response.statusCode = 400;
+			response.end('The request\'s file is not within the server\'s file transport directory');
+			return;
+		}
+		data = JSON.parse(fs.readFileSync(filename, 'utf8'));
+	} else {
+		delete data[TRANSPORT_KEY];
+	}
+
+	var end = response.end;
+	response.end = function(chunk, encoding) {
+		if (
+			chunk && typeof chunk !== 'function' && !response.headersSent && !response.cancelled &&
+			Buffer.byteLength(chunk, typeof encoding === 'string' ? encoding : undefined) > transport.threshold
+		) {
+			var filename = path.join(
+				runtime.fileTransportDirectory, 'response-' + process.pid + '-' + (++responseFileCount) + '.json'
+			);
+			fs.writeFileSync(filename, chunk, typeof encoding === 'string' ? encoding : undefined);
+			response.setHeader(FILE_HEADER, filename);
+			response.setHeader('Content-Length', 0);
+
+			// The client removes the file once it has read it. If the client gives
+			// up on the request first, nothing else would remove it
+			if (response.deadline) {
+				var timer = setTimeout(function() {
+					removeFile(filename);
+				}, Math.max(0, response.deadline - Date.now()) + ABANDONED_RESPONSE_GRACE);
+				if (timer.unref) {
+					timer.unref();
+				}
+			}
+			var flushed = false;
+			response.on('finish', function() {
+				flushed = true;
+			});
+			response.on('close', function() {
+				if (!flushed) {
+					removeFile(filename);
+				}
+			});
+
+			return end.call(response);
+		}
+		return end.apply(response, arguments);
+	};
+
+	return data;
+};
+
+// Marks the response as cancelled and emits a `cancel` event once the client has
+// abandoned the request, either by disconnecting or by reaching its deadline.
+// Services performing lengthy work can check `response.cancelled` or listen for
+// the event, and stop early.
+var trackCancellation = function(response, deadline) {
+	response.cancelled = false;
+
+	var cancel = function() {
+		if (response.cancelled || response.finished) return;
+		response.cancelled = true;
+		runtime.counters.cancelled++;
+		response.emit('cancel');
+	};
+
+	var timer = setTimeout(cancel, Math.max(0, deadline - Date.now()));
+	if (timer.unref) {
+		timer.unref();
+	}
+
+	response.on('finish', function() {
+		clearTimeout(timer);
+	});
+	response.on('close', function() {
+		clearTimeout(timer);
+		cancel();
+	});
+};
+
+// Collects the output of a service, emulating the methods of the server's
+// responses which services commonly use. Used for the items of a batch, and by
+// hosts which do not use HTTP
+var BufferedResponse = function(callback) {
+	EventEmitter.call(this);
+	this.statusCode = 200;
+	this.headers = {};
+	this.chunks = [];
+	this.headersSent = false;
+	this.finished = false;
+	this.cancelled = false;
+	this.callback = callback;
+};
+
+util.inherits(BufferedResponse, EventEmitter);
+
+runtime.BufferedResponse = BufferedResponse;
+
+BufferedResponse.prototype.status = function(code) {
+	this.statusCode = code;
+	return this;
+};
+
+BufferedResponse.prototype.setHeader = function(name, value) {
+	this.headers[name] = String(value);
+};
+
+BufferedResponse.prototype.getHeader = function(name) {
+	return this.headers[name];
+};
+
+BufferedResponse.prototype.removeHeader = function(name) {
+	delete this.headers[name];
+};
+
+BufferedResponse.prototype.set = function(name, value) {
+	if (typeof name === 'object') {
+		for (var key in name) {
+			this.setHeader(key, name[key]);
+		}
+	} else {
+		this.setHeader(name, value);
+	}
+	return this;
+};
+
+BufferedResponse.prototype.write = function(chunk) {
+	if (chunk && typeof chunk !== 'function') {
+		this.chunks.push(String(chunk));
+	}
+	return true;
+};
+
+BufferedResponse.prototype.end = function(chunk) {
+	if (this.finished) return;
+	this.write(chunk);
+	this.headersSent = true;
+	this.finished = true;
+	this.emit('finish');
+	this.callback({
+		status: this.statusCode,
+		headers: this.headers,
+		body: this.chunks.join('')
+	});
+};
+
+BufferedResponse.prototype.send = function(status, body) {
+	if (arguments.length > 1) {
+		this.statusCode = status;
+	} else {
+		body = status;
+	}
+	if (body && typeof body === 'object' && !Buffer.isBuffer(body)) {
+		return this.json(body);
+	}
+	this.end(body === undefined ? '' : body);
+};
+
+BufferedResponse.prototype.json = function(obj) {
+	this.setHeader('Content-Type', 'application/json');
+	this.end(JSON.stringify(obj));
+};
+
+BufferedResponse.prototype.sendStatus = function(code) {
+	this.statusCode = code;
+	this.end(String(code));
+};
+
+// Resolves any references in `data` and calls the service's handler
+var handle = function(service, context, data, response) {
+	var missing = resolveReferences(data);
+	if (missing.length) {
+		response.statusCode = 409;
+		response.setHeader(MISSING_REFERENCES_HEADER, missing.join(','));
+		response.end(JSON.stringify({missing_references: missing}));
+		return;
+	}
+	return service.handler.call(context, data, response);
+};
+
+// Calls the service with each of the items in a batch, and responds with a list
+// of each call's status, headers and body once all of the calls have finished
+var handleBatch = function(service, context, items, response) {
+	var results = new Array(items.length);
+	var remaining = items.length;
+
+	var finish = function() {
+		response.setHeader('Content-Type', 'application/json');
+		response.end(JSON.stringify(results));
+	};
+
+	if (!remaining) {
+		return finish();
+	}
+
+	var itemResponses = items.map(function(item, i) {
+		return new BufferedResponse(function(result) {
+			results[i] = result;
+			if (--remaining === 0) {
+				finish();
+			}
+		});
+	});
+
+	if (typeof response.on === 'function') {
+		response.on('cancel', function() {
+			itemResponses.forEach(function(itemResponse) {
+				if (!itemResponse.finished) {
+					itemResponse.cancelled = true;
+					itemResponse.emit('cancel');
+				}
+			});
+		});
+	}
+
+	items.forEach(function(item, i) {
+		try {
+			handle(service, context, item, itemResponses[i]);
+		} catch(err) {
+			if (!itemResponses[i].finished) {
+				itemResponses[i].statusCode = 500;
+				itemResponses[i].end(err && err.stack ? err.stack : String(err));
+			}
+		}
+	});
+};
+
+runtime.wrap = function(filename, handler) {
+	var service = runtime.services[filename];
+	if (service) {
+		service.handler = handler;
+		service.loads++;
+		return service.wrapper;
+	}
+
+	service = runtime.services[filename] = {
+		filename: filename,
+		handler: handler,
+		wrapper: null,
+		// The number of times the service's module has been loaded
+		loads: 1
+	};
+
+	service.wrapper = function(data, response) {
+		data = useFileTransport(data, response);
+		if (response.finished) return;
+
+		// The client sends the number of milliseconds until it abandons the request,
+		// as its clock may differ from this machine's
+		var timeout = data && data[TIMEOUT_KEY];
+		if (typeof timeout === 'number') {
+			delete data[TIMEOUT_KEY];
+			var receivedAt = (response.req && response.req.receivedAt) || Date.now();
+			var deadline = response.deadline = receivedAt + timeout;
+			if (Date.now() >= deadline) {
+				runtime.counters.dropped++;
+				response.statusCode = 504;
+				response.setHeader(DEADLINE_EXCEEDED_HEADER, '1');
+				response.end('The request\'s deadline passed before it reached the service');
+				return;
+			}
+			trackCancellation(response, deadline);
+		}
+
+		if (data && data[BATCH_KEY]) {
+			return handleBatch(service, this, data[BATCH_KEY], response);
+		}
+
+		return handle(service, this, data, response);
+	};
+
+	return service.wrapper;
+};
+
+var sha1 = function(content) {
+	return crypto.createHash('sha1').update(content).digest('hex');
+};
+
+// Node accepts the options of `require.resolve` from 8.9
+var RESOLVE_ACCEPTS_OPTIONS = Module._resolveFilename.length >= 4;
+
+// Emulates the `require` function which node provides to each module, as node
+// does. `Module.createRequire` is not used, as it would attach the modules
+// loaded by the module to a separate module, rather than to its children.
+var createRequire = function(mod) {
+	var require = function(request) {
+		return mod.require(request);
+	};
+	require.resolve = function(request, options) {
+		if (options !== undefined && !RESOLVE_ACCEPTS_OPTIONS) {
+			throw new Error('require.resolve does not accept options in node ' + process.version);
+		}
+		return Module._resolveFilename(request, mod, false, options);
+	};
+	require.resolve.paths = function(request) {
+		// Older versions of node only return the paths if the third argument is true
+		return Module._resolveLookupPaths(request, mod, true);
+	};
+	require.main = process.mainModule;
+	require.extensions = Module._extensions;
+	require.cache = Module._cache;
+	return require;
+};
+
+var compileModule = function(content, filename, cachedData) {
+	// Strip any shebang, as node would
+	var wrapper = Module.wrap(content.replace(/^#!.*/, ''));
+	return new vm.Script(wrapper, {filename: filename, cachedData: cachedData});
+};
+
+var runCompiledModule = function(mod, script, filename) {
+	var fn = script.runInThisContext({displayErrors: true});
+	return fn.call(mod.exports, mod.exports, createRequire(mod), mod, filename, path.dirname(filename));
+};
+
+// Compiles modules with the V8 code cache in `directory`, if it was built by
+// the same version of node. Modules which have changed since the cache was
+// built are compiled as usual.
+var useCodeCache = function(directory) {
+	var manifest;
+	try {
+		manifest = JSON.parse(fs.readFileSync(path.join(directory, CODE_CACHE_MANIFEST), 'utf8'));
+	} catch(err) {
+		return;
+	}
+	if (manifest.node_version !== process.version) return;
+
+	runtime.codeCache.enabled = true;
+
+	var compile = Module.prototype._compile;
+	Module.prototype._compile = function(content, filename) {
+		var entry = manifest.files[filename];
+		var cachedData;
+		if (entry && entry.hash === sha1(content)) {
+			try {
+				cachedData = fs.readFileSync(path.join(directory, entry.cache));
+			} catch(err) {}
+		}
+		if (!cachedData) {
+			runtime.codeCache.misses++;
+			return compile.apply(this, arguments);
+		}
+
+		var script = compileModule(content, filename, cachedData);
+		if (script.cachedDataRejected) {
+			runtime.codeCache.rejected++;
+		} else {
+			runtime.codeCache.hits++;
+		}
+		return runCompiledModule(this, script, filename);
+	};
+};
+
+// Creates `directory` and any missing parents, as `fs.mkdirSync` only accepts
+// the `recursive` option from node 10.12
+var makeDirectories = function(directory) {
+	if (fs.existsSync(directory)) return;
+	makeDirectories(path.dirname(directory));
+	fs.mkdirSync(directory);
+};
+
+// Loads each of the services in the config, then writes a V8 code cache for
+// every module they loaded to `directory`, alongside a manifest recording the
+// hash of each module and the modules loaded by each service
+var buildCodeCache = function(directory, config) {
+	if (typeof vm.Script.prototype.createCachedData !== 'function') {
+		throw new Error('Building a code cache requires node 10.6 or later, but node ' + process.version + ' is installed');
+	}
+
+	var scripts = {};
+	Module.prototype._compile = function(content, filename) {
+		var script = compileModule(content, filename);
+		scripts[filename] = {script: script, hash: sha1(content)};
+		return runCompiledModule(this, script, filename);
+	};
+
+	var services = {};
+	config.services.forEach(function(service) {
+		var loaded = Object.keys(scripts).length;
+		require(path.resolve(service.path_to_source));
+		services[service.name] = Object.keys(scripts).slice(loaded);
+	});
+
+	makeDirectories(directory);
+
+	var files = {};
+	var size = 0;
+	Object.keys(scripts).forEach(function(filename) {
+		// Functions which were compiled as the modules were loaded are included
+		var cachedData = scripts[filename].script.createCachedData();
+		var name = sha1(filename) + '.cache';
+		fs.writeFileSync(path.join(directory, name), cachedData);
+		files[filename] = {hash: scripts[filename].hash, cache: name};
+		size += cachedData.length;
+	});
+
+	fs.writeFileSync(path.join(directory, CODE_CACHE_MANIFEST), JSON.stringify({
+		node_version: process.version,
+		files: files,
+		services: services
+	}, null, 2));
+
+	process.stdout.write(JSON.stringify({files: Object.keys(files).length, size: size}) + '\n');
+	process.exit(0);
+};
+
+var bootstrap = function() {
+	var argv = process.argv;
+	var configIndex = argv.indexOf('--config');
+	var config = runtime.config = JSON.parse(fs.readFileSync(argv[configIndex + 1], 'utf8'));
+
+	if (argv[2] === '--build-code-cache') {
+		return buildCodeCache(path.resolve(argv[3]), config);
+	}
+
+	if (config.code_cache) {
+		useCodeCache(config.code_cache);
+	}
+
+	if (config.reference_store_size) {
+		runtime.references.maxSize = config.reference_store_size;
+	}
+
+	if (config.file_transport_directory) {
+		runtime.fileTransportDirectory = fs.realpathSync(config.file_transport_directory);
+	}
+
+	var serviceFilenames = {};
+	(config.services || []).forEach(function(service) {
+		var filename = path.resolve(service.path_to_source);
+		try {
+			// Node resolves modules to their real paths
+			filename = fs.realpathSync(filename);
+		} catch(err) {}
+		serviceFilenames[filename] = true;
+	});
+
+	// Record when each request reaches the server, from which its deadline is derived
+	[http.Server, https.Server].forEach(function(Server) {
+		var emit = Server.prototype.emit;
+		Server.prototype.emit = function(event, request) {
+			if (event === 'request') {
+				request.receivedAt = Date.now();
+			}
+			return emit.apply(this, arguments);
+		};
+	});
+
+	// Wrap the exports of each service as they are loaded by the server
+	var load = Module._load;
+	Module._load = function(request, parent, isMain) {
+		var exported = load.apply(this, arguments);
+		if (typeof exported !== 'function') return exported;
+
+		var filename;
+		try {
+			filename = Module._resolveFilename(request, parent, isMain);
+		} catch(err) {
+			return exported;
+		}
+		if (!serviceFilenames[filename] || exported === (runtime.services[filename] || {}).wrapper) {
+			return exported;
+		}
+		return runtime.wrap(filename, exported);
+	};
+
+	// Run the server as the main module, as if it had been invoked directly
+	argv.splice(1, 1);
+	argv[1] = path.resolve(argv[1]);
+	Module.runMain();
+};
+
+if (require.main === module) {
+	bootstrap();
+}
@@ -1,8 +1,9 @@
 import os
 import json
+from django.utils import six
 from ..base_service import BaseService
-from ..exceptions import NodeServerConnectionError, NodeServerTimeoutError
-from ..settings import SERVER_TEST_TIMEOUT
+from ..exceptions import NodeServerConnectionError, NodeServerTimeoutError, CommandTimeoutError
+from ..settings import SERVER_TEST_TIMEOUT, SERVER_EVAL_TIMEOUT, SERVER_PROFILE_TIMEOUT
 
 
 class EchoService(BaseService):
@@ -40,4 +41,122 @@ class EchoService(BaseService):
         if response.status_code != 200:
             return False
 
-        return response.text == self.expected_output
\ No newline at end of file
+        return response.text == self.expected_output
+
+
+class PingService(BaseService):
+    """
+    A service which does no work, used by NodeServer to cheaply check
+    if the server is responding.
+    """
+
+    path_to_source = os.path.join(os.path.dirname(__file__), 'ping.js')
+    timeout = SERVER_TEST_TIMEOUT
+    expected_output = '__NODE_SERVER_PONG__'
+
+    @classmethod
+    def warn_if_not_configured(cls):
+        pass
+
+
+class StatsService(BaseService):
+    """
+    Reports the memory usage, heap statistics, event loop lag, garbage
+    collection pauses and active handles of the server's process.
+    """
+
+    path_to_source = os.path.join(os.path.dirname(__file__), 'stats.js')
+    timeout = SERVER_TEST_TIMEOUT
+
+    @classmethod
+    def warn_if_not_configured(cls):
+        pass
+
+
+class ProfileService(BaseService):
+    """
+    Captures a CPU profile or a heap snapshot of the server's process,
+    via node's inspector module.
+    """
+
+    path_to_source = os.path.join(os.path.dirname(__file__), 'profile.js')
+    timeout = SERVER_PROFILE_TIMEOUT
+
+    @classmethod
+    def warn_if_not_configured(cls):
+        pass
+
+
+class ReloadService(BaseService):
+    """
+    Reloads services within the server's process, replacing their handlers
+    without restarting the process, and reports the local modules used by
+    each service.
+    """
+
+    path_to_source = os.path.join(os.path.dirname(__file__), 'reload.js')
+    timeout = SERVER_EVAL_TIMEOUT
+
+    @classmethod
+    def warn_if_not_configured(cls):
+        pass
+
+
+class EvalService(BaseService):
+    """
+    Evaluates a JS file or a snippet of JS within the server's process,
+    and returns the stdout and stderr that would have been produced by
+    running it with `node`.
+
+    Compiled scripts and any modules they `require` are cached between
+    calls, which avoids the cost of starting a process for each script.
+    """
+
+    path_to_source = os.path.join(os.path.dirname(__file__), 'eval.js')
+    timeout = SERVER_EVAL_TIMEOUT
+    # Allows the server to respond to a timed out script before the request expires
+    request_timeout_margin = 1.0
+
+    @classmethod
+    def warn_if_not_configured(cls):
+        pass
+
+    def evaluate(self, path_or_code, args=None, timeout=None):
+        """
+        Returns a dictionary containing the `stdout`, `stderr`, `exit_code` and
+        `result` of the script. `result` is the value of `module.exports`, if the
+        script assigned it, and is resolved first if it is a promise.
+        """
+        self.ensure_loaded()
+
+        if timeout is None:
+            timeout = self.timeout
+
+        data = {
+            'args': [six.text_type(arg) for arg in (args or ())],
+            'timeout': timeout,
+        }
+        if os.path.isfile(path_or_code):
+            data['path'] = os.path.abspath(path_or_code)
+        else:
+            data['code'] = path_or_code
+
+        response = self.get_server().send_request_to_service(
+            self.get_name(),
+            timeout=timeout + self.request_timeout_margin if timeout else None,
+            data={
+                'data': json.dumps(data)
+            }
+        )
+
+        output = self.handle_response(response).json()
+
+        if output['timed_out']:
+            raise CommandTimeoutError(
+                '{path_or_code} did not complete within {timeout} seconds'.format(
+                    path_or_code=path_or_code,
+                    timeout=timeout,
+                )
+            )
+
+        return output
\ No newline at end of file
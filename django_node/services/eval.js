@@ -0,0 +1,183 @@
+// Evaluates a file or a snippet of JS within the server's process, emulating
+// the stdout and stderr that `node path/to/file.js ...args` would produce.
+//
+// Compiled scripts are cached and modules loaded via `require` remain in
+// node's module cache, so successive calls avoid the cost of starting a
+// process and loading its dependencies.
+
+var fs = require('fs');
+var path = require('path');
+var vm = require('vm');
+var util = require('util');
+var Module = require('module');
+
+var MAX_CACHED_SNIPPETS = 100;
+
+var scripts = {};
+var snippets = {};
+var snippetCount = 0;
+
+// A single context is reused to invoke the compiled scripts, which allows
+// node to enforce the timeout on synchronous code
+var callContext = vm.createContext({});
+var callScript = new vm.Script('__call()');
+
+var ExitSignal = function(code) {
+	this.code = code;
+};
+
+var compile = function(source, filename) {
+	// Strip any shebang, as node would when running a file
+	source = source.replace(/^#!.*/, '');
+	var wrapper = (
+		'(function (exports, require, module, __filename, __dirname, console, process) {' +
+		source +
+		'\n});'
+	);
+	return new vm.Script(wrapper, {filename: filename});
+};
+
+var getScriptForFile = function(filename) {
+	var mtime = fs.statSync(filename).mtime.getTime();
+	var cached = scripts[filename];
+	if (!cached || cached.mtime !== mtime) {
+		cached = scripts[filename] = {
+			mtime: mtime,
+			script: compile(fs.readFileSync(filename, 'utf8'), filename)
+		};
+	}
+	return cached.script;
+};
+
+var getScriptForSnippet = function(code) {
+	if (!snippets.hasOwnProperty(code)) {
+		if (snippetCount >= MAX_CACHED_SNIPPETS) {
+			snippets = {};
+			snippetCount = 0;
+		}
+		snippets[code] = compile(code, '[eval]');
+		snippetCount++;
+	}
+	return snippets[code];
+};
+
+var createProcess = function(argv, output) {
+	var proxy = Object.create(process);
+	proxy.argv = argv;
+	proxy.stdout = {write: function(chunk) { output.stdout += chunk; return true; }};
+	proxy.stderr = {write: function(chunk) { output.stderr += chunk; return true; }};
+	proxy.exit = function(code) {
+		throw new ExitSignal(code || 0);
+	};
+	return proxy;
+};
+
+var createConsole = function(output) {
+	var log = function() {
+		output.stdout += util.format.apply(util, arguments) + '\n';
+	};
+	var error = function() {
+		output.stderr += util.format.apply(util, arguments) + '\n';
+	};
+	return {
+		log: log,
+		info: log,
+		dir: function(obj) { log(util.inspect(obj)); },
+		error: error,
+		warn: error,
+		trace: function() { error(new Error(util.format.apply(util, arguments)).stack); }
+	};
+};
+
+var formatError = function(err) {
+	return (err && err.stack ? err.stack : String(err)) + '\n';
+};
+
+var service = function(data, response) {
+	var output = {stdout: '', stderr: ''};
+	var timeout = data.timeout;
+	var args = data.args || [];
+	var finished = false;
+	var timer = null;
+	var filename, dirname, script;
+
+	var finish = function(extra) {
+		if (finished) return;
+		finished = true;
+		if (timer) clearTimeout(timer);
+		output.timed_out = false;
+		output.result = null;
+		for (var key in extra) {
+			output[key] = extra[key];
+		}
+		response.send(JSON.stringify(output));
+	};
+
+	try {
+		if (data.path) {
+			filename = path.resolve(data.path);
+			dirname = path.dirname(filename);
+			script = getScriptForFile(filename);
+		} else {
+			filename = '[eval]';
+			dirname = process.cwd();
+			script = getScriptForSnippet(data.code || '');
+		}
+	} catch(err) {
+		output.stderr += formatError(err);
+		return finish({exit_code: 1});
+	}
+
+	var mod = new Module(filename, null);
+	mod.filename = filename;
+	mod.paths = Module._nodeModulePaths(dirname);
+	var exportsObject = mod.exports;
+	var argv = data.path ? [process.execPath, filename].concat(args) : [process.execPath].concat(args);
+
+	var fn = script.runInThisContext();
+	callContext.__call = function() {
+		fn.call(
+			exportsObject, exportsObject, function(request) { return mod.require(request); }, mod,
+			filename, dirname, createConsole(output), createProcess(argv, output)
+		);
+	};
+
+	try {
+		callScript.runInContext(callContext, timeout ? {timeout: timeout * 1000} : undefined);
+	} catch(err) {
+		if (err instanceof ExitSignal) {
+			return finish({exit_code: err.code});
+		}
+		if (timeout && /timed out/.test(err.message)) {
+			return finish({exit_code: null, timed_out: true});
+		}
+		output.stderr += formatError(err);
+		return finish({exit_code: 1});
+	} finally {
+		callContext.__call = null;
+	}
+
+	// Scripts which export a promise are waited on, and the resolved value
+	// is returned as the result
+	var result = mod.exports;
+	if (result === exportsObject) {
+		return finish({exit_code: 0});
+	}
+	if (!result || typeof result.then !== 'function') {
+		return finish({exit_code: 0, result: result});
+	}
+
+	if (timeout) {
+		timer = setTimeout(function() {
+			finish({exit_code: null, timed_out: true});
+		}, timeout * 1000);
+	}
+	result.then(function(value) {
+		finish({exit_code: 0, result: value === undefined ? null : value});
+	}, function(err) {
+		output.stderr += formatError(err);
+		finish({exit_code: 1});
+	});
+};
+
+module.exports = service;
@@ -0,0 +1,7 @@
+// A minimal service, used to cheaply check if the server is responding
+
+var service = function(data, response) {
+	response.send('__NODE_SERVER_PONG__');
+};
+
+module.exports = service;
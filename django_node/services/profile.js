@@ -0,0 +1,68 @@
+// Captures a CPU profile or a heap snapshot of the server's process, via
+// node's built-in inspector. Only one capture can be in progress at a time.
+
+var inspector = null;
+try {
+	inspector = require('inspector');
+} catch(err) {
+	// The inspector module is only available in node >= 8
+}
+
+var inProgress = false;
+
+var fail = function(response, status, message) {
+	response.status(status).send(message);
+};
+
+var captureCpuProfile = function(session, seconds, callback) {
+	session.post('Profiler.enable', function(err) {
+		if (err) return callback(err);
+		session.post('Profiler.start', function(err) {
+			if (err) return callback(err);
+			setTimeout(function() {
+				session.post('Profiler.stop', function(err, result) {
+					if (err) return callback(err);
+					session.post('Profiler.disable', function() {
+						callback(null, JSON.stringify(result.profile));
+					});
+				});
+			}, seconds * 1000);
+		});
+	});
+};
+
+var captureHeapSnapshot = function(session, seconds, callback) {
+	var chunks = [];
+	session.on('HeapProfiler.addHeapSnapshotChunk', function(message) {
+		chunks.push(message.params.chunk);
+	});
+	session.post('HeapProfiler.takeHeapSnapshot', null, function(err) {
+		if (err) return callback(err);
+		callback(null, chunks.join(''));
+	});
+};
+
+var service = function(data, response) {
+	if (!inspector) {
+		return fail(response, 501, 'Profiling requires node >= 8, which provides the inspector module');
+	}
+	if (inProgress) {
+		return fail(response, 409, 'A profile is already being captured');
+	}
+
+	var capture = data.type === 'heap' ? captureHeapSnapshot : captureCpuProfile;
+	var session = new inspector.Session();
+	session.connect();
+	inProgress = true;
+
+	capture(session, data.seconds || 0, function(err, output) {
+		session.disconnect();
+		inProgress = false;
+		if (err) {
+			return fail(response, 500, err.message || String(err));
+		}
+		response.send(output);
+	});
+};
+
+module.exports = service;
@@ -0,0 +1,108 @@
+// Reloads services within the running process, replacing each service's
+// handler once its source, and the local modules it requires, have been
+// loaded again. Requests in progress complete with the previous handler.
+//
+// If a service fails to load, its previous modules are restored and it
+// continues with its previous handler.
+//
+// Responds with the filenames of the local modules used by each service, so
+// that the caller can watch them for changes.
+
+var fs = require('fs');
+var path = require('path');
+var Module = require('module');
+var runtime = require('../runtime');
+
+var runtimeFilename = require.resolve('../runtime');
+
+// Modules within node_modules are shared by the services and rarely change
+// during development, so are not reloaded
+var isLocal = function(filename) {
+	return filename !== runtimeFilename && filename.split(path.sep).indexOf('node_modules') === -1;
+};
+
+var getFilename = function(service) {
+	var filename = path.resolve(service.path_to_source);
+	try {
+		// Node resolves modules to their real paths
+		filename = fs.realpathSync(filename);
+	} catch(err) {}
+	return filename;
+};
+
+// Returns the filenames of the service's module and the local modules it requires
+var getDependencies = function(filename) {
+	var seen = {};
+	var pending = [filename];
+	while (pending.length) {
+		var current = pending.pop();
+		var mod = Module._cache[current];
+		if (seen[current] || !mod) continue;
+		seen[current] = true;
+		mod.children.forEach(function(child) {
+			if (isLocal(child.filename)) {
+				pending.push(child.filename);
+			}
+		});
+	}
+	return Object.keys(seen);
+};
+
+var reload = function(filename) {
+	if (!runtime.services[filename]) {
+		throw new Error(filename + ' has not been loaded by the server');
+	}
+
+	// The handler may be unchanged, if it is exported from a package within node_modules
+	var loads = runtime.services[filename].loads;
+	var previous = {};
+	getDependencies(filename).forEach(function(dependency) {
+		previous[dependency] = Module._cache[dependency];
+		delete Module._cache[dependency];
+	});
+
+	try {
+		// The runtime replaces the service's handler as the module is loaded
+		require(filename);
+		if (runtime.services[filename].loads === loads) {
+			throw new Error(filename + ' does not export a function');
+		}
+	} catch(err) {
+		Object.keys(previous).forEach(function(dependency) {
+			Module._cache[dependency] = previous[dependency];
+		});
+		throw err;
+	}
+};
+
+var service = function(data, response) {
+	var names = data.services;
+	var output = {};
+
+	(runtime.config.services || []).forEach(function(service) {
+		if (names && names.indexOf(service.name) === -1) return;
+
+		var filename = getFilename(service);
+		if (filename === __filename) return;
+		var result = output[service.name] = {
+			reloaded: false,
+			error: null,
+			dependencies: null
+		};
+
+		if (data.reload) {
+			try {
+				reload(filename);
+				result.reloaded = true;
+			} catch(err) {
+				result.error = err && err.stack ? err.stack : String(err);
+			}
+		}
+
+		result.dependencies = getDependencies(filename);
+	});
+
+	response.send(JSON.stringify(output));
+};
+
+module.exports = service;
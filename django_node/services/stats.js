@@ -0,0 +1,97 @@
+// Reports the resource usage of the server's process. Event loop lag and
+// garbage collection pauses are sampled continuously, and the maximums are
+// reset each time the stats are read.
+
+var runtime = require('../runtime');
+
+var LAG_SAMPLE_INTERVAL = 500;
+
+var lag = {
+	last: 0,
+	max: 0
+};
+
+var gc = {
+	available: false,
+	count: 0,
+	total_duration: 0,
+	max_duration: 0
+};
+
+var expected = Date.now() + LAG_SAMPLE_INTERVAL;
+var lagTimer = setInterval(function() {
+	var now = Date.now();
+	lag.last = Math.max(0, now - expected);
+	lag.max = Math.max(lag.max, lag.last);
+	expected = now + LAG_SAMPLE_INTERVAL;
+}, LAG_SAMPLE_INTERVAL);
+
+// Allow the process to exit while the sampler is running
+if (lagTimer.unref) {
+	lagTimer.unref();
+}
+
+try {
+	var PerformanceObserver = require('perf_hooks').PerformanceObserver;
+	var observer = new PerformanceObserver(function(list) {
+		list.getEntries().forEach(function(entry) {
+			gc.count++;
+			gc.total_duration += entry.duration;
+			gc.max_duration = Math.max(gc.max_duration, entry.duration);
+		});
+	});
+	observer.observe({entryTypes: ['gc']});
+	gc.available = true;
+} catch(err) {
+	// perf_hooks is only available in newer versions of node
+}
+
+var getHeapStatistics = function() {
+	try {
+		return require('v8').getHeapStatistics();
+	} catch(err) {
+		return null;
+	}
+};
+
+var countOf = function(name) {
+	return typeof process[name] === 'function' ? process[name]().length : null;
+};
+
+var service = function(data, response) {
+	var stats = {
+		pid: process.pid,
+		uptime: process.uptime(),
+		memory: process.memoryUsage(),
+		heap: getHeapStatistics(),
+		event_loop_lag: {
+			last: lag.last,
+			max: lag.max
+		},
+		gc: {
+			available: gc.available,
+			count: gc.count,
+			total_duration: gc.total_duration,
+			max_duration: gc.max_duration
+		},
+		active_handles: countOf('_getActiveHandles'),
+		active_requests: countOf('_getActiveRequests'),
+		requests: {
+			dropped: runtime.counters.dropped,
+			cancelled: runtime.counters.cancelled
+		},
+		code_cache: {
+			enabled: runtime.codeCache.enabled,
+			hits: runtime.codeCache.hits,
+			misses: runtime.codeCache.misses,
+			rejected: runtime.codeCache.rejected
+		}
+	};
+
+	lag.max = lag.last;
+	gc.max_duration = 0;
+
+	response.send(JSON.stringify(stats));
+};
+
+module.exports = service;
@@ -29,6 +29,18 @@ NODE_VERSION_FILTER = setting_overrides.get(
     lambda version: tuple(map(int, (version[1:] if version[0] == 'v' else version).split('.'))),
 )
 
+# The number of seconds that the commands used to interrogate the
+# environment for node and npm's versions are allowed to run for
+VERSION_COMMAND_TIMEOUT = setting_overrides.get(
+    'VERSION_COMMAND_TIMEOUT',
+    30.0,
+)
+
+NODE_POOL_MAX_WORKERS = setting_overrides.get(
+    'NODE_POOL_MAX_WORKERS',
+    None,
+)
+
 PATH_TO_NPM = setting_overrides.get(
     'PATH_TO_NPM',
     'npm'
@@ -82,6 +94,12 @@ SERVICES = setting_overrides.get(
     (),
 )
 
+# A path to a manifest produced by the `compile_node_server_manifest` command
+SERVICE_MANIFEST = setting_overrides.get(
+    'SERVICE_MANIFEST',
+    None,
+)
+
 SERVICE_TIMEOUT = setting_overrides.get(
     'SERVICE_TIMEOUT',
     10.0,
@@ -92,6 +110,233 @@ SERVER_TEST_TIMEOUT = setting_overrides.get(
     2.0,
 )
 
+# If True, the server includes the service used by `django_node.node.eval_in_server`. The
+# service runs any JS sent to it, so should only be enabled where the server's address
+# cannot be reached by untrusted clients
+SERVER_EVAL_ENABLED = setting_overrides.get(
+    'SERVER_EVAL_ENABLED',
+    False,
+)
+
+SERVER_EVAL_TIMEOUT = setting_overrides.get(
+    'SERVER_EVAL_TIMEOUT',
+    SERVICE_TIMEOUT,
+)
+
+# The number of seconds that the result of `NodeServer.is_healthy` is cached for
+SERVER_HEALTH_CHECK_TTL = setting_overrides.get(
+    'SERVER_HEALTH_CHECK_TTL',
+    1.0,
+)
+
+SERVER_WARMUP_IN_PARALLEL = setting_overrides.get(
+    'SERVER_WARMUP_IN_PARALLEL',
+    False,
+)
+
+# Replaces the server's process after it has served a number of requests
+SERVER_RECYCLE_AFTER_REQUESTS = setting_overrides.get(
+    'SERVER_RECYCLE_AFTER_REQUESTS',
+    None,
+)
+
+# Replaces the server's process after it has run for a number of seconds
+SERVER_RECYCLE_MAX_AGE = setting_overrides.get(
+    'SERVER_RECYCLE_MAX_AGE',
+    None,
+)
+
+# Replaces the server's process once its resident set size exceeds a number of bytes
+SERVER_RECYCLE_MAX_RSS = setting_overrides.get(
+    'SERVER_RECYCLE_MAX_RSS',
+    None,
+)
+
+# The minimum number of seconds between checks of the process's resident set size
+SERVER_RECYCLE_CHECK_INTERVAL = setting_overrides.get(
+    'SERVER_RECYCLE_CHECK_INTERVAL',
+    5.0,
+)
+
+# Whether other python processes may send requests to the server's process at SERVER_PORT.
+# Shared processes are never recycled, as the other processes would lose their server
+SERVER_PROCESS_IS_SHARED = setting_overrides.get(
+    'SERVER_PROCESS_IS_SHARED',
+    True,
+)
+
+# The maximum number of seconds to wait for a replaced process's requests to complete
+SERVER_RECYCLE_DRAIN_TIMEOUT = setting_overrides.get(
+    'SERVER_RECYCLE_DRAIN_TIMEOUT',
+    SERVICE_TIMEOUT,
+)
+
+# If defined, the server's stats are sampled every number of seconds
+SERVER_STATS_INTERVAL = setting_overrides.get(
+    'SERVER_STATS_INTERVAL',
+    None,
+)
+
+# A callable, or an import path to a callable, which is passed each sample of the
+# server's stats. If None, the stats are logged
+SERVER_STATS_HOOK = setting_overrides.get(
+    'SERVER_STATS_HOOK',
+    None,
+)
+
+# The number of seconds, in addition to the duration of a profile, that the server is
+# given to produce a CPU profile or heap snapshot
+# If True, the server includes the service used by `NodeServer.profile`. Heap snapshots contain
+# the data held by the process, so the service should only be enabled where the server's
+# address cannot be reached by untrusted clients
+SERVER_PROFILE_ENABLED = setting_overrides.get(
+    'SERVER_PROFILE_ENABLED',
+    False,
+)
+
+SERVER_PROFILE_TIMEOUT = setting_overrides.get(
+    'SERVER_PROFILE_TIMEOUT',
+    60.0,
+)
+
+# A persistent cache for the responses of services which set `cache_results`. For example:
+# {
+#     'BACKEND': 'django_node.result_cache.SQLiteResultCache',
+#     'OPTIONS': {'path': '/path/to/cache.sqlite3', 'max_size': 100 * 1024 * 1024},
+# }
+RESULT_CACHE = setting_overrides.get(
+    'RESULT_CACHE',
+    None,
+)
+
+# The maximum number of characters of the values sent by reference that the server
+# retains. The least recently used values are evicted first
+SERVER_REFERENCE_STORE_SIZE = setting_overrides.get(
+    'SERVER_REFERENCE_STORE_SIZE',
+    64 * 1024 * 1024,
+)
+
+# If defined, request data and responses larger than this number of bytes are exchanged
+# with the server via files, rather than the HTTP body. Only applies to servers at a
+# loopback address
+SERVER_FILE_TRANSPORT_THRESHOLD = setting_overrides.get(
+    'SERVER_FILE_TRANSPORT_THRESHOLD',
+    None,
+)
+
+# The directory in which the files are created. If None, shared memory is used when
+# available, otherwise the system's temporary directory
+SERVER_FILE_TRANSPORT_DIR = setting_overrides.get(
+    'SERVER_FILE_TRANSPORT_DIR',
+    None,
+)
+
+# The maximum number of deferred service calls which are sent concurrently
+DEFERRED_RENDER_MAX_WORKERS = setting_overrides.get(
+    'DEFERRED_RENDER_MAX_WORKERS',
+    10,
+)
+
+# If defined, calls to a service made within this number of seconds of one another are
+# sent to the server as a single request. Services can override this with `batch_window`
+SERVICE_BATCH_WINDOW = setting_overrides.get(
+    'SERVICE_BATCH_WINDOW',
+    None,
+)
+
+# The maximum number of calls sent in a single batch
+SERVICE_BATCH_MAX_SIZE = setting_overrides.get(
+    'SERVICE_BATCH_MAX_SIZE',
+    50,
+)
+
+# The URLs of the servers which `django_node.balanced_server.BalancedNodeServer` distributes
+# requests across, for example ('http://10.0.0.1:63578', 'http://10.0.0.2:63578')
+SERVER_BACKENDS = setting_overrides.get(
+    'SERVER_BACKENDS',
+    (),
+)
+
+# The number of seconds before a backend which failed to respond is tried again
+SERVER_BACKEND_RETRY_INTERVAL = setting_overrides.get(
+    'SERVER_BACKEND_RETRY_INTERVAL',
+    5.0,
+)
+
+# A directory containing a V8 code cache for the services, built by the
+# `build_node_server_code_cache` management command. If the directory exists, the server
+# compiles the services with the cache
+SERVER_CODE_CACHE = setting_overrides.get(
+    'SERVER_CODE_CACHE',
+    None,
+)
+
+# The number of threads which send the service calls made via `BaseService.send_background`
+BACKGROUND_MAX_WORKERS = setting_overrides.get(
+    'BACKGROUND_MAX_WORKERS',
+    4,
+)
+
+# The maximum number of background calls waiting for a thread. Further calls raise
+# `django_node.exceptions.BackgroundQueueFull`
+BACKGROUND_MAX_QUEUED = setting_overrides.get(
+    'BACKGROUND_MAX_QUEUED',
+    1000,
+)
+
+# The store for the outcomes of background calls. If None, the outcomes of recent calls
+# are held in memory. For example:
+# {
+#     'BACKEND': 'django_node.background.MemoryResultStore',
+#     'OPTIONS': {'max_entries': 1000},
+# }
+BACKGROUND_RESULT_STORE = setting_overrides.get(
+    'BACKGROUND_RESULT_STORE',
+    None,
+)
+
+# A callable, or an import path to a callable, which is passed the outcome of each
+# background call. If None, failed calls are logged
+BACKGROUND_CALLBACK = setting_overrides.get(
+    'BACKGROUND_CALLBACK',
+    None,
+)
+
+# If True, the server watches the sources of the services, and the local modules they
+# require, and reloads services within the running process when their files change
+SERVER_HOT_RELOAD = setting_overrides.get(
+    'SERVER_HOT_RELOAD',
+    False,
+)
+
+# The number of seconds between each check for changes to the services
+SERVER_HOT_RELOAD_INTERVAL = setting_overrides.get(
+    'SERVER_HOT_RELOAD_INTERVAL',
+    1.0,
+)
+
+# A JSON file of responses recorded by `django_node.fake_server.FakeNodeServer`, which
+# answers the requests that have no stub with them
+FAKE_SERVER_RECORDINGS = setting_overrides.get(
+    'FAKE_SERVER_RECORDINGS',
+    None,
+)
+
+# If True, FakeNodeServer sends the requests that have no stub to a real server, and
+# records its responses
+FAKE_SERVER_RECORD = setting_overrides.get(
+    'FAKE_SERVER_RECORD',
+    False,
+)
+
+# A directory holding a content-addressed store of installed packages. If set, each
+# `node_modules` directory is made of hardlinks to the files in the store, and
+# directories with identical dependencies are linked from the store without running npm
+PACKAGE_STORE = setting_overrides.get(
+    'PACKAGE_STORE',
+    None,
+)
+
 PACKAGE_DEPENDENCIES = setting_overrides.get(
     'PACKAGE_DEPENDENCIES',
     ()
@@ -0,0 +1,72 @@
+import json
+import time
+import logging
+import threading
+from .settings import SERVER_STATS_INTERVAL, SERVER_STATS_HOOK
+from .utils import dynamic_import_attribute
+
+logger = logging.getLogger(__name__)
+
+
+def log_stats(stats):
+    logger.info('Node server stats: {stats}'.format(stats=json.dumps(stats, sort_keys=True)))
+
+
+def get_stats_hook():
+    if SERVER_STATS_HOOK is None:
+        return log_stats
+    if callable(SERVER_STATS_HOOK):
+        return SERVER_STATS_HOOK
+    return dynamic_import_attribute(SERVER_STATS_HOOK)
+
+
+class StatsSampler(object):
+    """
+    Periodically collects `server.stats()` in a background thread and passes
+    the results to `callback`.
+
+    The percentage of a CPU used by the process between samples is added
+    as `process.cpu_percent`.
+    """
+
+    def __init__(self, server, interval=None, callback=None):
+        self.server = server
+        self.interval = interval if interval is not None else SERVER_STATS_INTERVAL
+        self.callback = callback if callback is not None else get_stats_hook()
+        self.stopped = threading.Event()
+        self.thread = None
+        self._previous = None
+
+    def start(self):
+        self.stopped.clear()
+        self.thread = threading.Thread(target=self.run)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        if self.thread is not None and self.thread is not threading.current_thread():
+            self.thread.join()
+        self.thread = None
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            try:
+                self.callback(self.sample())
+            except Exception as e:
+                logger.warning('Failed to sample node server stats: {error}'.format(error=e))
+
+    def sample(self):
+        stats = self.server.stats()
+        now = time.time()
+
+        process = stats.get('process')
+        if process:
+            if self._previous is not None:
+                sampled_at, cpu_time = self._previous
+                elapsed = now - sampled_at
+                if elapsed > 0:
+                    process['cpu_percent'] = 100 * (process['cpu_user'] + process['cpu_system'] - cpu_time) / elapsed
+            self._previous = (now, process['cpu_user'] + process['cpu_system'])
+
+        return stats
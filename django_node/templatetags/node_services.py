@@ -0,0 +1,53 @@
+from django import template
+from django.utils.safestring import mark_safe
+from ..deferred import DeferredRenderer, get_active_renderer
+
+register = template.Library()
+
+
+@register.simple_tag
+def render_service(name_or_import_path, **kwargs):
+    """
+    Sends the keyword arguments to a service and outputs the response. Within a
+    `defer_services` block, a placeholder is output and the call is deferred.
+
+    {% render_service 'my_app.services.ComponentService' title=page.title %}
+    """
+    from ..server import server
+    service = server.get_service(name_or_import_path)()
+
+    renderer = get_active_renderer()
+    if renderer is not None:
+        return mark_safe(renderer.defer(service, **kwargs))
+
+    return mark_safe(service.send(**kwargs).text)
+
+
+class DeferServicesNode(template.Node):
+    def __init__(self, nodelist):
+        self.nodelist = nodelist
+
+    def render(self, context):
+        # Nested blocks are dispatched by the outermost block
+        if get_active_renderer() is not None:
+            return self.nodelist.render(context)
+
+        with DeferredRenderer() as renderer:
+            content = self.nodelist.render(context)
+
+        return mark_safe(renderer.render(content))
+
+
+@register.tag
+def defer_services(parser, token):
+    """
+    Defers the `render_service` calls made within the block, including those in
+    included templates, then sends them concurrently once the block has rendered.
+
+    {% defer_services %}
+        ...
+    {% end_defer_services %}
+    """
+    nodelist = parser.parse(('end_defer_services',))
+    parser.delete_first_token()
+    return DeferServicesNode(nodelist)
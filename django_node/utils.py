@@ -1,51 +1,231 @@
+import os
 import sys
+import time
+import signal
+import socket
+import functools
 import subprocess
-import tempfile
+import threading
 import importlib
 import re
 import inspect
+import collections
+import json
 from django.utils import six
+from django.utils.six.moves import queue
 from .settings import (
     PATH_TO_NODE, PATH_TO_NPM, NODE_VERSION_COMMAND, NODE_VERSION_FILTER, NPM_VERSION_COMMAND, NPM_VERSION_FILTER,
+    VERSION_COMMAND_TIMEOUT,
 )
 from .exceptions import (
     DynamicImportError, ErrorInterrogatingEnvironment, MalformedVersionInput, MissingDependency, OutdatedDependency,
-    ModuleDoesNotContainAnyServices
+    ModuleDoesNotContainAnyServices, CommandTimeoutError, CommandCancelledError
 )
 
+STDOUT = 'stdout'
+STDERR = 'stderr'
 
-def run_command(cmd_to_run):
+# How often a streaming command checks if it has been cancelled
+COMMAND_POLL_INTERVAL = 0.1
+
+
+def _read_stream(stream, name, output_queue):
+    for line in iter(stream.readline, b''):
+        if six.PY3:
+            line = line.decode('utf-8', 'replace')
+        output_queue.put((name, line))
+    stream.close()
+    output_queue.put((name, None))
+
+
+def _kill_process_group(popen):
+    try:
+        if os.name == 'posix':
+            # The group may outlive the process, if its children are still running
+            os.killpg(popen.pid, signal.SIGKILL)
+        elif popen.poll() is None:
+            popen.kill()
+    except OSError:
+        # The processes exited before they could be killed
+        pass
+    popen.wait()
+
+
+def wait_for_process(popen, timeout):
+    """
+    Waits up to `timeout` seconds for `popen` to exit. Returns True if it exited.
+    """
+    deadline = time.time() + timeout
+    while popen.poll() is None:
+        remaining = deadline - time.time()
+        if remaining <= 0:
+            return False
+        # Processes usually exit promptly, so are polled more often than commands
+        time.sleep(min(COMMAND_POLL_INTERVAL / 10, remaining))
+    return True
+
+
+def stream_command(cmd_to_run, env=None, cwd=None, timeout=None, cancel=None):
     """
-    Wrapper around subprocess that pipes the stderr and stdout from `cmd_to_run`
-    to temporary files. Using the temporary files gets around subprocess.PIPE's
-    issues with handling large buffers.
+    Runs `cmd_to_run` and yields `(stream_name, line)` tuples as the command
+    writes to its stdout and stderr. `stream_name` is either `STDOUT` or `STDERR`.
+
+    `env` is an optional mapping which is used as the environment of the command,
+    rather than the environment of the python process.
+
+    If `timeout` seconds elapse before the command has completed, the command and
+    any processes it has spawned are killed and a CommandTimeoutError is raised.
+
+    The command can be cancelled by closing the generator, or by setting `cancel`,
+    an optional `threading.Event`. Either will kill the command's process group,
+    and setting `cancel` raises a CommandCancelledError.
+    """
+    popen_kwargs = {}
+    if os.name == 'posix':
+        # Run the command in its own process group, so that any children that it
+        # spawns can be killed alongside it
+        if six.PY3:
+            popen_kwargs['start_new_session'] = True
+        else:
+            popen_kwargs['preexec_fn'] = os.setsid
+
+    popen = subprocess.Popen(
+        cmd_to_run, stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=env, cwd=cwd, **popen_kwargs
+    )
+
+    output_queue = queue.Queue()
+    for stream, name in ((popen.stdout, STDOUT), (popen.stderr, STDERR)):
+        reader = threading.Thread(target=_read_stream, args=(stream, name, output_queue))
+        reader.daemon = True
+        reader.start()
+
+    deadline = time.time() + timeout if timeout is not None else None
+    open_streams = 2
+    completed = False
+
+    def get_wait():
+        # Returns the number of seconds to wait for more output, or None if
+        # the command has been cancelled
+        if cancel is not None and cancel.is_set():
+            return None
+        if deadline is None:
+            return COMMAND_POLL_INTERVAL
+        remaining = deadline - time.time()
+        if remaining <= 0:
+            raise CommandTimeoutError(
+                '{cmd_to_run} did not complete within {timeout} seconds'.format(
+                    cmd_to_run=cmd_to_run,
+                    timeout=timeout,
+                )
+            )
+        return min(COMMAND_POLL_INTERVAL, remaining)
+
+    try:
+        while open_streams:
+            wait = get_wait()
+            if wait is None:
+                raise CommandCancelledError(
+                    '{cmd_to_run} was cancelled'.format(cmd_to_run=cmd_to_run)
+                )
+            try:
+                name, line = output_queue.get(timeout=wait)
+            except queue.Empty:
+                continue
+            if line is None:
+                open_streams -= 1
+            else:
+                yield name, line
+
+        # The command may continue running after closing its output
+        while popen.poll() is None:
+            wait = get_wait()
+            if wait is None:
+                raise CommandCancelledError(
+                    '{cmd_to_run} was cancelled'.format(cmd_to_run=cmd_to_run)
+                )
+            time.sleep(wait)
+
+        completed = True
+    finally:
+        if not completed:
+            _kill_process_group(popen)
+
+
+class _OutputBuffer(object):
+    """
+    Retains the output of a stream. If `max_length` is defined, only the most
+    recent `max_length` characters are retained.
+    """
+
+    def __init__(self, max_length=None):
+        self.max_length = max_length
+        self.length = 0
+        self.lines = collections.deque()
+
+    def append(self, line):
+        self.lines.append(line)
+        self.length += len(line)
+        if self.max_length is not None:
+            while self.length > self.max_length and len(self.lines) > 1:
+                self.length -= len(self.lines.popleft())
+            if self.length > self.max_length:
+                # A single line may exceed the limit
+                self.lines[0] = self.lines[0][-self.max_length:]
+                self.length = len(self.lines[0])
+
+    def getvalue(self):
+        return ''.join(self.lines)
+
+
+def run_command(cmd_to_run, env=None, cwd=None, timeout=None, cancel=None, max_output=None, on_output=None):
+    """
+    Runs `cmd_to_run` and collects its stderr and stdout. The output is read
+    incrementally, which gets around subprocess.PIPE's issues with handling
+    large buffers.
+
+    `env`, `cwd`, `timeout` and `cancel` behave as they do for `stream_command`.
+
+    If `max_output` is defined, only the last `max_output` characters of each
+    stream are retained.
+
+    `on_output` is an optional callable which is invoked with `(stream_name, line)`
+    as each line of output arrives.
 
     Note: this command will block the python process until `cmd_to_run` has completed.
 
     Returns a tuple, containing the stderr and stdout as strings.
     """
-    with tempfile.TemporaryFile() as stdout_file, tempfile.TemporaryFile() as stderr_file:
+    buffers = {
+        STDOUT: _OutputBuffer(max_output),
+        STDERR: _OutputBuffer(max_output),
+    }
 
-        # Run the command
-        popen = subprocess.Popen(cmd_to_run, stdout=stdout_file, stderr=stderr_file)
-        popen.wait()
+    for name, line in stream_command(cmd_to_run, env=env, cwd=cwd, timeout=timeout, cancel=cancel):
+        buffers[name].append(line)
+        if on_output is not None:
+            on_output(name, line)
 
-        stderr_file.seek(0)
-        stdout_file.seek(0)
+    return buffers[STDERR].getvalue(), buffers[STDOUT].getvalue()
 
-        stderr = stderr_file.read()
-        stdout = stdout_file.read()
 
-        if six.PY3:
-            stderr = stderr.decode()
-            stdout = stdout.decode()
+def run_command_async(cmd_to_run, loop=None, executor=None, **kwargs):
+    """
+    An asyncio-compatible form of `run_command`. Returns a future, which can be
+    awaited or yielded from a coroutine, that resolves to the stderr and stdout.
 
-        return stderr, stdout
+    The command is run in `executor`, which defaults to the loop's default executor.
+    """
+    import asyncio  # Only available on python 3
+
+    if loop is None:
+        loop = asyncio.get_event_loop()
+
+    return loop.run_in_executor(executor, functools.partial(run_command, cmd_to_run, **kwargs))
 
 
 def _interrogate(cmd_to_run, version_filter):
     try:
-        stderr, stdout = run_command(cmd_to_run)
+        stderr, stdout = run_command(cmd_to_run, timeout=VERSION_COMMAND_TIMEOUT)
         if stderr:
             raise ErrorInterrogatingEnvironment(stderr)
         installed = True
@@ -53,6 +233,8 @@ def _interrogate(cmd_to_run, version_filter):
     except OSError:
         installed = False
         version_raw = None
+    except CommandTimeoutError as e:
+        six.reraise(ErrorInterrogatingEnvironment, ErrorInterrogatingEnvironment(*e.args), sys.exc_info()[2])
     version = None
     if version_raw:
         version = version_filter(version_raw)
@@ -246,4 +428,66 @@ def discover_services(service_config):
         if not module_contains_services:
             raise ModuleDoesNotContainAnyServices(import_path)
 
-    return services
\ No newline at end of file
+    return services
+
+
+def get_free_port(address):
+    """
+    Returns a port number which is not in use at `address`
+    """
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    try:
+        sock.bind((address, 0))
+        return sock.getsockname()[1]
+    finally:
+        sock.close()
+
+
+def get_process_rss(pid):
+    """
+    Returns the resident set size of the process `pid` in bytes, or None if it
+    cannot be determined. Relies on the `/proc` filesystem.
+    """
+    try:
+        with open('/proc/{pid}/status'.format(pid=pid), 'r') as status_file:
+            for line in status_file:
+                if line.startswith('VmRSS:'):
+                    # Reported in kilobytes
+                    return int(line.split()[1]) * 1024
+    except (IOError, OSError, ValueError, IndexError):
+        pass
+
+
+def get_process_stats(pid):
+    """
+    Returns a dictionary containing the resident set size in bytes, the user and
+    system CPU time in seconds, and the number of threads of the process `pid`.
+    Returns None if the stats cannot be determined. Relies on the `/proc` filesystem.
+    """
+    try:
+        with open('/proc/{pid}/stat'.format(pid=pid), 'r') as stat_file:
+            stat = stat_file.read()
+        # The command name is wrapped in parentheses and may contain spaces
+        fields = stat[stat.rindex(')') + 2:].split()
+        clock_ticks = os.sysconf('SC_CLK_TCK')
+        return {
+            'pid': pid,
+            'cpu_user': int(fields[11]) / float(clock_ticks),
+            'cpu_system': int(fields[12]) / float(clock_ticks),
+            'threads': int(fields[17]),
+            'rss': int(fields[21]) * os.sysconf('SC_PAGE_SIZE'),
+        }
+    except (IOError, OSError, ValueError, IndexError, AttributeError):
+        pass
+
+
+def extend_serialized_dict(serialized_dict, values):
+    """
+    Returns `serialized_dict`, a JSON object, with the keys and values of `values`
+    added, without deserializing it
+    """
+    serialized_values = json.dumps(values)
+    serialized_dict = serialized_dict.strip()
+    if serialized_dict == '{}':
+        return serialized_values
+    return serialized_values[:-1] + ', ' + serialized_dict[1:]
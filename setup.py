@@ -1,7 +1,17 @@
+import sys
 from setuptools import setup, find_packages
 
 VERSION = '4.0.2'
 
+install_requires = [
+    'django',
+    'requests>=2.5.1',
+]
+
+if sys.version_info[0] == 2:
+    # Backport of `concurrent.futures`
+    install_requires.append('futures')
+
 setup(
     name='django-node',
     version=VERSION,
@@ -9,14 +19,18 @@ setup(
     package_data={
         'django_node': [
             'node_server.js',
+            'pipe_host.js',
+            'runtime.js',
             'services/echo.js',
+            'services/eval.js',
+            'services/ping.js',
+            'services/profile.js',
+            'services/reload.js',
+            'services/stats.js',
             'package.json',
         ],
     },
-    install_requires=[
-        'django',
-        'requests>=2.5.1',
-    ],
+    install_requires=install_requires,
     description='Bindings and utils for integrating Node.js and NPM into a Django application',
     long_description=('''
 Deprecated
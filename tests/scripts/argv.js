@@ -0,0 +1,4 @@
+var path = require('path');
+
+console.log(path.basename(__filename) + ' ' + process.argv.slice(2).join(' '));
+console.error('to stderr');
@@ -9,5 +9,6 @@ INSTALLED_APPS = (
 DJANGO_NODE = {
     'SERVICES': (
         'tests.services',
-    )
+    ),
+    'SERVER_EVAL_ENABLED': True,
 }
\ No newline at end of file
@@ -1,16 +1,50 @@
 import os
+import sys
+import json
+import time
 import shutil
+import subprocess
+import tempfile
+import threading
 import unittest
+from concurrent.futures import ThreadPoolExecutor
+from requests.exceptions import ConnectionError
 from django.utils import six
-from django_node import node, npm
+from django.template import Context, Engine
+from django.test import RequestFactory, override_settings
+from django.http import HttpResponse
+from django_node import node, npm, settings as node_settings
+from django_node.node_pool import NodePool
 from django_node.node_server import NodeServer
+from django_node.balanced_server import BalancedNodeServer
+from django_node.pipe_server import PipeNodeServer, PipeConnection
+from django_node.fake_server import FakeNodeServer
+from django_node.hash_ring import HashRing
 from django_node.server import server
 from django_node.base_service import BaseService
+from django_node.utils import get_free_port, run_command, run_command_async, discover_services, STDOUT, STDERR
+from django_node.manifest import write_manifest, load_manifest
+from django_node.profiling import filter_cpu_profile
+from django_node.load_test import run_load_test, percentile
+from django_node.result_cache import SQLiteResultCache
+from django_node.prerender import prerender
+from django_node.deferred import DeferredRenderer
+from django_node.code_cache import build_code_cache
+from django_node.hot_reload import SourceWatcher
+from django_node.background import BackgroundDispatcher, MemoryResultStore, get_outcome
+from django_node.package_store import PackageStore
+from django_node.package_dependent import uninstall_dependencies
+from django_node.middleware import ServiceMemoizationMiddleware, MEMO_HEADER
+from django_node.file_transport import prepare_request_data, FILE_HEADER
 from django_node.exceptions import (
     OutdatedDependency, MalformedVersionInput, NodeServiceError, NodeServerAddressInUseError, NodeServerTimeoutError,
-    ServiceSourceDoesNotExist, MalformedServiceName
+    NodeServerConnectionError,
+    ServiceSourceDoesNotExist, MalformedServiceName, CommandTimeoutError, CommandCancelledError, InvalidServiceManifest,
+    PrerenderError, BackgroundQueueFull, ServerConfigMissingService
+)
+from django_node.services import (
+    EchoService, EvalService, PingService, StatsService, ProfileService, ReloadService
 )
-from django_node.services import EchoService
 from .services import TimeoutService, ErrorService
 from .utils import StdOutTrap
 
@@ -21,6 +55,7 @@ PATH_TO_INSTALLED_PACKAGE = os.path.join(PATH_TO_NODE_MODULES, DEPENDENCY_PACKAG
 PACKAGE_TO_INSTALL = 'jquery'
 PATH_TO_PACKAGE_TO_INSTALL = os.path.join(PATH_TO_NODE_MODULES, PACKAGE_TO_INSTALL)
 PATH_TO_PACKAGE_JSON = os.path.join(TEST_DIR, 'package.json')
+PATH_TO_ARGV_SCRIPT = os.path.join(TEST_DIR, 'scripts', 'argv.js')
 
 echo_service = EchoService()
 timeout_service = TimeoutService()
@@ -111,6 +146,73 @@ class TestDjangoNode(unittest.TestCase):
         stdout = stdout.strip()
         self.assertEqual(stdout, node.version_raw)
 
+    def test_node_run_passes_the_environment_per_call(self):
+        node_env = os.environ.get('NODE_ENV', None)
+        stderr, stdout = node.run('-e', 'console.log(process.env.NODE_ENV)', production=True)
+        self.assertEqual(stdout.strip(), 'production')
+        stderr, stdout = node.run('-e', 'console.log(process.env.DJANGO_NODE_TEST)', env={'DJANGO_NODE_TEST': 'foo'})
+        self.assertEqual(stdout.strip(), 'foo')
+        self.assertEqual(os.environ.get('NODE_ENV', None), node_env)
+        self.assertNotIn('DJANGO_NODE_TEST', os.environ)
+
+    def test_node_run_can_timeout(self):
+        self.assertRaises(CommandTimeoutError, node.run, '-e', 'setTimeout(function() {}, 5000)', timeout=0.5)
+
+    def test_node_stream_yields_output_as_it_arrives(self):
+        output = node.stream('-e', 'console.log("foo"); console.error("bar"); setTimeout(function() {}, 5000)')
+        received = [next(output), next(output)]
+        self.assertIn((STDOUT, 'foo\n'), received)
+        self.assertIn((STDERR, 'bar\n'), received)
+        # Closing the generator cancels the command
+        output.close()
+
+    def test_run_command_can_cap_the_output_retained(self):
+        stderr, stdout = node.run('-e', 'for (var i = 0; i < 1000; i++) console.log(i)', max_output=8)
+        self.assertEqual(stdout, '998\n999\n')
+        stderr, stdout = node.run('-e', 'console.log(new Array(1001).join("x"))', max_output=8)
+        self.assertEqual(stdout, 'xxxxxxx\n')
+
+    def test_run_command_can_be_cancelled(self):
+        cancel = threading.Event()
+        lines = []
+
+        def on_output(name, line):
+            lines.append(line)
+            cancel.set()
+
+        self.assertRaises(
+            CommandCancelledError,
+            run_command,
+            (node_settings.PATH_TO_NODE, '-e', 'console.log("foo"); setTimeout(function() {}, 5000)'),
+            cancel=cancel,
+            on_output=on_output,
+        )
+        self.assertEqual(lines, ['foo\n'])
+
+    @unittest.skipIf(six.PY2, 'asyncio is only available on python 3')
+    def test_run_command_async_can_be_awaited(self):
+        import asyncio
+        loop = asyncio.new_event_loop()
+        try:
+            stderr, stdout = loop.run_until_complete(
+                run_command_async((node_settings.PATH_TO_NODE, '--version'), loop=loop)
+            )
+        finally:
+            loop.close()
+        self.assertEqual(stdout.strip(), node.version_raw)
+
+    def test_node_pool_runs_jobs_concurrently(self):
+        with NodePool(max_workers=2) as pool:
+            futures = pool.map([('--version',)] * 4)
+            for future in futures:
+                stderr, stdout = future.result()
+                self.assertEqual(stdout.strip(), node.version_raw)
+
+            production = pool.submit('-e', 'console.log(process.env.NODE_ENV)', production=True)
+            timeout = pool.submit('-e', 'setTimeout(function() {}, 5000)', timeout=0.5)
+            self.assertEqual(production.result()[1].strip(), 'production')
+            self.assertRaises(CommandTimeoutError, timeout.result)
+
     def test_npm_run_returns_output(self):
         stderr, stdout = npm.run('--version',)
         stdout = stdout.strip()
@@ -121,6 +223,57 @@ class TestDjangoNode(unittest.TestCase):
         self.assertTrue(os.path.exists(PATH_TO_NODE_MODULES))
         self.assertTrue(os.path.exists(PATH_TO_INSTALLED_PACKAGE))
 
+    def test_package_store_shares_files_between_directories(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+        store = PackageStore(os.path.join(root, 'store'))
+
+        installs = []
+
+        def install(directory):
+            installs.append(directory)
+            os.makedirs(os.path.join(directory, 'node_modules', 'pkg', 'lib'))
+            with open(os.path.join(directory, 'node_modules', 'pkg', 'index.js'), 'w') as index_file:
+                index_file.write('module.exports = require("./lib/main");')
+            with open(os.path.join(directory, 'node_modules', 'pkg', 'lib', 'main.js'), 'w') as main_file:
+                main_file.write('module.exports = 42;')
+            os.symlink('pkg', os.path.join(directory, 'node_modules', 'alias'))
+
+        directories = [os.path.join(root, name) for name in ('first', 'second')]
+        for directory in directories:
+            os.makedirs(directory)
+            with open(os.path.join(directory, 'package.json'), 'w') as package_json:
+                package_json.write('{"dependencies": {"pkg": "1.0.0"}}')
+
+        self.assertFalse(store.install(directories[0], install=install))
+        self.assertTrue(store.install(directories[1], install=install))
+        self.assertTrue(store.install(directories[1], install=install))
+        self.assertEqual(installs, directories[:1])
+
+        paths = [os.path.join(directory, 'node_modules', 'pkg', 'lib', 'main.js') for directory in directories]
+        self.assertTrue(os.path.samefile(*paths))
+        self.assertEqual(os.readlink(os.path.join(directories[1], 'node_modules', 'alias')), 'pkg')
+        self.assertEqual(store.report(), {'files': 2, 'size': 59, 'links': 4, 'saved': 59})
+
+        # Linked directories are removed before npm runs in them, so that the
+        # shared files are never changed in place
+        with open(os.path.join(directories[1], 'package.json'), 'w') as package_json:
+            package_json.write('{"dependencies": {"pkg": "1.0.1"}}')
+        self.assertFalse(store.install(directories[1], install=install))
+        self.assertEqual(installs, directories)
+        self.assertTrue(os.path.samefile(*paths))
+        self.assertEqual(store.report(), {'files': 2, 'size': 59, 'links': 4, 'saved': 59})
+
+        uninstall_dependencies(directories[0])
+        self.assertEqual(store.collect_garbage(), (0, 0))
+        with open(paths[1], 'r') as main_file:
+            self.assertEqual(main_file.read(), 'module.exports = 42;')
+
+        uninstall_dependencies(directories[1])
+        self.assertEqual(store.collect_garbage(), (2, 59))
+        self.assertEqual(store.report(), {'files': 0, 'size': 0, 'links': 0, 'saved': 0})
+        self.assertEqual(os.listdir(store.path_to_installs), [])
+
     def test_node_server_services_can_be_validated(self):
         class MissingSource(BaseService):
             pass
@@ -138,6 +291,33 @@ class TestDjangoNode(unittest.TestCase):
         for service in (EchoService, ErrorService, TimeoutService):
             self.assertIn(service, server.services)
 
+    def test_node_server_services_can_be_loaded_from_a_manifest(self):
+        services = discover_services(server.service_config)
+        manifest_dir = tempfile.mkdtemp()
+        path_to_manifest = os.path.join(manifest_dir, 'manifest.json')
+        try:
+            manifest = write_manifest(server, services, path_to_manifest)
+            self.assertEqual(load_manifest(path_to_manifest, server.service_config), services)
+            # The manifest only describes the services, not the per-run config of the server
+            self.assertEqual(sorted(manifest.keys()), ['service_config', 'services', 'version'])
+
+            class ManifestServer(NodeServer):
+                service_manifest = path_to_manifest
+            self.assertEqual(ManifestServer().services, NodeServer.services + services)
+
+            self.assertRaises(InvalidServiceManifest, load_manifest, path_to_manifest, ('some.other.module',))
+
+            # Changes to the source of a service invalidate the manifest
+            manifest['services'][0]['checksum'] = 'outdated'
+            with open(path_to_manifest, 'w') as manifest_file:
+                json.dump(manifest, manifest_file)
+            self.assertRaises(InvalidServiceManifest, load_manifest, path_to_manifest, server.service_config)
+            self.assertEqual(ManifestServer().services, NodeServer.services + services)
+        finally:
+            shutil.rmtree(manifest_dir)
+
+        self.assertRaises(InvalidServiceManifest, load_manifest, path_to_manifest, server.service_config)
+
     def test_node_server_can_start_and_stop(self):
         self.assertIsInstance(server, NodeServer)
         server.start()
@@ -153,6 +333,1028 @@ class TestDjangoNode(unittest.TestCase):
         self.assertFalse(server.is_running)
         self.assertFalse(server.test())
 
+    def test_node_server_health_checks_are_cached(self):
+        self.assertFalse(server.is_healthy())
+        server.start()
+        self.assertTrue(server.ping())
+        self.assertTrue(server.is_healthy())
+        self.assertTrue(server.is_healthy(full=True))
+
+        # Exited processes are detected without waiting for the cached result to expire
+        server.process.kill()
+        server.process.wait()
+        self.assertFalse(server.is_process_alive())
+        self.assertFalse(server.is_healthy())
+
+        # Requests restart a process which has exited
+        response = echo_service.send(echo='restarted')
+        self.assertEqual(response.text, 'restarted')
+        self.assertTrue(server.is_process_alive())
+
+        server.stop()
+        self.assertFalse(server.is_healthy())
+        self.assertFalse(server.ping())
+
+    def test_node_server_detects_unreachable_processes_started_elsewhere(self):
+        server.start()
+        attached_server = NodeServer()
+        attached_server.start()
+        self.assertTrue(attached_server.is_running)
+        self.assertIsNone(attached_server.process)
+
+        pings = []
+        ping = attached_server.ping
+
+        def record_ping():
+            pings.append(True)
+            return ping()
+
+        attached_server.ping = record_ping
+        attached_server.health_check_ttl = 0
+
+        service = EchoService()
+        service.server = attached_server
+        try:
+            # Requests are sent without pinging the process
+            self.assertEqual(service.send(echo='foo').text, 'foo')
+            self.assertEqual(pings, [])
+
+            # Failed requests mark the process as unreachable
+            server.stop()
+            self.assertRaises(NodeServerConnectionError, service.send, echo='foo')
+            self.assertFalse(attached_server.is_running)
+            self.assertFalse(attached_server.is_healthy())
+
+            # The next request checks for the process, then starts its own
+            self.assertEqual(service.send(echo='bar').text, 'bar')
+            self.assertIsNotNone(attached_server.process)
+        finally:
+            attached_server.stop()
+
+    def test_node_server_kills_processes_which_do_not_terminate(self):
+        process = subprocess.Popen(
+            [sys.executable, '-c', (
+                'import signal, sys, time\n'
+                'signal.signal(signal.SIGTERM, signal.SIG_IGN)\n'
+                'print("ready")\n'
+                'sys.stdout.flush()\n'
+                'time.sleep(60)\n'
+            )],
+            stdout=subprocess.PIPE,
+        )
+        process.stdout.readline()
+        process.stdout.close()
+
+        new_server = NodeServer()
+        new_server.stop_timeout = 0.2
+        new_server.terminate_process(process)
+        self.assertIsNotNone(process.poll())
+
+    def test_node_server_replays_warmup_payloads_after_starting(self):
+        class WarmupService(EchoService):
+            name = '/warmup'
+            warmup_payloads = ({'echo': 'foo'}, {'echo': 'bar'})
+
+        class BrokenWarmupService(EchoService):
+            name = '/broken-warmup'
+            warmup_payloads = ({},)
+
+        class WarmupServer(NodeServer):
+            services = NodeServer.services + (WarmupService, BrokenWarmupService)
+
+        new_server = WarmupServer()
+        new_server.start()
+        try:
+            self.assertEqual(list(new_server.warmup_durations.keys()), [WarmupService.get_name()])
+            self.assertGreater(new_server.warmup_durations[WarmupService.get_name()], 0)
+            durations = new_server.warmup(parallel=True)
+            self.assertEqual(list(durations.keys()), [WarmupService.get_name()])
+        finally:
+            new_server.stop()
+
+    def test_node_server_recycles_processes_without_failing_requests(self):
+        class RecyclingServer(NodeServer):
+            recycle_after_requests = 5
+            process_is_shared = False
+
+        new_server = RecyclingServer()
+        new_server.start()
+        original_process = new_server.process
+        original_port = new_server.port
+        sampler = new_server.start_stats_sampler(interval=0.1, callback=lambda stats: None)
+
+        replacement = new_server.create_replacement()
+        self.assertIsNone(replacement.stats_sampler)
+        self.assertIsNone(replacement.source_watcher)
+
+        service = EchoService()
+        service.server = new_server
+        try:
+            for i in range(20):
+                self.assertEqual(service.send(echo='foo').text, 'foo')
+                time.sleep(0.05)
+
+            self.assertIsNot(new_server.process, original_process)
+            self.assertNotEqual(new_server.port, original_port)
+            self.assertTrue(new_server.is_process_alive())
+
+            # The server's sampler continues to sample the new process
+            self.assertIs(new_server.stats_sampler, sampler)
+            self.assertTrue(sampler.thread.is_alive())
+
+            # Internal requests are not counted towards the policy. A recycle
+            # resets the count, so wait for any in progress to complete
+            for i in range(100):
+                if not new_server.is_recycling:
+                    break
+                time.sleep(0.05)
+            request_count = new_server.request_count
+            self.assertTrue(new_server.ping())
+            new_server.stats()
+            self.assertEqual(new_server.request_count, request_count)
+
+            # The old process is terminated once drained
+            for i in range(100):
+                if original_process.poll() is not None:
+                    break
+                time.sleep(0.05)
+            self.assertIsNotNone(original_process.poll())
+        finally:
+            new_server.stop()
+
+        self.assertFalse(new_server.is_process_alive())
+
+        # Processes which other python processes may use are not recycled
+        class SharedServer(RecyclingServer):
+            process_is_shared = True
+
+        shared_server = SharedServer()
+        shared_server.port = six.text_type(get_free_port(shared_server.address))
+        shared_server.start(use_existing_process=False)
+        shared_process = shared_server.process
+        service.server = shared_server
+        try:
+            for i in range(10):
+                self.assertEqual(service.send(echo='foo').text, 'foo')
+            time.sleep(0.2)
+            self.assertIs(shared_server.process, shared_process)
+        finally:
+            shared_server.stop()
+
+    def test_node_server_terminates_replacements_started_while_stopping(self):
+        replacements = []
+
+        class StoppingServer(NodeServer):
+            process_is_shared = False
+
+            def start_replacement(self):
+                replacement = super(StoppingServer, self).start_replacement()
+                replacements.append(replacement)
+                # The server is stopped while the replacement starts
+                self.stop()
+                return replacement
+
+        new_server = StoppingServer()
+        new_server.start()
+        original_process = new_server.process
+        try:
+            new_server.recycle()
+            self.assertIs(new_server.process, original_process)
+            self.assertFalse(new_server.is_running)
+            self.assertIsNotNone(replacements[0].process.poll())
+        finally:
+            new_server.stop()
+
+    def test_node_server_reports_stats(self):
+        server.start()
+        stats = server.stats()
+        self.assertEqual(stats['pid'], server.process.pid)
+        self.assertGreater(stats['memory']['rss'], 0)
+        self.assertGreaterEqual(stats['event_loop_lag']['max'], 0)
+        self.assertIn('count', stats['gc'])
+        self.assertEqual(stats['process']['pid'], server.process.pid)
+        self.assertGreater(stats['process']['rss'], 0)
+
+        samples = []
+        errors = []
+        sampler = server.start_stats_sampler(interval=0.1, callback=samples.append)
+        sample = sampler.sample
+
+        def record_errors():
+            try:
+                return sample()
+            except Exception as e:
+                errors.append(e)
+                raise
+
+        sampler.sample = record_errors
+        for i in range(50):
+            if len(samples) >= 2:
+                break
+            time.sleep(0.1)
+        server.stop()
+        self.assertIsNone(server.stats_sampler)
+        self.assertFalse(sampler.thread)
+        # The sampler is stopped before the process, so never fails to reach it
+        self.assertEqual(errors, [])
+        self.assertGreaterEqual(len(samples), 2)
+        self.assertIn('cpu_percent', samples[-1]['process'])
+
+    def test_node_server_can_capture_profiles(self):
+        # Profiling is disabled by default
+        self.assertNotIn(ProfileService, NodeServer.services)
+        self.assertRaises(ServerConfigMissingService, server.profile, seconds=0.2)
+
+        class ProfilingServer(NodeServer):
+            services = NodeServer.services + (ProfileService,)
+
+        new_server = ProfilingServer()
+        new_server.start()
+        try:
+            profile = json.loads(new_server.profile(seconds=0.2))
+            self.assertIn('nodes', profile)
+            self.assertIn('samples', profile)
+
+            profile = json.loads(new_server.profile(seconds=0.2, services=[EchoService.get_name()]))
+            node_ids = [node['id'] for node in profile['nodes']]
+            for sample in profile['samples']:
+                self.assertIn(sample, node_ids)
+
+            profile_dir = tempfile.mkdtemp()
+            try:
+                path = os.path.join(profile_dir, 'node.heapsnapshot')
+                new_server.profile(heap=True, path=path)
+                with open(path, 'r') as snapshot_file:
+                    self.assertIn('snapshot', json.load(snapshot_file))
+            finally:
+                shutil.rmtree(profile_dir)
+        finally:
+            new_server.stop()
+
+    def test_cpu_profiles_can_be_filtered_to_files(self):
+        def node(node_id, url, children=(), hit_count=1):
+            return {
+                'id': node_id,
+                'callFrame': {'url': url, 'functionName': ''},
+                'children': list(children),
+                'hitCount': hit_count,
+            }
+
+        profile = filter_cpu_profile({
+            'nodes': [
+                node(1, '', children=(2, 5), hit_count=0),
+                node(2, '/server.js', children=(3,)),
+                node(3, 'file:///service.js', children=(4,)),
+                node(4, '/lib.js'),
+                node(5, '/other.js'),
+            ],
+            'samples': [2, 3, 4, 5],
+            'timeDeltas': [1, 1, 1, 1],
+        }, ['/service.js'])
+
+        self.assertEqual([node['id'] for node in profile['nodes']], [1, 2, 3, 4])
+        self.assertEqual(profile['nodes'][0]['children'], [2])
+        self.assertEqual(profile['nodes'][0]['hitCount'], 1)
+        self.assertEqual(profile['samples'], [2, 3, 4, 1])
+
+    def test_load_tests_report_latencies_and_failures(self):
+        results = run_load_test(echo_service, [{'echo': 'foo'}, {'echo': 'bar'}], concurrency=2, duration=0.5)
+        self.assertEqual(results['service'], EchoService.get_name())
+        self.assertGreater(results['successful_requests'], 0)
+        self.assertEqual(results['errors'], 0)
+        self.assertEqual(results['timeouts'], 0)
+        self.assertLessEqual(results['latency']['p50'], results['latency']['p99'])
+        self.assertLessEqual(results['latency']['p99'], results['latency']['max'])
+        self.assertGreater(results['rss_after'], 0)
+
+        results = run_load_test(error_service, [{}], concurrency=1, duration=0.5, rate=10)
+        self.assertEqual(results['successful_requests'], 0)
+        self.assertGreater(results['errors'], 0)
+        self.assertLessEqual(results['requests'], 5)
+
+        self.assertEqual(percentile([1, 2, 3, 4], 50), 2)
+        self.assertEqual(percentile([1, 2, 3, 4], 99), 4)
+        self.assertEqual(percentile(list(range(1, 11)), 50), 5)
+        self.assertEqual(percentile(list(range(1, 11)), 90), 9)
+        self.assertEqual(percentile(list(range(1, 101)), 99), 99)
+        self.assertEqual(percentile(list(range(1, 11)), 0), 1)
+        self.assertEqual(percentile(list(range(1, 11)), 100), 10)
+        self.assertIsNone(percentile([], 50))
+
+    def test_services_can_persist_results(self):
+        cache_dir = tempfile.mkdtemp()
+        path_to_cache = os.path.join(cache_dir, 'cache.sqlite3')
+        cache = SQLiteResultCache(path_to_cache)
+
+        class CachedEchoService(EchoService):
+            name = '/cached-echo'
+            cache_results = True
+            result_cache = cache
+
+        class CacheServer(NodeServer):
+            services = NodeServer.services + (CachedEchoService,)
+
+        new_server = CacheServer()
+        service = CachedEchoService()
+        service.server = new_server
+        try:
+            self.assertEqual(service.send(echo='foo').text, 'foo')
+            self.assertEqual((cache.hits, cache.misses), (0, 1))
+            self.assertEqual(service.send(echo='foo').text, 'foo')
+            self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+            # Cached responses are served without the server, and are shared
+            new_server.stop()
+            service.result_cache = SQLiteResultCache(path_to_cache)
+            self.assertEqual(service.send(echo='foo').text, 'foo')
+            self.assertFalse(new_server.is_running)
+
+            # Changes to the service's source invalidate the cache
+            service.get_source_fingerprint = lambda: 'changed'
+            self.assertEqual(service.send(echo='foo').text, 'foo')
+            self.assertTrue(new_server.is_running)
+            self.assertEqual(service.result_cache.misses, 1)
+
+            # The least recently used entries are evicted
+            size = cache.get_size()
+            service.result_cache.max_size = size
+            self.assertEqual(service.send(echo='bar').text, 'bar')
+            self.assertLessEqual(cache.get_size(), size)
+            self.assertIsNotNone(cache.get(service.get_result_cache_key(json.dumps({'echo': 'bar'}))))
+        finally:
+            new_server.stop()
+            shutil.rmtree(cache_dir)
+
+    def test_service_fingerprints_are_the_same_wherever_a_project_is_installed(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+
+        def create_project(name, version):
+            directory = os.path.join(root, name)
+            os.makedirs(os.path.join(directory, 'node_modules', 'pkg'))
+            with open(os.path.join(directory, 'service.js'), 'w') as source_file:
+                source_file.write('module.exports = function(data, res) { res.end(""); };')
+            with open(os.path.join(directory, 'package.json'), 'w') as package_file:
+                package_file.write('{"dependencies": {"pkg": "^1.0.0"}}')
+            with open(os.path.join(directory, 'node_modules', 'pkg', 'package.json'), 'w') as package_file:
+                json.dump({'version': version, '_where': directory}, package_file)
+
+            class ProjectService(EchoService):
+                path_to_source = os.path.join(directory, 'service.js')
+                package_dependencies = directory
+
+            return ProjectService
+
+        first = create_project('first', '1.0.0')
+        second = create_project('second', '1.0.0')
+        third = create_project('third', '1.0.1')
+        self.assertEqual(first.get_source_fingerprint(), second.get_source_fingerprint())
+        self.assertNotEqual(first.get_source_fingerprint(), third.get_source_fingerprint())
+
+    def test_services_can_send_arguments_by_reference(self):
+        class ReferenceEchoService(EchoService):
+            name = '/reference-echo'
+            reference_arguments = ('echo',)
+
+        class ReferenceServer(NodeServer):
+            services = NodeServer.services + (ReferenceEchoService,)
+
+        new_server = ReferenceServer()
+        service = ReferenceEchoService()
+        service.server = new_server
+
+        requests_sent = []
+        send_request_to_service = new_server.send_request_to_service
+
+        def record_request(endpoint, **kwargs):
+            if endpoint == service.get_name():
+                requests_sent.append(json.loads(kwargs['data']['data']))
+            return send_request_to_service(endpoint, **kwargs)
+
+        new_server.send_request_to_service = record_request
+        content = 'large content ' * 1000
+        try:
+            # The value is uploaded once, then only its digest is sent
+            self.assertEqual(service.send(echo=content).text, content)
+            self.assertEqual(service.send(echo=content).text, content)
+            self.assertEqual(len(requests_sent), 2)
+            self.assertEqual(requests_sent[0]['echo']['value'], content)
+            self.assertNotIn('value', requests_sent[1]['echo'])
+            digest = requests_sent[0]['echo']['__django_node_reference__']
+            self.assertIn(digest, new_server.uploaded_references)
+
+            # Values missing from the server are uploaded again
+            new_server.stop()
+            new_server.start()
+            new_server.add_uploaded_references([digest])
+            del requests_sent[:]
+            self.assertEqual(service.send(echo=content).text, content)
+            self.assertEqual(len(requests_sent), 2)
+            self.assertNotIn('value', requests_sent[0]['echo'])
+            self.assertEqual(requests_sent[1]['echo']['value'], content)
+        finally:
+            new_server.stop()
+
+    def test_node_server_can_exchange_large_payloads_via_files(self):
+        new_server = NodeServer()
+        new_server.file_transport_threshold = 1000
+        service = EchoService()
+        service.server = new_server
+        content = 'large content ' * 1000
+
+        # The directory is only created once the process starts
+        self.assertIsNone(new_server.get_config()['file_transport_directory'])
+        self.assertIsNone(new_server.file_transport_directory)
+        try:
+            response = service.send(echo=content)
+            self.assertEqual(response.text, content)
+            self.assertIn(FILE_HEADER, response.headers)
+
+            response = service.send(echo='small content')
+            self.assertEqual(response.text, 'small content')
+            self.assertNotIn(FILE_HEADER, response.headers)
+
+            # Files are removed once they have been read
+            directory = new_server.file_transport_directory
+            self.assertEqual(os.listdir(directory), [])
+
+            # Files outside of the server's directory are rejected
+            outside_directory = tempfile.mkdtemp()
+            self.addCleanup(shutil.rmtree, outside_directory)
+            serialized_data, path = prepare_request_data(json.dumps({'echo': content}), outside_directory, 1000)
+            response = new_server.send_request_to_service(service.get_name(), data={'data': serialized_data})
+            self.assertEqual(response.status_code, 400)
+            serialized_data = json.dumps({'__django_node_transport__': {
+                'threshold': 1000, 'path': os.path.join(directory, '..', os.path.basename(outside_directory)),
+            }})
+            response = new_server.send_request_to_service(service.get_name(), data={'data': serialized_data})
+            self.assertEqual(response.status_code, 400)
+        finally:
+            new_server.stop()
+        self.assertFalse(os.path.exists(directory))
+
+        directory = tempfile.mkdtemp()
+        try:
+            serialized_data, path = prepare_request_data(json.dumps({'foo': 'bar'}), directory, 1000)
+            self.assertIsNone(path)
+            self.assertEqual(json.loads(serialized_data)['foo'], 'bar')
+
+            serialized_data, path = prepare_request_data(json.dumps({'foo': content}), directory, 1000)
+            with open(path) as request_file:
+                self.assertEqual(json.loads(request_file.read()), {'foo': content})
+            self.assertNotIn(content, serialized_data)
+        finally:
+            shutil.rmtree(directory)
+
+    def test_services_can_be_prerendered_into_the_result_cache(self):
+        cache_dir = tempfile.mkdtemp()
+        cache = SQLiteResultCache(os.path.join(cache_dir, 'cache.sqlite3'))
+
+        class PrerenderedEchoService(EchoService):
+            name = '/prerendered-echo'
+            cache_results = True
+            result_cache = cache
+
+        class PrerenderServer(NodeServer):
+            services = NodeServer.services + (PrerenderedEchoService,)
+
+        new_server = PrerenderServer()
+        try:
+            rendered, failures = prerender(new_server, [
+                {'service': PrerenderedEchoService.get_name(), 'kwargs': {'echo': 'foo'}},
+                {'service': PrerenderedEchoService.get_name(), 'kwargs': {'echo': 'bar'}},
+                {'service': PrerenderedEchoService.get_name(), 'kwargs': {}},
+            ], concurrency=2, result_cache=cache)
+            self.assertEqual(rendered, 2)
+            self.assertEqual(len(failures), 1)
+            self.assertFalse(new_server.is_running)
+
+            service = PrerenderedEchoService()
+            service.server = new_server
+            self.assertEqual(service.send(echo='bar').text, 'bar')
+            self.assertEqual(cache.hits, 1)
+            self.assertFalse(new_server.is_running)
+
+            self.assertRaises(
+                PrerenderError, prerender, new_server, [{'service': EchoService.get_name(), 'kwargs': {}}],
+                result_cache=cache,
+            )
+        finally:
+            new_server.stop()
+            shutil.rmtree(cache_dir)
+
+    def test_concurrent_service_calls_can_be_batched(self):
+        class BatchedEchoService(EchoService):
+            name = '/batched-echo'
+            batch_window = 0.5
+            batch_max_size = 100
+
+        class CachedBatchedEchoService(BatchedEchoService):
+            def generate_cache_key(self, serialized_data, data):
+                return serialized_data
+
+        class ReferencingBatchedEchoService(BatchedEchoService):
+            reference_arguments = ('echo',)
+
+        class BatchServer(NodeServer):
+            services = NodeServer.services + (
+                BatchedEchoService, CachedBatchedEchoService, ReferencingBatchedEchoService
+            )
+
+        new_server = BatchServer()
+        new_server.start()
+
+        requests_sent = []
+        send_request_to_service = new_server.send_request_to_service
+
+        def record_request(endpoint, **kwargs):
+            requests_sent.append((endpoint, kwargs.get('routing_key')))
+            return send_request_to_service(endpoint, **kwargs)
+
+        new_server.send_request_to_service = record_request
+
+        results = {}
+
+        def send(value, service_class=BatchedEchoService):
+            service = service_class()
+            service.server = new_server
+            # Overrides on an instance apply to the batches it joins
+            service.batch_max_size = 3
+            try:
+                results[value] = service.send(echo=value).text if value else service.send()
+            except NodeServiceError as e:
+                results[value] = e
+
+        def send_concurrently(values, service_class):
+            threads = [threading.Thread(target=send, args=(value, service_class)) for value in values]
+            for thread in threads:
+                thread.start()
+                time.sleep(0.01)
+            for thread in threads:
+                thread.join()
+
+        try:
+            send_concurrently(('a', 'b', None, 'd', 'e'), BatchedEchoService)
+            self.assertEqual(len(requests_sent), 2)
+            self.assertEqual([results[value] for value in ('a', 'b', 'd', 'e')], ['a', 'b', 'd', 'e'])
+            self.assertIsInstance(results[None], NodeServiceError)
+
+            # Calls with a cache key are sent on their own
+            del requests_sent[:]
+            send_concurrently(('f', 'g'), CachedBatchedEchoService)
+            self.assertEqual(len(requests_sent), 2)
+            self.assertEqual([results['f'], results['g']], ['f', 'g'])
+
+            # Calls which send values by reference are sent on their own, with their routing key
+            new_server.get_routing_key = lambda endpoint, data: endpoint + data['data']
+            del requests_sent[:]
+            send_concurrently(('h', 'i'), ReferencingBatchedEchoService)
+            self.assertEqual(len(requests_sent), 2)
+            self.assertEqual([results['h'], results['i']], ['h', 'i'])
+            for endpoint, routing_key in requests_sent:
+                self.assertIsNotNone(routing_key)
+        finally:
+            new_server.stop()
+
+    def test_pipe_servers_exchange_messages_over_stdin_and_stdout(self):
+        pipe_server = PipeNodeServer()
+        service = EchoService()
+        service.server = pipe_server
+        try:
+            self.assertEqual(service.send(echo='foo').text, 'foo')
+            self.assertTrue(pipe_server.is_healthy())
+            error_service = ErrorService()
+            error_service.server = pipe_server
+            self.assertRaises(NodeServiceError, error_service.send)
+
+            # Concurrent requests are multiplexed over the pipe
+            values = [six.text_type(i) for i in range(20)]
+            with ThreadPoolExecutor(max_workers=10) as executor:
+                responses = list(executor.map(lambda value: service.send(echo=value).text, values))
+            self.assertEqual(responses, values)
+        finally:
+            pipe_server.stop()
+        self.assertFalse(pipe_server.is_healthy())
+
+        # Blocking servers serve requests until their process exits
+        blocking_server = PipeNodeServer()
+        service.server = blocking_server
+        thread = threading.Thread(target=blocking_server.start, kwargs={'blocking': True})
+        thread.daemon = True
+        thread.start()
+        try:
+            for i in range(100):
+                if blocking_server.is_running:
+                    break
+                time.sleep(0.05)
+            self.assertEqual(service.send(echo='foo').text, 'foo')
+            self.assertTrue(thread.is_alive())
+        finally:
+            blocking_server.process.terminate()
+            thread.join(5)
+        self.assertFalse(thread.is_alive())
+        self.assertFalse(blocking_server.is_running)
+
+        # Requests sent once the process has exited fail, rather than waiting for a response
+        process = subprocess.Popen(
+            (node_settings.PATH_TO_NODE, '-e', ''),
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+        )
+        connection = PipeConnection(process, lambda line: None)
+        connection.read_responses()
+        self.assertRaises(ConnectionError, connection.send, EchoService.get_name(), {'data': '{}'}, timeout=5)
+        self.assertEqual(connection.pending, {})
+        process.wait()
+        process.stdin.close()
+        process.stdout.close()
+        process.stderr.close()
+
+    def test_fake_servers_answer_requests_with_stubs(self):
+        fake_server = FakeNodeServer()
+        fake_server.start()
+        self.assertTrue(fake_server.is_healthy())
+
+        service = EchoService()
+        service.server = fake_server
+        self.assertEqual(service.send(echo='foo').text, 'foo')
+        self.assertRaises(NodeServiceError, service.send)
+
+        error_service = ErrorService()
+        error_service.server = fake_server
+        self.assertRaises(NodeServiceError, error_service.send)
+
+        fake_server.register('tests.services.ErrorService', lambda data: {'received': data})
+        self.assertEqual(error_service.send(foo='bar').json(), {'received': {'foo': 'bar'}})
+
+        fake_server.register(ErrorService, lambda data: (500, 'Stubbed error'))
+        self.assertRaises(NodeServiceError, error_service.send)
+
+        def slow_stub(data):
+            time.sleep(0.1)
+            return 'too slow'
+
+        fake_server.register(ErrorService, slow_stub)
+        error_service.timeout = 0.05
+        self.assertRaises(NodeServerTimeoutError, error_service.send)
+
+    def test_services_can_be_called_in_the_background(self):
+        fake_server = FakeNodeServer()
+        fake_server.start()
+        service = EchoService()
+        service.server = fake_server
+
+        call = service.send_background(echo='foo')
+        self.assertEqual(call.result(timeout=5).text, 'foo')
+        outcome = get_outcome(call.id)
+        self.assertEqual(outcome['status'], 'succeeded')
+        self.assertEqual(outcome['output'], 'foo')
+
+        failed_call = service.send_background()
+        self.assertRaises(NodeServiceError, failed_call.result, 5)
+        outcome = get_outcome(failed_call.id)
+        self.assertEqual(outcome['status'], 'failed')
+        self.assertIn('NodeServiceError', outcome['error'])
+
+        # Calls beyond the capacity of the pool and its queue are rejected
+        release = threading.Event()
+        fake_server.register(EchoService, lambda data: release.wait(5) and data['echo'])
+        outcomes = []
+        dispatcher = BackgroundDispatcher(
+            max_workers=1, max_queued=1, result_store=MemoryResultStore(), callback=outcomes.append
+        )
+        try:
+            calls = [dispatcher.submit(service, {'echo': 'a'}), dispatcher.submit(service, {'echo': 'b'})]
+            self.assertRaises(BackgroundQueueFull, dispatcher.submit, service, {'echo': 'c'})
+            self.assertEqual(dispatcher.result_store.get(calls[1].id)['status'], 'queued')
+            release.set()
+            self.assertEqual([call.result(5).text for call in calls], ['a', 'b'])
+            self.assertEqual([outcome['output'] for outcome in outcomes], ['a', 'b'])
+            self.assertEqual(dispatcher.submit(service, {'echo': 'c'}).result(5).text, 'c')
+        finally:
+            release.set()
+            dispatcher.shutdown()
+
+    def test_fake_servers_can_record_and_replay_responses(self):
+        recordings_dir = tempfile.mkdtemp()
+        path_to_recordings = os.path.join(recordings_dir, 'recordings.json')
+        try:
+            recording_server = FakeNodeServer(recordings=path_to_recordings, record=True)
+            recording_server.unregister(EchoService)
+            service = EchoService()
+            service.server = recording_server
+            try:
+                self.assertEqual(service.send(echo='recorded').text, 'recorded')
+                self.assertTrue(recording_server.real_server.is_running)
+            finally:
+                recording_server.stop()
+
+            replaying_server = FakeNodeServer(recordings=path_to_recordings)
+            replaying_server.unregister(EchoService)
+            service.server = replaying_server
+            self.assertEqual(service.send(echo='recorded').text, 'recorded')
+            self.assertIsNone(replaying_server.real_server)
+            self.assertRaises(NodeServiceError, service.send, echo='not recorded')
+        finally:
+            shutil.rmtree(recordings_dir)
+
+    def test_consistent_hash_rings_move_a_minimal_share_of_keys(self):
+        keys = [six.text_type(i) for i in range(1000)]
+        ring = HashRing(['a', 'b', 'c'])
+        assigned = dict((key, ring.get_node(key)) for key in keys)
+        self.assertEqual(set(assigned.values()), set(['a', 'b', 'c']))
+        self.assertEqual(sorted(ring.get_nodes('foo')), ['a', 'b', 'c'])
+
+        ring.add('d')
+        moved = [key for key in keys if ring.get_node(key) != assigned[key]]
+        self.assertTrue(all(ring.get_node(key) == 'd' for key in moved))
+        self.assertLess(len(moved), len(keys) / 2)
+
+        ring.remove('d')
+        self.assertEqual(dict((key, ring.get_node(key)) for key in keys), assigned)
+
+    def test_balanced_servers_route_consistently_and_fail_over(self):
+        backend_servers = []
+        for i in range(3):
+            backend_server = NodeServer()
+            backend_server.port = six.text_type(get_free_port(backend_server.address))
+            backend_server.start(use_existing_process=False)
+            backend_servers.append(backend_server)
+
+        try:
+            balanced_server = BalancedNodeServer(
+                backends=[backend_server.get_server_url() for backend_server in backend_servers]
+            )
+            service = EchoService()
+            service.server = balanced_server
+
+            def get_request_counts():
+                return dict((backend.url, backend.request_count) for backend in balanced_server.backends)
+
+            # Start the server, which pings one of the backends
+            balanced_server.start()
+            counts = get_request_counts()
+            for i in range(5):
+                self.assertEqual(service.send(echo='foo').text, 'foo')
+            changes = [get_request_counts()[url] - count for url, count in counts.items()]
+            self.assertEqual(sorted(changes), [0, 0, 5])
+
+            # Requests to a failed backend are sent to the next backend on the ring
+            url = [url for url, count in get_request_counts().items() if count > counts[url]][0]
+            [backend_server for backend_server in backend_servers if backend_server.get_server_url() == url][0].stop()
+            self.assertEqual(service.send(echo='foo').text, 'foo')
+            self.assertFalse(balanced_server.get_backend(url).is_healthy)
+            self.assertEqual(balanced_server.get_backend(url).failure_count, 1)
+
+            self.assertEqual(service.send(echo='foo').text, 'foo')
+            self.assertEqual(balanced_server.get_backend(url).failure_count, 1)
+        finally:
+            for backend_server in backend_servers:
+                backend_server.stop()
+
+    def test_balanced_servers_route_references_consistently(self):
+        class ReferenceEchoService(EchoService):
+            name = '/reference-echo'
+            reference_arguments = ('echo',)
+
+        class ReferenceServer(NodeServer):
+            services = NodeServer.services + (ReferenceEchoService,)
+
+        class BalancedReferenceServer(BalancedNodeServer):
+            services = ReferenceServer.services
+
+        backend_servers = []
+        for i in range(3):
+            backend_server = ReferenceServer()
+            backend_server.port = six.text_type(get_free_port(backend_server.address))
+            backend_server.start(use_existing_process=False)
+            backend_servers.append(backend_server)
+
+        try:
+            balanced_server = BalancedReferenceServer(
+                backends=[backend_server.get_server_url() for backend_server in backend_servers]
+            )
+            balanced_server.start()
+            service = ReferenceEchoService()
+            service.server = balanced_server
+
+            counts = dict((backend.url, backend.request_count) for backend in balanced_server.backends)
+            for i in range(5):
+                content = 'large content {i} '.format(i=i) * 100
+                self.assertEqual(service.send(echo=content).text, content)
+                self.assertEqual(service.send(echo=content).text, content)
+
+            # The requests which upload a value, and those which follow, are sent to the same backend
+            for backend in balanced_server.backends:
+                self.assertEqual((backend.request_count - counts[backend.url]) % 2, 0)
+            self.assertEqual(sum(backend.failure_count for backend in balanced_server.backends), 0)
+
+            # Uploads are tracked for each backend
+            self.assertEqual(balanced_server.uploaded_references, set())
+            uploaded = [backend.uploaded_references for backend in balanced_server.backends]
+            self.assertEqual(sum(len(digests) for digests in uploaded), 5)
+            self.assertEqual(len(set().union(*uploaded)), 5)
+        finally:
+            for backend_server in backend_servers:
+                backend_server.stop()
+
+    def test_service_calls_in_templates_can_be_deferred(self):
+        engine = Engine(libraries={'node_services': 'django_node.templatetags.node_services'})
+        template = engine.from_string(
+            '{% load node_services %}'
+            '{% render_service "django_node.services.EchoService" echo="a" %}'
+            '{% defer_services %}'
+            '{% for value in values %}[{% render_service "django_node.services.EchoService" echo=value %}]{% endfor %}'
+            '{{ user_content }}'
+            '{% end_defer_services %}'
+        )
+
+        renderer = DeferredRenderer()
+        calls = []
+        defer = renderer.defer
+
+        def record_call(service, **kwargs):
+            calls.append(kwargs)
+            return defer(service, **kwargs)
+
+        renderer.defer = record_call
+        with renderer:
+            placeholder = renderer.defer(echo_service, echo='b')
+        self.assertEqual(calls, [{'echo': 'b'}])
+        self.assertEqual(renderer.render('<' + placeholder + '>'), '<b>')
+
+        # Placeholders are only substituted for the renderer which produced them
+        output = template.render(Context({'values': ['x', 'y', 'z'], 'user_content': placeholder}))
+        self.assertEqual(output, 'a[x][y][z]' + placeholder.replace('<', '&lt;').replace('>', '&gt;'))
+
+    def test_service_calls_are_memoized_within_a_request(self):
+        counts = {}
+
+        def view(request):
+            self.assertEqual(echo_service.send(echo='foo').text, 'foo')
+            counts['request_count'] = request_count = server.request_count
+            self.assertEqual(echo_service.send(echo='foo').text, 'foo')
+            self.assertEqual(server.request_count, request_count)
+            self.assertEqual(echo_service.send(echo='bar').text, 'bar')
+            self.assertEqual(server.request_count, request_count + 1)
+
+            # Services can opt out
+            echo_service.memoize = False
+            try:
+                self.assertEqual(echo_service.send(echo='foo').text, 'foo')
+            finally:
+                del echo_service.memoize
+            self.assertEqual(server.request_count, request_count + 2)
+            return HttpResponse()
+
+        # The header is only added when DEBUG is True, which the test runner disables
+        with override_settings(DEBUG=True):
+            response = ServiceMemoizationMiddleware(view)(RequestFactory().get('/'))
+        self.assertEqual(response[MEMO_HEADER], 'hits=1; misses=2')
+
+        response = ServiceMemoizationMiddleware(view)(RequestFactory().get('/'))
+        self.assertFalse(response.has_header(MEMO_HEADER))
+
+        # Calls outside of a request are never memoized
+        echo_service.send(echo='foo')
+        self.assertEqual(server.request_count, counts['request_count'] + 3)
+
+        # The memo table is deactivated if the view raises
+        def failing_view(request):
+            echo_service.send(echo='foo')
+            raise ValueError()
+
+        self.assertRaises(ValueError, ServiceMemoizationMiddleware(failing_view), RequestFactory().get('/'))
+        echo_service.send(echo='foo')
+        self.assertEqual(server.request_count, counts['request_count'] + 5)
+
+    def test_node_server_can_start_with_a_code_cache(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+        # Missing parent directories are created
+        cache_dir = os.path.join(root, 'nested', 'code_cache')
+        new_server = NodeServer()
+        new_server.code_cache = cache_dir
+        try:
+            output = build_code_cache(new_server, cache_dir)
+            self.assertGreater(output['files'], 0)
+            self.assertGreater(output['size'], 0)
+
+            with open(os.path.join(cache_dir, 'manifest.json')) as manifest_file:
+                manifest = json.load(manifest_file)
+            path_to_echo_service = os.path.realpath(EchoService.get_path_to_source())
+            self.assertIn(path_to_echo_service, manifest['files'])
+            self.assertIn(path_to_echo_service, manifest['services'][EchoService.get_name()])
+
+            new_server.start()
+            code_cache = new_server.stats()['code_cache']
+            self.assertTrue(code_cache['enabled'])
+            self.assertEqual(code_cache['rejected'], 0)
+            self.assertGreaterEqual(code_cache['hits'], len(manifest['files']))
+            new_server.stop()
+
+            # Modules which have changed since the cache was built are compiled as usual
+            manifest['files'][path_to_echo_service]['hash'] = 'changed'
+            with open(os.path.join(cache_dir, 'manifest.json'), 'w') as manifest_file:
+                json.dump(manifest, manifest_file)
+            new_server.start()
+            code_cache = new_server.stats()['code_cache']
+            self.assertEqual(code_cache['hits'], len(manifest['files']) - 1)
+            self.assertGreaterEqual(code_cache['misses'], 1)
+        finally:
+            new_server.stop()
+
+    def test_node_server_reloads_changed_services_without_restarting(self):
+        source_dir = os.path.realpath(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, source_dir)
+        path_to_greeting = os.path.join(source_dir, 'greeting.js')
+        path_to_message = os.path.join(source_dir, 'message.js')
+
+        def write_source(path, source):
+            with open(path, 'w') as source_file:
+                source_file.write(source)
+            # Ensure that the change is visible, regardless of the resolution of mtimes
+            modified_at = time.time() + len(os.listdir(source_dir)) + 10
+            os.utime(path, (modified_at, modified_at))
+
+        write_source(path_to_message, 'module.exports = "first";')
+        write_source(
+            path_to_greeting,
+            'var message = require("./message");\n'
+            'module.exports = function(data, response) { response.send(message); };'
+        )
+
+        # A service which exports a function from a package, which is not reloaded
+        path_to_package = os.path.join(source_dir, 'node_modules', 'greeter', 'index.js')
+        os.makedirs(os.path.dirname(path_to_package))
+        write_source(path_to_package, 'module.exports = function(data, response) { response.send("packaged"); };')
+        path_to_packaged_greeting = os.path.join(source_dir, 'packaged_greeting.js')
+        write_source(path_to_packaged_greeting, 'module.exports = require("greeter");')
+
+        class GreetingService(BaseService):
+            name = '/greeting'
+            path_to_source = path_to_greeting
+
+        class PackagedGreetingService(BaseService):
+            name = '/packaged-greeting'
+            path_to_source = path_to_packaged_greeting
+
+        class ReloadingServer(NodeServer):
+            services = NodeServer.services + (ReloadService, GreetingService, PackagedGreetingService)
+
+        self.assertNotIn(ReloadService, NodeServer.services)
+
+        new_server = ReloadingServer()
+        service = GreetingService()
+        service.server = new_server
+        try:
+            new_server.start()
+            pid = new_server.process.pid
+            self.assertEqual(service.send().text, 'first')
+
+            output = new_server.reload_services([GreetingService.get_name()], reload=False)
+            self.assertEqual(sorted(output['/greeting']['dependencies']), [path_to_greeting, path_to_message])
+
+            watcher = SourceWatcher(new_server)
+            watcher.check()
+            self.assertIsNone(watcher.check())
+
+            # Changes to the local modules required by a service are reloaded
+            write_source(path_to_message, 'module.exports = "second";')
+            output = watcher.check()
+            self.assertEqual(list(output), ['/greeting'])
+            self.assertTrue(output['/greeting']['reloaded'])
+            self.assertEqual(service.send().text, 'second')
+
+            # Services which fail to load continue with their previous handler
+            write_source(path_to_greeting, 'module.exports = function(')
+            output = watcher.check()
+            self.assertFalse(output['/greeting']['reloaded'])
+            self.assertIn('SyntaxError', output['/greeting']['error'])
+            self.assertEqual(service.send().text, 'second')
+
+            # Failed services are retried at each check, until they load
+            self.assertFalse(watcher.check()['/greeting']['reloaded'])
+            write_source(path_to_message, 'module.exports = "third";')
+            write_source(
+                path_to_greeting,
+                'var message = require("./message");\n'
+                'module.exports = function(data, response) { response.send(message); };'
+            )
+            self.assertTrue(watcher.check()['/greeting']['reloaded'])
+            self.assertEqual(service.send().text, 'third')
+            self.assertIsNone(watcher.check())
+
+            # Services whose handler is exported from a package can be reloaded
+            output = new_server.reload_services([PackagedGreetingService.get_name()])
+            self.assertTrue(output['/packaged-greeting']['reloaded'])
+            self.assertIsNone(output['/packaged-greeting']['error'])
+
+            self.assertEqual(new_server.process.pid, pid)
+        finally:
+            new_server.stop()
+
     def test_node_server_process_can_rely_on_externally_controlled_processes(self):
         self.assertFalse(server.test())
         new_server = NodeServer()
@@ -181,7 +1383,9 @@ class TestDjangoNode(unittest.TestCase):
         self.assertEqual(config['port'], server.port)
         self.assertEqual(config['startup_output'], server.get_startup_output())
 
-        services = (EchoService, ErrorService, TimeoutService)
+        services = (
+            EchoService, PingService, StatsService, EvalService, ErrorService, TimeoutService
+        )
         self.assertEqual(len(config['services']), len(services))
 
         service_names = [obj['name'] for obj in config['services']]
@@ -197,9 +1401,50 @@ class TestDjangoNode(unittest.TestCase):
     def test_node_server_throws_timeout_on_long_running_services(self):
         self.assertRaises(NodeServerTimeoutError, timeout_service.send)
 
+    def test_node_server_drops_and_cancels_requests_past_their_deadline(self):
+        server.start()
+        self.assertEqual(server.stats()['requests'], {'dropped': 0, 'cancelled': 0})
+
+        # Abandoned requests are signalled to cancel
+        self.assertRaises(NodeServerTimeoutError, timeout_service.send)
+        for i in range(20):
+            if server.stats()['requests']['cancelled']:
+                break
+            time.sleep(0.05)
+        self.assertEqual(server.stats()['requests']['cancelled'], 1)
+
+        # Requests which are already past their deadline are never handled
+        self.assertRaises(
+            NodeServerTimeoutError,
+            server.send_request_to_service,
+            timeout_service.get_name(),
+            data={'data': json.dumps({'__django_node_timeout__': 0})},
+        )
+        self.assertEqual(server.stats()['requests'], {'dropped': 1, 'cancelled': 1})
+
     def test_node_server_error_service_works(self):
         self.assertRaises(NodeServiceError, error_service.send)
 
+    def test_node_eval_in_server_returns_output(self):
+        stderr, stdout = node.eval_in_server(PATH_TO_ARGV_SCRIPT, args=('foo', 'bar'))
+        self.assertEqual(stdout, 'argv.js foo bar\n')
+        self.assertEqual(stderr, 'to stderr\n')
+
+        stderr, stdout = node.eval_in_server('console.log(require("path").join("foo", "bar"))')
+        self.assertEqual(stdout, os.path.join('foo', 'bar') + '\n')
+        self.assertEqual(stderr, '')
+
+        stderr, stdout = node.eval_in_server('throw new Error("eval error")')
+        self.assertIn('eval error', stderr)
+
+    def test_node_eval_in_server_can_timeout(self):
+        self.assertRaises(CommandTimeoutError, node.eval_in_server, 'while (true) {}', timeout=0.5)
+        self.assertRaises(
+            CommandTimeoutError, node.eval_in_server, 'module.exports = new Promise(function() {})', timeout=0.5
+        )
+        stderr, stdout = node.eval_in_server('console.log("still running")')
+        self.assertEqual(stdout, 'still running\n')
+
     def test_node_server_config_management_command_provides_the_expected_output(self):
         from django_node.management.commands.node_server_config import Command
 